@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# Scripts de medição de desempenho dos serviços Python (corridos à mão ou em CI,
+# a partir de backend/python: python -m benchmarks.<script>).
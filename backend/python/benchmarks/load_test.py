@@ -0,0 +1,459 @@
+# benchmarks/load_test.py
+# Gerador de carga: simula N carrinhas e M passageiros contra o routes_service e
+# o trips_service (e, opcionalmente, o routing_service com o OSRM falso), numa
+# base de dados local, e regista a latência (p50/p95/p99), o débito e os
+# erros por endpoint, mais o número de ligações ao PostgreSQL durante o teste.
+#
+# A frota sintética é criada no tenant "cliente_alpha" (o que os serviços usam),
+# com emails @loadgen.invalid, e só é recriada com --reseed ou se mudar de tamanho.
+#
+# Carga gerada durante --duration segundos:
+#   - cada carrinha envia a sua posição a cada --ping-interval segundos;
+#   - cada passageiro confirma (85%) ou cancela uma vez, num instante aleatório
+#     dos primeiros --confirm-window segundos (o pico das 6h30);
+#   - --readers clientes consultam confirmações, posição, rotas e atribuições;
+#   - com --routing-url, --optimizers clientes pedem POST /optimize e a ETA.
+# Os pings e as confirmações seguem um calendário fixo e a latência conta a
+# partir do instante previsto, por isso um serviço lento não reduz a carga
+# nem esconde o tempo que os pedidos passaram à espera.
+#
+# Uso (a partir de backend/python, com o docker-compose ou os serviços locais):
+#   uvicorn osrm_stub:app --port 5000                    (em routing_service/)
+#   DB_HOST=localhost python -m benchmarks.load_test --vans 200 --passengers 3000 \
+#       --routing-url http://localhost:8002 --output load.json
+#   DB_HOST=localhost python -m benchmarks.load_test --baseline load.json
+# Com --baseline o script termina com código 1 se o p95 de algum endpoint ficar
+# mais lento que o limite ou se a taxa de erros subir.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+
+import httpx
+import psycopg
+
+from benchmarks.report import compare_latency, environment, latency_summary
+from shared.db import DATABASE_URL
+from shared.migrate import migrate
+
+TENANT = "cliente_alpha"
+EMAIL_DOMAIN = "loadgen.invalid"
+BBOX = (38.70, -9.25, 38.80, -9.10)
+# Aumento da taxa de erros (em pontos percentuais) considerado regressão
+MAX_ERROR_RATE_INCREASE = 1.0
+
+# Operações dos leitores e o seu peso relativo
+READ_MIX = (
+    ("GET /trips/today/{route_id}/confirmations", 5),
+    ("GET /trips/{route_id}/location", 5),
+    ("GET /routes/{route_id}", 3),
+    ("GET /passengers/{passenger_id}/route", 3),
+    ("GET /trips/today/confirmations", 1),
+    ("GET /assignments/best-routes", 1),
+)
+
+DB_CONNECTIONS = """
+    SELECT count(*) AS total,
+           count(*) FILTER (WHERE state = 'active') AS active,
+           count(*) FILTER (WHERE state = 'idle') AS idle,
+           count(*) FILTER (WHERE state LIKE 'idle in transaction%') AS idle_in_transaction,
+           count(*) FILTER (WHERE wait_event_type = 'Lock') AS waiting_on_lock
+    FROM pg_stat_activity
+    WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()
+"""
+
+
+# --- Frota sintética ---
+
+def seed(conn, vans, passengers, seed_value):
+    """Cria `vans` motoristas e rotas e distribui `passengers` passageiros por elas."""
+    print(f"A criar a frota de teste: {vans} carrinhas, {passengers} passageiros...")
+    pattern = f"%@{EMAIL_DOMAIN}"
+    with conn.transaction():
+        conn.execute("SELECT setseed(%s)", (seed_value / 2 ** 31,))
+        # As restantes tabelas são limpas em cascata
+        conn.execute("""
+            DELETE FROM routes WHERE tenant_id = %s
+              AND driver_id IN (SELECT id FROM users WHERE tenant_id = %s AND email LIKE %s)
+        """, (TENANT, TENANT, pattern))
+        conn.execute("DELETE FROM users WHERE tenant_id = %s AND email LIKE %s", (TENANT, pattern))
+
+        conn.execute("""
+            INSERT INTO users (name, email, password_hash, role, tenant_id, latitude, longitude)
+            SELECT 'Motorista ' || g, 'motorista' || g || '@' || %s, 'x', 'MOTORISTA', %s,
+                   %s + random() * %s, %s + random() * %s
+            FROM generate_series(1, %s) AS g
+        """, (EMAIL_DOMAIN, TENANT, BBOX[0], BBOX[2] - BBOX[0], BBOX[1], BBOX[3] - BBOX[1], vans))
+        conn.execute("""
+            INSERT INTO users (name, email, password_hash, role, tenant_id, address, latitude, longitude)
+            SELECT 'Passageiro ' || g, 'passageiro' || g || '@' || %s, 'x', 'PASSAGEIRO', %s,
+                   'Rua ' || g, %s + random() * %s, %s + random() * %s
+            FROM generate_series(1, %s) AS g
+        """, (EMAIL_DOMAIN, TENANT, BBOX[0], BBOX[2] - BBOX[0], BBOX[1], BBOX[3] - BBOX[1], passengers))
+        conn.execute("""
+            INSERT INTO routes (name, driver_id, tenant_id)
+            SELECT 'Carrinha ' || id, id, tenant_id FROM users
+            WHERE tenant_id = %s AND role = 'MOTORISTA' AND email LIKE %s
+        """, (TENANT, pattern))
+        conn.execute("""
+            WITH p AS (
+                SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM users WHERE tenant_id = %(t)s AND role = 'PASSAGEIRO' AND email LIKE %(pattern)s
+            ), r AS (
+                SELECT r.id, row_number() OVER (ORDER BY r.id) - 1 AS n
+                FROM routes r JOIN users d ON d.id = r.driver_id
+                WHERE r.tenant_id = %(t)s AND d.email LIKE %(pattern)s
+            )
+            INSERT INTO passenger_routes (route_id, passenger_id, tenant_id)
+            SELECT r.id, p.id, %(t)s FROM p JOIN r ON r.n = p.n %% %(vans)s
+        """, {"t": TENANT, "pattern": pattern, "vans": vans})
+    conn.execute("ANALYZE")
+
+
+def fleet(conn):
+    """Rotas da frota de teste: [{route_id, driver, passengers: [{id, latitude, longitude}]}]."""
+    rows = conn.execute("""
+        SELECT r.id AS route_id, d.latitude AS driver_latitude, d.longitude AS driver_longitude,
+               p.id AS passenger_id, p.latitude, p.longitude
+        FROM routes r
+        JOIN users d ON d.id = r.driver_id
+        LEFT JOIN passenger_routes pr ON pr.route_id = r.id
+        LEFT JOIN users p ON p.id = pr.passenger_id
+        WHERE r.tenant_id = %s AND d.email LIKE %s
+        ORDER BY r.id, p.id
+    """, (TENANT, f"%@{EMAIL_DOMAIN}")).fetchall()
+    routes = {}
+    for route_id, d_lat, d_lon, passenger_id, lat, lon in rows:
+        route = routes.setdefault(route_id, {
+            "route_id": route_id, "latitude": d_lat, "longitude": d_lon, "passengers": [],
+        })
+        if passenger_id is not None:
+            route["passengers"].append({"id": passenger_id, "latitude": lat, "longitude": lon})
+    return list(routes.values())
+
+
+def fleet_size(conn):
+    return conn.execute("""
+        SELECT (SELECT count(*) FROM users WHERE tenant_id = %(t)s AND role = 'MOTORISTA' AND email LIKE %(p)s),
+               (SELECT count(*) FROM users WHERE tenant_id = %(t)s AND role = 'PASSAGEIRO' AND email LIKE %(p)s)
+    """, {"t": TENANT, "p": f"%@{EMAIL_DOMAIN}"}).fetchone()
+
+
+# --- Registo dos resultados ---
+
+class Recorder:
+    """Latências, códigos HTTP e erros por endpoint (nome com o caminho em template)."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.status = defaultdict(lambda: defaultdict(int))
+        self.errors = defaultdict(int)
+
+    async def call(self, client, name, method, url, started=None, **kwargs):
+        """Faz o pedido e regista-o; `started` é o instante previsto (calendário fixo)."""
+        started = started if started is not None else time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.status[name][type(e).__name__] += 1
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append((time.perf_counter() - started) * 1000)
+        self.status[name][str(response.status_code)] += 1
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def summary(self, elapsed):
+        endpoints = {}
+        for name in sorted(set(self.latencies) | set(self.status)):
+            requests = sum(self.status[name].values())
+            endpoints[name] = {
+                "requests": requests,
+                "errors": self.errors[name],
+                "error_rate_percent": round(self.errors[name] / requests * 100, 3) if requests else 0.0,
+                "throughput_rps": round(requests / elapsed, 2),
+                "status_codes": dict(self.status[name]),
+                "latency_ms": latency_summary(self.latencies[name]),
+            }
+        requests = sum(e["requests"] for e in endpoints.values())
+        errors = sum(e["errors"] for e in endpoints.values())
+        return {
+            "requests": requests,
+            "errors": errors,
+            "error_rate_percent": round(errors / requests * 100, 3) if requests else 0.0,
+            "throughput_rps": round(requests / elapsed, 2),
+            "latency_ms": latency_summary([v for values in self.latencies.values() for v in values]),
+        }, endpoints
+
+
+class ConnectionSampler:
+    """Amostra pg_stat_activity e o /db/pool de cada serviço a cada `interval` segundos."""
+
+    def __init__(self, dsn, pool_urls, interval):
+        self.dsn = dsn
+        self.pool_urls = pool_urls
+        self.interval = interval
+        self.db_samples = []
+        self.pool_samples = defaultdict(list)
+
+    async def run(self, client, stop):
+        async with await psycopg.AsyncConnection.connect(self.dsn, autocommit=True) as conn:
+            while not stop.is_set():
+                cur = await conn.execute(DB_CONNECTIONS)
+                names = [c.name for c in cur.description]
+                self.db_samples.append(dict(zip(names, await cur.fetchone())))
+                for service, url in self.pool_urls.items():
+                    try:
+                        response = await client.get(f"{url}/db/pool")
+                        self.pool_samples[service].append(response.json())
+                    except (httpx.HTTPError, ValueError):
+                        pass
+                try:
+                    await asyncio.wait_for(stop.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def summary(self):
+        db = {"samples": len(self.db_samples)}
+        for key in ("total", "active", "idle", "idle_in_transaction", "waiting_on_lock"):
+            values = [s[key] for s in self.db_samples]
+            db[f"max_{key}"] = max(values, default=0)
+            db[f"mean_{key}"] = round(sum(values) / len(values), 2) if values else 0.0
+        pools = {}
+        for service, samples in self.pool_samples.items():
+            pools[service] = {
+                "samples": len(samples),
+                "max_size": max((s.get("max_size", 0) for s in samples), default=0),
+                "peak_size": max((s.get("size", 0) for s in samples), default=0),
+                "peak_in_use": max((s.get("in_use", 0) for s in samples), default=0),
+                "peak_waiting": max((s.get("waiting", 0) for s in samples), default=0),
+                "peak_saturation": max((s.get("saturation", 0.0) for s in samples), default=0.0),
+            }
+        return db, pools
+
+
+# --- Utilizadores simulados ---
+
+async def van(client, recorder, args, route, start, rng):
+    """Envia a posição da carrinha a cada ping_interval segundos, a partir de um desfasamento aleatório."""
+    lat, lon = route["latitude"], route["longitude"]
+    scheduled = start + rng.uniform(0, args.ping_interval)
+    end = start + args.duration
+    while scheduled < end:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        lat += rng.uniform(-0.0005, 0.0005)
+        lon += rng.uniform(-0.0005, 0.0005)
+        await recorder.call(
+            client, "POST /trips/{route_id}/location", "POST",
+            f"{args.trips_url}/trips/{route['route_id']}/location",
+            started=scheduled, json={"latitude": lat, "longitude": lon},
+        )
+        scheduled += args.ping_interval
+
+
+async def passenger(client, recorder, args, route, passenger_id, start, rng):
+    """Uma confirmação (ou cancelamento) num instante aleatório da janela de confirmações."""
+    scheduled = start + rng.uniform(0, min(args.confirm_window, args.duration))
+    await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+    await recorder.call(
+        client, "POST /confirmations", "POST", f"{args.trips_url}/confirmations",
+        started=scheduled,
+        json={
+            "passenger_id": passenger_id,
+            "route_id": route["route_id"],
+            "status": "CONFIRMED" if rng.random() < 0.85 else "CANCELLED",
+        },
+    )
+
+
+async def reader(client, recorder, args, routes, end, rng):
+    """Consultas da app e do painel, em ciclo fechado com read_interval segundos entre pedidos."""
+    with_passengers = [r for r in routes if r["passengers"]]
+    mix = [(name, weight) for name, weight in READ_MIX if with_passengers or "{passenger_id}" not in name]
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    while time.perf_counter() < end:
+        name = rng.choices(names, weights)[0]
+        route = rng.choice(routes)
+        if name == "GET /trips/today/{route_id}/confirmations":
+            url = f"{args.trips_url}/trips/today/{route['route_id']}/confirmations"
+        elif name == "GET /trips/{route_id}/location":
+            url = f"{args.trips_url}/trips/{route['route_id']}/location"
+        elif name == "GET /routes/{route_id}":
+            url = f"{args.routes_url}/routes/{route['route_id']}"
+        elif name == "GET /passengers/{passenger_id}/route":
+            passenger_id = rng.choice(rng.choice(with_passengers)["passengers"])["id"]
+            url = f"{args.routes_url}/passengers/{passenger_id}/route"
+        elif name == "GET /trips/today/confirmations":
+            url = f"{args.trips_url}/trips/today/confirmations"
+        else:
+            url = (f"{args.routes_url}/assignments/best-routes"
+                   f"?latitude={rng.uniform(BBOX[0], BBOX[2])}&longitude={rng.uniform(BBOX[1], BBOX[3])}")
+        await recorder.call(client, name, "GET", url)
+        if args.read_interval:
+            await asyncio.sleep(args.read_interval)
+
+
+async def optimizer(client, recorder, args, routes, end, rng):
+    """Otimização da rota do dia (POST /optimize com route_id) seguida da consulta da ETA."""
+    routes = [r for r in routes if r["passengers"]]
+    while routes and time.perf_counter() < end:
+        route = rng.choice(routes)
+        body = {
+            "driver_start": {"id": 0, "name": "Motorista", "latitude": route["latitude"],
+                             "longitude": route["longitude"], "type": "driver"},
+            "passengers": [
+                {"id": p["id"], "name": f"Passageiro {p['id']}", "latitude": p["latitude"], "longitude": p["longitude"]}
+                for p in route["passengers"]
+            ],
+            "route_id": route["route_id"],
+        }
+        response = await recorder.call(
+            client, "POST /optimize", "POST", f"{args.routing_url}/optimize",
+            params={"geometry_format": "polyline", "steps": "none"}, json=body,
+        )
+        if response is not None and response.status_code == 200:
+            await recorder.call(client, "GET /routes/{route_id}/eta", "GET",
+                                f"{args.routing_url}/routes/{route['route_id']}/eta")
+        if args.read_interval:
+            await asyncio.sleep(args.read_interval)
+
+
+async def run_load(args, routes):
+    rng = random.Random(args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    timeout = httpx.Timeout(args.timeout)
+    sampler = ConnectionSampler(
+        args.dsn, {"routes_service": args.routes_url, "trips_service": args.trips_url}, args.sample_interval
+    )
+
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        # As viagens do dia têm de existir antes das primeiras confirmações
+        response = await client.post(f"{args.trips_url}/trips/materialize")
+        response.raise_for_status()
+
+        stop = asyncio.Event()
+        sampling = asyncio.ensure_future(sampler.run(client, stop))
+        start = time.perf_counter()
+        end = start + args.duration
+        tasks = [van(client, recorder, args, route, start, random.Random(rng.random())) for route in routes]
+        tasks += [
+            passenger(client, recorder, args, route, p["id"], start, random.Random(rng.random()))
+            for route in routes for p in route["passengers"]
+        ]
+        tasks += [reader(client, recorder, args, routes, end, random.Random(rng.random()))
+                  for _ in range(args.readers)]
+        if args.routing_url:
+            tasks += [optimizer(client, recorder, args, routes, end, random.Random(rng.random()))
+                      for _ in range(args.optimizers)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+        stop.set()
+        await sampling
+
+    totals, endpoints = recorder.summary(elapsed)
+    db_connections, service_pools = sampler.summary()
+    return elapsed, totals, endpoints, db_connections, service_pools
+
+
+def compare(results, baseline, threshold):
+    """Regressões de p95 e de taxa de erros por endpoint face a um relatório anterior."""
+    regressions = compare_latency(
+        {name: e["latency_ms"] for name, e in results["endpoints"].items()},
+        {name: e["latency_ms"] for name, e in baseline["endpoints"].items()},
+        threshold,
+    )
+    for name, endpoint in results["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if before and endpoint["error_rate_percent"] - before["error_rate_percent"] > MAX_ERROR_RATE_INCREASE:
+            regressions.append(
+                f"{name}: erros {before['error_rate_percent']}% -> {endpoint['error_rate_percent']}%"
+            )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga de routes_service/trips_service com uma frota sintética.")
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--routes-url", default="http://localhost:8000")
+    parser.add_argument("--trips-url", default="http://localhost:8001")
+    parser.add_argument("--routing-url", help="routing_service (com OSRM_BASE_URL a apontar para o osrm_stub)")
+    parser.add_argument("--vans", type=int, default=100, help="carrinhas (rotas) da frota de teste")
+    parser.add_argument("--passengers", type=int, default=1500, help="passageiros, repartidos pelas carrinhas")
+    parser.add_argument("--duration", type=float, default=60.0, help="segundos de carga")
+    parser.add_argument("--ping-interval", type=float, default=5.0, help="segundos entre posições de cada carrinha")
+    parser.add_argument("--confirm-window", type=float, default=30.0, help="segundos em que chegam as confirmações")
+    parser.add_argument("--readers", type=int, default=20, help="clientes de leitura em simultâneo")
+    parser.add_argument("--optimizers", type=int, default=2, help="clientes de POST /optimize (com --routing-url)")
+    parser.add_argument("--read-interval", type=float, default=0.1, help="pausa de cada leitor entre pedidos")
+    parser.add_argument("--max-connections", type=int, default=500, help="ligações HTTP do gerador")
+    parser.add_argument("--timeout", type=float, default=30.0, help="timeout de cada pedido (s)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="segundos entre amostras das ligações")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reseed", action="store_true", help="recriar a frota de teste mesmo que já exista")
+    parser.add_argument("--output", help="gravar o relatório JSON neste ficheiro")
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.5, help="rácio de p95 a partir do qual há regressão")
+    args = parser.parse_args(argv)
+
+    migrate(args.dsn)
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        if args.reseed or tuple(fleet_size(conn)) != (args.vans, args.passengers):
+            seed(conn, args.vans, args.passengers, args.seed)
+        routes = fleet(conn)
+
+    print(f"Carga durante {args.duration:.0f} s: {len(routes)} carrinhas, {args.passengers} passageiros, "
+          f"{args.readers} leitores{f', {args.optimizers} otimizadores' if args.routing_url else ''}...")
+    elapsed, totals, endpoints, db_connections, service_pools = asyncio.run(run_load(args, routes))
+
+    results = {
+        **environment(),
+        "trip_date": date.today().isoformat(),
+        "config": {
+            "vans": args.vans,
+            "passengers": args.passengers,
+            "duration_seconds": args.duration,
+            "ping_interval_seconds": args.ping_interval,
+            "confirm_window_seconds": args.confirm_window,
+            "readers": args.readers,
+            "optimizers": args.optimizers if args.routing_url else 0,
+            "read_interval_seconds": args.read_interval,
+            "seed": args.seed,
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "totals": totals,
+        "endpoints": endpoints,
+        "db_connections": db_connections,
+        "service_pools": service_pools,
+    }
+
+    for name, e in endpoints.items():
+        latency = e["latency_ms"]
+        print(f"{name:45} {e['requests']:7} pedidos {e['throughput_rps']:8.1f}/s  erros {e['errors']:5}"
+              f"  p50 {latency['p50'] or 0:8.2f}  p95 {latency['p95'] or 0:8.2f}  p99 {latency['p99'] or 0:8.2f} ms")
+    print(f"Total: {totals['requests']} pedidos, {totals['throughput_rps']}/s, {totals['errors']} erros; "
+          f"ligações PostgreSQL: máx {db_connections['max_total']} ({db_connections['max_active']} ativas)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Relatório gravado em {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSÃO {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
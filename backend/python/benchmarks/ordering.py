@@ -0,0 +1,164 @@
+# benchmarks/ordering.py
+# Micro-benchmarks da ordenação das paradas do routing_service (distance.py e
+# ordering.py), sem OSRM nem rede: matriz haversine, Vizinho Mais Próximo e
+# cada etapa de melhoria, para rotas de vários tamanhos.
+#
+# Os pontos são gerados com uma semente fixa, por isso duas execuções no mesmo
+# commit medem exatamente o mesmo trabalho; além dos tempos, o relatório guarda
+# o custo final de cada algoritmo (uma alteração que acelera a ordenação à custa
+# de rotas piores também aparece na comparação).
+#
+# Uso (a partir de backend/python):
+#   python -m benchmarks.ordering --output ordering.json
+#   python -m benchmarks.ordering --baseline ordering.json
+# Com --baseline o script termina com código 1 se algum caso ficar mais lento
+# que o limite (mediana) ou se o custo final de alguma rota piorar.
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.report import ROOT, compare_latency, environment, latency_summary
+
+# Os módulos do routing_service importam-se uns aos outros pelo nome (import distance)
+sys.path.insert(0, str(ROOT / "routing_service"))
+
+from distance import haversine_matrix, nearest_neighbor_order, path_length  # noqa: E402
+from ordering import ALGORITHMS, order_stops  # noqa: E402
+
+DEFAULT_SIZES = (10, 25, 50, 100, 200)
+# Área de Lisboa, como nos outros dados sintéticos
+BBOX = (38.70, -9.25, 38.80, -9.10)
+# Tolerância na comparação de custos (arredondamento a 3 casas em order_stops)
+COST_TOLERANCE = 1e-3
+
+
+def random_points(size, seed):
+    """`size` pontos (motorista + passageiros) numa caixa fixa, reproduzíveis pela semente."""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(BBOX[0], BBOX[2], size)
+    lon = rng.uniform(BBOX[1], BBOX[3], size)
+    return lat, lon
+
+
+def measure(fn, repeat, warmup=1):
+    """Corre fn() warmup + repeat vezes e devolve (tempos em ms das medidas, último resultado)."""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, result
+
+
+def cases(size, seed, max_iterations):
+    """(nome, função) a medir para uma rota com `size` pontos."""
+    lat, lon = random_points(size, seed)
+    matrix = haversine_matrix(lat, lon)
+    # Sem limite de tempo real: o trabalho feito só depende de max_iterations,
+    # senão uma máquina mais lenta pararia mais cedo e pareceria mais rápida.
+    budget_ms = 60_000.0
+
+    yield "haversine_matrix", lambda: haversine_matrix(lat, lon)
+    yield "nearest_neighbor_order", lambda: nearest_neighbor_order(matrix, start=0)
+    for algorithm in ALGORITHMS:
+        yield f"order_stops[{algorithm}]", (
+            lambda a=algorithm: order_stops(matrix, algorithm=a, time_budget_ms=budget_ms, max_iterations=max_iterations)
+        )
+
+
+def route_cost(name, result, lat, lon):
+    """Custo (km) do percurso devolvido pelos casos de ordenação; None nos restantes."""
+    if name.startswith("order_stops"):
+        return result[1]["final_cost"]
+    if name == "nearest_neighbor_order":
+        return round(path_length(haversine_matrix(lat, lon), [0] + result), 3)
+    return None
+
+
+def run(sizes, repeat, seed, max_iterations):
+    results = []
+    for size in sizes:
+        lat, lon = random_points(size, seed)
+        for name, fn in cases(size, seed, max_iterations):
+            samples, result = measure(fn, repeat)
+            entry = {
+                "name": name,
+                "size": size,
+                "latency_ms": latency_summary(samples),
+                "cost_km": route_cost(name, result, lat, lon),
+            }
+            if name.startswith("order_stops"):
+                entry["iterations"] = result[1]["iterations"]
+            results.append(entry)
+            cost = f"  custo {entry['cost_km']:.3f} km" if entry["cost_km"] is not None else ""
+            print(f"{name:32} n={size:<4} p50 {entry['latency_ms']['p50']:9.3f} ms"
+                  f"  p95 {entry['latency_ms']['p95']:9.3f} ms{cost}")
+    return results
+
+
+def case_key(entry):
+    return f"{entry['name']}@{entry['size']}"
+
+
+def compare(results, baseline, threshold):
+    """Regressões de tempo (mediana) e de qualidade (custo final) face a um relatório anterior."""
+    now = {case_key(c): c for c in results["cases"]}
+    before = {case_key(c): c for c in baseline["cases"]}
+    regressions = compare_latency(
+        {k: c["latency_ms"] for k, c in now.items()},
+        {k: c["latency_ms"] for k, c in before.items()},
+        threshold,
+        metric="p50",
+    )
+    if results["seed"] != baseline.get("seed"):
+        return regressions  # pontos diferentes: os custos não são comparáveis
+    for key, case in now.items():
+        previous = before.get(key)
+        if previous and case["cost_km"] is not None and previous["cost_km"] is not None:
+            if case["cost_km"] > previous["cost_km"] + COST_TOLERANCE:
+                regressions.append(f"{key}: custo {previous['cost_km']} km -> {case['cost_km']} km")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks da ordenação das paradas (routing_service).")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="número de pontos por rota (motorista incluído)")
+    parser.add_argument("--repeat", type=int, default=20, help="execuções medidas por caso")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-iterations", type=int, default=1000, help="limite de melhorias de order_stops")
+    parser.add_argument("--output", help="gravar o relatório JSON neste ficheiro")
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.5, help="rácio de tempo a partir do qual há regressão")
+    args = parser.parse_args(argv)
+
+    results = {
+        **environment(),
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "max_iterations": args.max_iterations,
+        "cases": run(args.sizes, args.repeat, args.seed, args.max_iterations),
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Relatório gravado em {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSÃO {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+# benchmarks/query_plans.py
+# Planos de execução (EXPLAIN ANALYZE) de todas as consultas de routes_service
+# e trips_service, sobre um tenant sintético grande numa base de dados local.
+#
+# O script aplica as migrações, cria o tenant "bench_tenant" (se ainda não
+# existir ou com --reseed, incluindo o trilho GPS de hoje), corre cada consulta
+# várias vezes dentro de uma transação que é sempre desfeita (as escritas não
+# ficam na base de dados) e regista os tempos de planeamento/execução e os Seq
+# Scans em tabelas grandes.
+#
+# Uso (a partir de backend/python, com o PostgreSQL do docker-compose):
+#   DB_HOST=localhost python -m benchmarks.query_plans --output plans.json
+#   DB_HOST=localhost python -m benchmarks.query_plans --baseline plans.json
+# Com --baseline o script termina com código 1 se alguma consulta ficar mais
+# lenta que o limite ou passar a fazer um Seq Scan que antes não fazia.
+import argparse
+import importlib.util
+import json
+import statistics
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import psycopg
+from psycopg import sql
+
+from shared.db import DATABASE_URL
+from shared.migrate import migrate
+
+BENCH_TENANT = "bench_tenant"
+ROOT = Path(__file__).resolve().parent.parent
+LARGE_TABLES = {"users", "routes", "passenger_routes", "trips", "trip_confirmations", "location_history"}
+# Diferenças abaixo disto são ruído de medição, mesmo que o rácio seja grande.
+MIN_REGRESSION_MS = 0.5
+
+
+def load_queries(service):
+    """Importa <service>/queries.py (os dois serviços têm um módulo com o mesmo nome)."""
+    spec = importlib.util.spec_from_file_location(f"{service}_queries", ROOT / service / "queries.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+routes_queries = load_queries("routes_service")
+trips_queries = load_queries("trips_service")
+
+
+# --- Dados sintéticos ---
+
+def seed(conn, routes, passengers_per_route, days, history_points):
+    """Cria o tenant de teste: motoristas, passageiros, rotas, `days` dias de viagens e confirmações."""
+    t = BENCH_TENANT
+    print(f"A criar o tenant {t}: {routes} rotas x {passengers_per_route} passageiros, {days} dias de viagens...")
+    with conn.transaction():
+        # As restantes tabelas são limpas em cascata
+        conn.execute("DELETE FROM routes WHERE tenant_id = %s", (t,))
+        conn.execute("DELETE FROM users WHERE tenant_id = %s", (t,))
+
+        conn.execute("""
+            INSERT INTO users (name, email, password_hash, role, tenant_id)
+            SELECT 'Motorista ' || g, 'motorista' || g || '@bench.invalid', 'x', 'MOTORISTA', %s
+            FROM generate_series(1, %s) AS g
+        """, (t, routes))
+        conn.execute("""
+            INSERT INTO users (name, email, password_hash, role, tenant_id, address, latitude, longitude)
+            SELECT 'Passageiro ' || g, 'passageiro' || g || '@bench.invalid', 'x', 'PASSAGEIRO', %s,
+                   'Rua ' || g, 38.70 + random() * 0.1, -9.20 + random() * 0.1
+            FROM generate_series(1, %s) AS g
+        """, (t, routes * passengers_per_route))
+        conn.execute("""
+            INSERT INTO routes (name, driver_id, tenant_id)
+            SELECT 'Rota ' || id, id, tenant_id FROM users
+            WHERE tenant_id = %s AND role = 'MOTORISTA'
+        """, (t,))
+        conn.execute("""
+            WITH p AS (
+                SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM users WHERE tenant_id = %(t)s AND role = 'PASSAGEIRO'
+            ), r AS (
+                SELECT id, row_number() OVER (ORDER BY id) - 1 AS n
+                FROM routes WHERE tenant_id = %(t)s
+            )
+            INSERT INTO passenger_routes (route_id, passenger_id, tenant_id)
+            SELECT r.id, p.id, %(t)s FROM p JOIN r ON r.n = p.n / %(ppr)s
+        """, {"t": t, "ppr": passengers_per_route})
+        conn.execute("""
+            INSERT INTO trips (route_id, trip_date, tenant_id, status, current_lat, current_long)
+            SELECT r.id, current_date - d, r.tenant_id,
+                   CASE WHEN d = 0 THEN 'SCHEDULED' ELSE 'COMPLETED' END,
+                   38.70 + random() * 0.1, -9.20 + random() * 0.1
+            FROM routes r CROSS JOIN generate_series(0, %s - 1) AS d
+            WHERE r.tenant_id = %s
+        """, (days, t))
+        conn.execute("""
+            INSERT INTO trip_confirmations (trip_id, passenger_id, status, tenant_id, confirmed_at)
+            SELECT tr.id, pr.passenger_id,
+                   CASE WHEN random() < 0.85 THEN 'CONFIRMED' ELSE 'CANCELLED' END,
+                   tr.tenant_id, tr.trip_date + time '06:30'
+            FROM trips tr
+            JOIN passenger_routes pr ON pr.route_id = tr.route_id
+            WHERE tr.tenant_id = %s AND random() < 0.8
+        """, (t,))
+
+        # Trilho GPS de hoje: um ping a cada 5 s desde as 07:00 (UTC) em cada rota
+        start = datetime.now(timezone.utc).replace(hour=7, minute=0, second=0, microsecond=0)
+        month = start.date().replace(day=1)
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        conn.execute("DELETE FROM location_history WHERE tenant_id = %s", (t,))
+        conn.execute(sql.SQL(trips_queries.CREATE_LOCATION_HISTORY_PARTITION).format(
+            sql.Identifier(f"location_history_{month:%Y_%m}"),
+            sql.Literal(datetime(month.year, month.month, 1, tzinfo=timezone.utc)),
+            sql.Literal(datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc)),
+        ))
+        conn.execute("""
+            INSERT INTO location_history (tenant_id, route_id, trip_date, recorded_at, latitude, longitude)
+            SELECT r.tenant_id, r.id, current_date, %s + g * interval '5 seconds',
+                   38.70 + g * 0.0001, -9.20 + random() * 0.001
+            FROM routes r CROSS JOIN generate_series(0, %s - 1) AS g
+            WHERE r.tenant_id = %s
+        """, (start, history_points, t))
+    conn.execute("ANALYZE")
+
+
+def sample(conn):
+    """Ids reais do tenant de teste para usar como parâmetros das consultas."""
+    t = BENCH_TENANT
+    route_ids = [r[0] for r in conn.execute(
+        "SELECT id FROM routes WHERE tenant_id = %s ORDER BY id", (t,)
+    ).fetchall()]
+    route_id = route_ids[len(route_ids) // 2]
+    driver_id = conn.execute("SELECT driver_id FROM routes WHERE id = %s", (route_id,)).fetchone()[0]
+    roster = [r[0] for r in conn.execute(
+        "SELECT passenger_id FROM passenger_routes WHERE route_id = %s ORDER BY passenger_id", (route_id,)
+    ).fetchall()]
+    # Passageiros de outra rota, para as inscrições (não estão nesta rota)
+    others = [r[0] for r in conn.execute(
+        "SELECT passenger_id FROM passenger_routes WHERE route_id = %s ORDER BY passenger_id", (route_ids[0],)
+    ).fetchall()]
+    trip_id = conn.execute(
+        "SELECT id FROM trips WHERE route_id = %s AND trip_date = current_date", (route_id,)
+    ).fetchone()[0]
+    return {
+        "route_ids": route_ids,
+        "route_id": route_id,
+        "driver_id": driver_id,
+        "passenger_id": roster[0],
+        "roster": roster,
+        "others": others,
+        "trip_id": trip_id,
+    }
+
+
+def cases(ids):
+    """(serviço, nome, consulta, parâmetros) para cada consulta dos dois serviços."""
+    t = BENCH_TENANT
+    today = date.today()
+    rq, tq = routes_queries, trips_queries
+    fleet = ids["route_ids"][:50]
+    many = ids["route_ids"][:200]
+    day = datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
+    track = {
+        "tenant_id": t, "route_id": ids["route_id"], "trip_date": today,
+        "start": day - timedelta(days=1), "end": day + timedelta(days=2), "interval": 0, "limit": 5001,
+    }
+    # Um lote de POST /confirmations: todos os passageiros de uma rota a confirmar ao mesmo tempo
+    roster = ids["roster"]
+    confirmations = {
+        "tenant_id": t, "trip_date": today, "route_ids": [ids["route_id"]] * len(roster),
+        "passenger_ids": roster, "statuses": ["CONFIRMED"] * len(roster), "confirmed_at": [day] * len(roster),
+    }
+    list_routes = sql.SQL(rq.LIST_ROUTES).format(
+        sql.SQL(", ").join(map(sql.Identifier, ["id", "name", "driver_id", "tenant_id"]))
+    ) + sql.SQL(" LIMIT %s")
+
+    return [
+        ("routes_service", "list_routes_first_page", list_routes, (t, 0, 101)),
+        ("routes_service", "list_routes_middle_page", list_routes, (t, ids["route_id"], 101)),
+        ("routes_service", "route_by_id", rq.ROUTE_BY_ID, (ids["route_id"], t)),
+        ("routes_service", "route_exists", rq.ROUTE_EXISTS, (ids["route_id"], t)),
+        ("routes_service", "driver_exists", rq.DRIVER_EXISTS, (ids["driver_id"], t)),
+        ("routes_service", "insert_route", rq.INSERT_ROUTE, ("Rota benchmark", ids["driver_id"], t)),
+        ("routes_service", "passenger_exists", rq.PASSENGER_EXISTS, (ids["passenger_id"], t)),
+        ("routes_service", "insert_passenger_route", rq.INSERT_PASSENGER_ROUTE,
+         (ids["route_id"], ids["others"][0], t)),
+        ("routes_service", "roster_users", rq.ROSTER_USERS,
+         (ids["route_id"], t, ids["roster"] + ids["others"], [])),
+        ("routes_service", "insert_passenger_routes_bulk", rq.INSERT_PASSENGER_ROUTES_BULK,
+         (ids["route_id"], t, ids["others"])),
+        ("routes_service", "route_passengers", rq.ROUTE_PASSENGERS, (ids["route_id"], t)),
+        ("routes_service", "passenger_route", rq.PASSENGER_ROUTE, (ids["passenger_id"], t)),
+        ("routes_service", "driver_route", rq.DRIVER_ROUTE, (ids["driver_id"], t)),
+        ("trips_service", "materialize_trips", tq.MATERIALIZE_TRIPS, ([today, today + timedelta(days=1)],)),
+        ("trips_service", "ensure_trips", tq.ENSURE_TRIPS, confirmations),
+        ("trips_service", "upsert_confirmations_route", tq.UPSERT_CONFIRMATIONS, confirmations),
+        ("trips_service", "today_trip", tq.TODAY_TRIP, (ids["route_id"], today, t)),
+        ("trips_service", "roster_pending", tq.ROSTER_PENDING, (ids["route_id"], t)),
+        ("trips_service", "roster_confirmations", tq.ROSTER_CONFIRMATIONS, (ids["trip_id"], ids["route_id"], t)),
+        ("trips_service", "fleet_confirmations_50_routes", tq.FLEET_CONFIRMATIONS, (t, today, t, t, fleet, fleet)),
+        ("trips_service", "fleet_confirmations_tenant", tq.FLEET_CONFIRMATIONS, (t, today, t, t, None, None)),
+        ("trips_service", "trip_location", tq.TRIP_LOCATION, (ids["route_id"], today, t)),
+        ("trips_service", "location_history_track", tq.LOCATION_HISTORY_TRACK, track),
+        ("trips_service", "location_history_track_downsampled", tq.LOCATION_HISTORY_TRACK_DOWNSAMPLED,
+         {**track, "interval": 60}),
+        ("trips_service", "flush_live_locations_200", tq.FLUSH_LIVE_LOCATIONS,
+         ([t] * len(many), many, [today] * len(many), [38.75] * len(many), [-9.15] * len(many))),
+    ]
+
+
+# --- Medição ---
+
+def walk(node):
+    yield node
+    for child in node.get("Plans", []):
+        yield from walk(child)
+
+
+def explain(conn, query, params, repeat):
+    """Corre EXPLAIN ANALYZE `repeat` vezes (após um aquecimento) e resume os planos."""
+    if isinstance(query, str):
+        query = sql.SQL(query)
+    statement = sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ") + query
+
+    runs = []
+    for _ in range(repeat + 1):
+        with conn.transaction(force_rollback=True):
+            runs.append(conn.execute(statement, params).fetchone()[0][0])
+    runs = runs[1:]
+
+    plan = runs[-1]["Plan"]
+    nodes = list(walk(plan))
+    execution = [r["Execution Time"] for r in runs]
+    return {
+        "execution_ms": {
+            "median": round(statistics.median(execution), 3),
+            "min": round(min(execution), 3),
+            "max": round(max(execution), 3),
+        },
+        "planning_ms": round(statistics.median(r["Planning Time"] for r in runs), 3),
+        "rows": plan.get("Actual Rows"),
+        "node_types": sorted({n["Node Type"] for n in nodes}),
+        "seq_scans": sorted({
+            n["Relation Name"] for n in nodes
+            if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in LARGE_TABLES
+        }),
+        "shared_buffers": {
+            "hit": plan.get("Shared Hit Blocks", 0),
+            "read": plan.get("Shared Read Blocks", 0),
+        },
+    }
+
+
+def compare(results, baseline, threshold):
+    """Lista de regressões face a um relatório anterior."""
+    previous = {(q["service"], q["name"]): q for q in baseline["queries"]}
+    regressions = []
+    for q in results["queries"]:
+        before = previous.get((q["service"], q["name"]))
+        if before is None:
+            continue
+        now_ms, then_ms = q["execution_ms"]["median"], before["execution_ms"]["median"]
+        if now_ms > then_ms * threshold and now_ms - then_ms > MIN_REGRESSION_MS:
+            regressions.append(f"{q['service']}.{q['name']}: {then_ms} ms -> {now_ms} ms")
+        new_scans = set(q["seq_scans"]) - set(before["seq_scans"])
+        if new_scans:
+            regressions.append(f"{q['service']}.{q['name']}: novo Seq Scan em {', '.join(sorted(new_scans))}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE das consultas dos serviços sobre um tenant sintético.")
+    parser.add_argument("--dsn", default=DATABASE_URL)
+    parser.add_argument("--routes", type=int, default=2000, help="rotas (e motoristas) do tenant de teste")
+    parser.add_argument("--passengers-per-route", type=int, default=15)
+    parser.add_argument("--days", type=int, default=30, help="dias de histórico de viagens")
+    parser.add_argument("--history-points", type=int, default=720, help="pings GPS de hoje por rota")
+    parser.add_argument("--repeat", type=int, default=5, help="execuções medidas por consulta")
+    parser.add_argument("--reseed", action="store_true", help="recriar o tenant de teste mesmo que já exista")
+    parser.add_argument("--output", help="gravar o relatório JSON neste ficheiro")
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.5, help="rácio de tempo a partir do qual há regressão")
+    args = parser.parse_args(argv)
+
+    migrate(args.dsn)
+    with psycopg.connect(args.dsn, autocommit=True) as conn:
+        existing = conn.execute("SELECT count(*) FROM routes WHERE tenant_id = %s", (BENCH_TENANT,)).fetchone()[0]
+        if args.reseed or existing != args.routes:
+            seed(conn, args.routes, args.passengers_per_route, args.days, args.history_points)
+        ids = sample(conn)
+
+        results = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "server_version": conn.info.server_version,
+            "scale": {
+                "routes": args.routes,
+                "passengers_per_route": args.passengers_per_route,
+                "days": args.days,
+                "history_points": args.history_points,
+            },
+            "queries": [],
+        }
+        for service, name, query, params in cases(ids):
+            summary = explain(conn, query, params, args.repeat)
+            results["queries"].append({"service": service, "name": name, **summary})
+            flag = f"  Seq Scan: {', '.join(summary['seq_scans'])}" if summary["seq_scans"] else ""
+            print(f"{service:15} {name:32} {summary['execution_ms']['median']:9.3f} ms{flag}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Relatório gravado em {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSÃO {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
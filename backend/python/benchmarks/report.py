@@ -0,0 +1,73 @@
+# benchmarks/report.py
+# Funções comuns aos benchmarks: percentis, identificação do ambiente (commit,
+# Python, CPU) e comparação com um relatório JSON anterior, para que os
+# resultados de dois commits possam ser comparados lado a lado.
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+# Diferenças abaixo disto são ruído de medição, mesmo que o rácio seja grande.
+MIN_REGRESSION_MS = 0.5
+
+
+def latency_summary(samples_ms):
+    """p50/p95/p99 (e média, mínimo e máximo) de uma lista de tempos em ms."""
+    if not samples_ms:
+        return {"count": 0, "mean": None, "min": None, "p50": None, "p95": None, "p99": None, "max": None}
+    values = np.asarray(samples_ms, dtype=float)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": int(values.size),
+        "mean": round(float(values.mean()), 3),
+        "min": round(float(values.min()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "max": round(float(values.max()), 3),
+    }
+
+
+def git_commit():
+    """Commit do código medido (com "-dirty" se houver alterações por gravar)."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f"{commit}-dirty" if dirty else commit
+
+
+def environment():
+    return {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare_latency(current, baseline, threshold, metric="p95"):
+    """
+    Regressões entre dois dicionários {nome: latency_summary}: o `metric` ficou
+    mais de `threshold` vezes mais lento (e acima de MIN_REGRESSION_MS).
+    """
+    regressions = []
+    for name, now in current.items():
+        before = baseline.get(name)
+        if not before or now.get(metric) is None or before.get(metric) is None:
+            continue
+        now_ms, then_ms = now[metric], before[metric]
+        if now_ms > then_ms * threshold and now_ms - then_ms > MIN_REGRESSION_MS:
+            regressions.append(f"{name}: {metric} {then_ms} ms -> {now_ms} ms")
+    return regressions
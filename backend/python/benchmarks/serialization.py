@@ -0,0 +1,288 @@
+# benchmarks/serialization.py
+# Custo de CPU por pedido da serialização das respostas, com e sem o caminho
+# rápido de shared/serialization.py (JSON_FAST_PATH), nas respostas grandes dos
+# três serviços: confirmações do dia, lista de rotas, detalhe de rota em cache,
+# POST /optimize com geometria GeoJSON e GET /plans.
+#
+# Cada variante é servida por uma app FastAPI mínima com o mesmo response_model
+# do serviço, chamada diretamente pela interface ASGI (sem rede nem base de
+# dados): o trabalho comum (routing, ASGI) é igual nas variantes, e a diferença
+# entre elas é o CPU que o caminho rápido poupa. O corpo das variantes de cada
+# caso é comparado (depois de lido como JSON) para garantir que são equivalentes.
+#
+# Uso (a partir de backend/python):
+#   python -m benchmarks.serialization --output serialization.json
+#   python -m benchmarks.serialization --baseline serialization.json
+import argparse
+import asyncio
+import importlib.util
+import json
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import List
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from benchmarks.report import ROOT, compare_latency, environment, latency_summary
+from shared import serialization
+
+
+def load_service_main(service):
+    """Importa <service>/main.py (os módulos locais de cada serviço têm nomes repetidos, ex: queries)."""
+    path = ROOT / service
+    for module in path.glob("*.py"):
+        sys.modules.pop(module.stem, None)
+    sys.path.insert(0, str(path))
+    try:
+        spec = importlib.util.spec_from_file_location(f"{service}_main", path / "main.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(str(path))
+    return module
+
+
+# --- Respostas sintéticas ---
+
+def roster_rows(rng, passengers):
+    """Linhas de ROSTER_CONFIRMATIONS (dict_row), como chegam da base de dados."""
+    return [
+        {
+            "passenger_id": 1000 + i,
+            "passenger_name": f"Passageiro {i}",
+            "latitude": 38.70 + rng.random() * 0.1,
+            "longitude": -9.20 + rng.random() * 0.1,
+            "address": f"Rua {i}, Lisboa",
+            "status": "CONFIRMED" if rng.random() < 0.85 else "CANCELLED",
+        }
+        for i in range(passengers)
+    ]
+
+
+def fleet_payload(rng, routes, passengers_per_route):
+    """Resposta de GET /trips/today/confirmations antes da validação."""
+    summaries = []
+    totals = {}
+    for r in range(routes):
+        confirmations = roster_rows(rng, passengers_per_route)
+        counts = {}
+        for c in confirmations:
+            counts[c["status"]] = counts.get(c["status"], 0) + 1
+            totals[c["status"]] = totals.get(c["status"], 0) + 1
+        summaries.append({
+            "route_id": r + 1, "route_name": f"Rota {r + 1}", "counts": counts,
+            "total": len(confirmations), "confirmations": confirmations,
+        })
+    return {"trip_date": date.today(), "counts": totals, "total": sum(totals.values()), "routes": summaries}
+
+
+def route_rows(routes):
+    return [{"id": i, "name": f"Rota {i}", "driver_id": 5000 + i, "tenant_id": "cliente_alpha"}
+            for i in range(1, routes + 1)]
+
+
+def route_detail_payload(rng, passengers):
+    """Payload em cache de GET /routes/{route_id} (já validado e em tipos JSON)."""
+    return {
+        "id": 1, "name": "Rota 1", "driver_id": 5001, "tenant_id": "cliente_alpha",
+        "passengers": [
+            {"id": 1000 + i, "name": f"Passageiro {i}", "email": f"p{i}@exemplo.pt", "address": f"Rua {i}",
+             "latitude": 38.70 + rng.random() * 0.1, "longitude": -9.20 + rng.random() * 0.1}
+            for i in range(passengers)
+        ],
+    }
+
+
+def route_response(routing, rng, stops, geometry_points, steps):
+    """RouteResponse de POST /optimize com geometria GeoJSON completa (como sai de route_response_from_osrm)."""
+    t = np.linspace(0.0, 1.0, geometry_points)
+    coordinates = np.column_stack((-9.20 + 0.1 * t, 38.70 + 0.1 * t ** 2)).round(6).tolist()
+    return routing.RouteResponse(
+        optimized_order=[
+            routing.Location(id=i, name=f"Passageiro {i}", latitude=38.70 + rng.random() * 0.1,
+                             longitude=-9.20 + rng.random() * 0.1)
+            for i in range(1, stops + 1)
+        ],
+        total_distance_km=42.3,
+        total_duration_minutes=71.0,
+        geometry={"type": "LineString", "coordinates": coordinates},
+        steps=[
+            {"instruction": "turn", "modifier": "left", "name": f"Rua {i}",
+             "location": coordinates[i * geometry_points // steps], "distance": 123.4}
+            for i in range(steps)
+        ],
+        ordering=routing.OrderingSummary(
+            algorithm="two_opt+or_opt", initial_cost=50.1, final_cost=42.3, improvement_percent=15.57,
+            iterations=12, elapsed_ms=8.2, budget_exhausted=False,
+        ),
+    )
+
+
+def cases(rng):
+    """(nome, response_model, {variante: handler}) de cada resposta medida."""
+    trips = load_service_main("trips_service")
+    routes = load_service_main("routes_service")
+    routing = load_service_main("routing_service")
+
+    roster = roster_rows(rng, 40)
+    big_roster = roster_rows(rng, 500)
+    fleet = fleet_payload(rng, 200, 15)
+    page = route_rows(1000)
+    detail = route_detail_payload(rng, 60)
+    detail_body = serialization.dumps(detail)
+    optimized = route_response(routing, rng, 30, 6000, 150)
+    plan = routing.DailyPlanResponse(
+        route_id=1, trip_date=date.today().isoformat(), version=3, operation="unchanged", route=optimized,
+    )
+    plan_body = serialization.dumps(plan)
+
+    return [
+        ("trips_service GET /trips/today/{route_id}/confirmations (40)", List[trips.ConfirmationDetails], {
+            "response_model": lambda: roster,
+            "fast_path": lambda: serialization.FastJSONResponse(roster),
+        }),
+        ("trips_service GET /trips/today/{route_id}/confirmations (500)", List[trips.ConfirmationDetails], {
+            "response_model": lambda: big_roster,
+            "fast_path": lambda: serialization.FastJSONResponse(big_roster),
+        }),
+        ("trips_service GET /trips/today/confirmations (200x15)", trips.FleetConfirmationsResponse, {
+            "response_model": lambda: fleet,
+            "fast_path": lambda: serialization.FastJSONResponse(fleet),
+        }),
+        ("routes_service GET /routes (1000)", List[routes.RouteResponse], {
+            "response_model": lambda: page,
+            "json_response": lambda: JSONResponse(page),
+            "fast_path": lambda: serialization.FastJSONResponse(page),
+        }),
+        ("routes_service GET /routes/{route_id} (cache, 60)", routes.RouteDetailResponse, {
+            "json_response": lambda: JSONResponse(detail),
+            "cached_bytes": lambda: serialization.raw_response(detail_body),
+        }),
+        ("routing_service POST /optimize (30 paragens, 6000 pontos)", routing.RouteResponse, {
+            "response_model": lambda: optimized,
+            "fast_path": lambda: serialization.FastJSONResponse(optimized),
+        }),
+        ("routing_service GET /plans/{route_id} (30 paragens, 6000 pontos)", routing.DailyPlanResponse, {
+            "response_model": lambda: plan,
+            "cached_bytes": lambda: serialization.raw_response(plan_body),
+        }),
+    ]
+
+
+# --- Medição ---
+
+def build_app(response_model, variants):
+    app = FastAPI()
+    for variant, handler in variants.items():
+        app.add_api_route(f"/{variant}", handler, methods=["GET"], response_model=response_model)
+    return app
+
+
+async def call(app, path):
+    """Um pedido GET pela interface ASGI; devolve o corpo da resposta."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+        "headers": [], "client": ("benchmark", 0), "server": ("benchmark", 80),
+    }
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return b"".join(chunks)
+
+
+async def measure(app, path, repeat, warmup=3):
+    """CPU (ms) gasto em cada um de `repeat` pedidos, e o último corpo."""
+    body = b""
+    for _ in range(warmup):
+        body = await call(app, path)
+    samples = []
+    for _ in range(repeat):
+        started = time.process_time()
+        body = await call(app, path)
+        samples.append((time.process_time() - started) * 1000)
+    return samples, body
+
+
+async def run(repeat, seed):
+    results = []
+    for name, response_model, variants in cases(np.random.default_rng(seed)):
+        app = build_app(response_model, variants)
+        measured = {}
+        bodies = {}
+        for variant in variants:
+            samples, bodies[variant] = await measure(app, f"/{variant}", repeat)
+            measured[variant] = {"cpu_ms": latency_summary(samples), "response_bytes": len(bodies[variant])}
+        parsed = [json.loads(body) for body in bodies.values()]
+        baseline_variant = next(iter(variants))
+        fastest = min(measured, key=lambda v: measured[v]["cpu_ms"]["p50"])
+        before, after = measured[baseline_variant]["cpu_ms"]["p50"], measured[fastest]["cpu_ms"]["p50"]
+        results.append({
+            "name": name,
+            "variants": measured,
+            "same_output": all(p == parsed[0] for p in parsed[1:]),
+            "saved_cpu_ms_p50": round(before - after, 3),
+            "saved_percent": round((before - after) / before * 100, 1) if before else 0.0,
+        })
+        print(name)
+        for variant, m in measured.items():
+            print(f"    {variant:16} p50 {m['cpu_ms']['p50']:8.3f} ms  p95 {m['cpu_ms']['p95']:8.3f} ms"
+                  f"  {m['response_bytes']:>9} bytes")
+        print(f"    CPU poupado (p50): {results[-1]['saved_cpu_ms_p50']} ms ({results[-1]['saved_percent']}%)"
+              f"{'' if results[-1]['same_output'] else '  ATENÇÃO: respostas diferentes'}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Regressões de CPU (mediana) de cada variante face a um relatório anterior."""
+    def flatten(report):
+        return {f"{c['name']} [{v}]": m["cpu_ms"] for c in report["cases"] for v, m in c["variants"].items()}
+
+    regressions = compare_latency(flatten(results), flatten(baseline), threshold, metric="p50")
+    regressions += [f"{c['name']}: as variantes devolvem respostas diferentes"
+                    for c in results["cases"] if not c["same_output"]]
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CPU por pedido da serialização das respostas, com e sem caminho rápido.")
+    parser.add_argument("--repeat", type=int, default=200, help="pedidos medidos por variante")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="gravar o relatório JSON neste ficheiro")
+    parser.add_argument("--baseline", help="relatório anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=1.5, help="rácio de CPU a partir do qual há regressão")
+    args = parser.parse_args(argv)
+
+    results = {
+        **environment(),
+        "encoder": serialization.stats(),
+        "repeat": args.repeat,
+        "cases": asyncio.run(run(args.repeat, args.seed)),
+    }
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"Relatório gravado em {args.output}")
+
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in regressions:
+            print(f"REGRESSÃO {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,51 @@
 # main.py
-import os
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
+from psycopg import sql
+import asyncio
+import logging
+import os
+import time
 from dotenv import load_dotenv
-from typing import List
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-app = FastAPI()
+# O pool lê a configuração da base de dados das variáveis de ambiente,
+# por isso só é importado depois do load_dotenv().
+from shared.aiodb import close_async_pool, get_async_db, get_async_pool, open_async_pool
+from shared.migrate import DB_MIGRATE_ON_STARTUP, migrate
+from shared import instrumentation, serialization
+import queries
+import route_cache
+from roster_import import RosterFormatError, parse_roster
+import spatial
 
-# --- Configuração da Base de Dados ---
-DB_NAME = os.getenv("POSTGRES_DB", "van_management_db")
-DB_USER = os.getenv("POSTGRES_USER", "vanuser")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "vanpassword")
-DB_HOST = os.getenv("DB_HOST", "postgres")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate)
+    await open_async_pool()
+    yield
+    await close_async_pool()
 
-DATABASE_URL = f"dbname='{DB_NAME}' user='{DB_USER}' password='{DB_PASSWORD}' host='{DB_HOST}'"
+app = FastAPI(lifespan=lifespan)
+instrumentation.instrument(app, "routes_service")
+instrumentation.register_queries(queries)
+instrumentation.register_stats("db_pool", lambda: get_async_pool().stats())
+instrumentation.register_stats("route_cache", route_cache.cache.stats)
+instrumentation.register_stats("spatial_index", spatial.stats)
+instrumentation.register_stats("serialization", serialization.stats)
 
-def get_db_connection():
-    """Função para obter uma ligação à base de dados."""
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ Erro ao conectar à base de dados: {e}")
-        raise
+logger = logging.getLogger(__name__)
+
+ROUTES_PAGE_DEFAULT_LIMIT = int(os.getenv("ROUTES_PAGE_DEFAULT_LIMIT", "100"))  # rotas por página em GET /routes?after_id=
+ROUTES_PAGE_MAX_LIMIT = int(os.getenv("ROUTES_PAGE_MAX_LIMIT", "1000"))
+ROUTES_STREAM_BATCH = int(os.getenv("ROUTES_STREAM_BATCH", "500"))  # linhas por ida à base de dados no modo stream
 
 # --- Modelos de Dados (Pydantic) ---
 class RouteCreate(BaseModel):
@@ -51,180 +69,412 @@ class PassengerResponse(BaseModel):
 class RouteDetailResponse(RouteResponse):
     passengers: List[PassengerResponse] = []
 
+class RouteCandidate(BaseModel):
+    route_id: int
+    route_name: str
+    insertion_cost_km: float                        # desvio em linha reta ao incluir a nova paragem
+    position: int                                   # posição da nova paragem no percurso (1 = primeira)
+    insert_after_passenger_id: Optional[int] = None   # None = logo após a partida do motorista
+    insert_before_passenger_id: Optional[int] = None  # None = última paragem
+    passengers: int
+
+class BestRoutesResponse(BaseModel):
+    latitude: float
+    longitude: float
+    candidates: List[RouteCandidate]
+    routes_evaluated: int
+    compute_us: float
+
+class NearbyStop(BaseModel):
+    route_id: int
+    passenger_id: Optional[int] = None
+    kind: Literal["passenger", "driver_start"]
+    distance_km: float
+
+class RosterConflict(BaseModel):
+    row: int
+    passenger_id: Optional[int] = None
+    email: Optional[str] = None
+    reason: str  # invalid | not_found | wrong_role | already_enrolled | duplicate
+
+class BulkEnrollResponse(BaseModel):
+    route_id: int
+    received: int
+    enrolled: List[int]
+    conflicts: List[RosterConflict]
+
+ROUTE_FIELDS = tuple(RouteResponse.model_fields)
+
+def route_columns(fields):
+    """Colunas pedidas em `fields` (o id vai sempre, é a chave da paginação)."""
+    if not fields:
+        return list(ROUTE_FIELDS)
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - set(ROUTE_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos desconhecidos: {', '.join(sorted(unknown))}")
+    return ["id"] + [f for f in ROUTE_FIELDS if f in requested and f != "id"]
+
+async def stream_routes(query, params):
+    """Linhas em NDJSON, lidas em lotes por um cursor do lado do servidor."""
+    try:
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor(name="routes_export") as cur:
+                cur.itersize = ROUTES_STREAM_BATCH
+                await cur.execute(query, params)
+                async for row in cur:
+                    yield serialization.dumps(row) + b"\n"
+    except psycopg.Error as e:
+        # Os cabeçalhos já foram enviados: o cliente vê o stream terminar a meio.
+        logger.error("Erro na base de dados durante a exportação de rotas: %s", e)
+
 # --- ROTAS ---
 
 @app.get("/")
 def read_root():
     return {"message": "Olá, Mundo! Este é o Serviço de Rotas."}
 
-@app.get("/routes", response_model=List[RouteResponse])
-def get_all_routes():
-    # (Código existente - sem alterações)
+@app.get("/db/pool")
+def get_pool_stats():
+    """Métricas do pool de ligações (saturação e tempos de espera) para dimensionamento."""
+    return get_async_pool().stats()
+
+@app.get("/routes", response_model=List[RouteResponse], responses={200: {
+    "description": "Rotas do tenant. Com `fields`, cada rota traz só `id` e as colunas pedidas.",
+}})
+async def get_all_routes(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=ROUTES_PAGE_MAX_LIMIT),
+    after_id: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None,
+    stream: bool = False,
+):
+    """
+    Lista as rotas do tenant por ordem de id. Sem `limit` nem `after_id` devolve
+    todas (como a app espera em getRoutes()). Com algum deles a lista vem em
+    páginas (keyset): `after_id` é o último id recebido, `limit` o tamanho da
+    página (ROUTES_PAGE_DEFAULT_LIMIT por omissão); o próximo `after_id` vem no
+    cabeçalho X-Next-After-Id enquanto houver mais. `fields` (ex: "id,name")
+    limita as colunas: cada rota traz só essas chaves, em vez da forma completa
+    de RouteResponse, e a resposta não passa pelo response_model. Com `stream=true` todas as rotas a partir de `after_id`
+    são enviadas em NDJSON, lidas com um cursor do lado do servidor, sem limite de página.
+    """
     tenant_id = "cliente_alpha"
-    conn = None
+    columns = route_columns(fields)
+    query = sql.SQL(queries.LIST_ROUTES).format(
+        sql.SQL(", ").join(map(sql.Identifier, columns))
+    )
+    paged = limit is not None or after_id is not None
+    after_id = after_id or 0
+
+    if stream:
+        return StreamingResponse(stream_routes(query, (tenant_id, after_id)), media_type="application/x-ndjson")
+
+    if paged:
+        limit = limit or ROUTES_PAGE_DEFAULT_LIMIT
+        query, params = query + sql.SQL(" LIMIT %s"), (tenant_id, after_id, limit + 1)
+    else:
+        params = (tenant_id, after_id)
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT * FROM routes WHERE tenant_id = %s",
-                (tenant_id,)
-            )
-            routes = cur.fetchall()
-            return routes
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(query, params)
+                routes = await cur.fetchall()
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
+
+    headers = {}
+    if paged and len(routes) > limit:
+        routes = routes[:limit]
+        headers["X-Next-After-Id"] = str(routes[-1]["id"])
+    if fields:
+        # Só as colunas pedidas: não tem a forma de RouteResponse
+        return serialization.json_response(routes, headers=headers)
+    response.headers.update(headers)
+    return serialization.fast_response(routes, headers=headers)
 
 @app.post("/routes", response_model=RouteResponse)
-def create_route(route: RouteCreate):
+async def create_route(route: RouteCreate, conn=Depends(get_async_db)):
     # (Código existente - sem alterações)
     tenant_id = "cliente_alpha"
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT id FROM users WHERE id = %s AND role = 'MOTORISTA' AND tenant_id = %s",
+        async with conn.cursor() as cur:
+            await cur.execute(
+                queries.DRIVER_EXISTS,
                 (route.driver_id, tenant_id)
             )
-            if not cur.fetchone():
+            if not await cur.fetchone():
                 raise HTTPException(status_code=404, detail="Motorista não encontrado ou inválido.")
 
-            cur.execute(
-                "INSERT INTO routes (name, driver_id, tenant_id) VALUES (%s, %s, %s) RETURNING id, name, driver_id, tenant_id",
+            await cur.execute(
+                queries.INSERT_ROUTE,
                 (route.name, route.driver_id, tenant_id)
             )
-            new_route = cur.fetchone()
-            conn.commit()
+            new_route = await cur.fetchone()
+            await conn.commit()
+            route_cache.invalidate(route_cache.driver_key(tenant_id, route.driver_id))
+            spatial.route_changed(get_async_pool(), tenant_id, new_route["id"])
             return new_route
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor ao criar a rota.")
-    finally:
-        if conn:
-            conn.close()
 
 @app.post("/routes/{route_id}/passengers", status_code=201)
-def add_passenger_to_route(route_id: int, passenger: PassengerAdd):
+async def add_passenger_to_route(route_id: int, passenger: PassengerAdd, conn=Depends(get_async_db)):
     # (Código existente - sem alterações)
     tenant_id = "cliente_alpha"
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT id FROM users WHERE id = %s AND role = 'PASSAGEIRO' AND tenant_id = %s",
+        async with conn.cursor() as cur:
+            await cur.execute(
+                queries.PASSENGER_EXISTS,
                 (passenger.passenger_id, tenant_id)
             )
-            if not cur.fetchone():
+            if not await cur.fetchone():
                 raise HTTPException(status_code=404, detail="Passageiro não encontrado ou inválido.")
 
-            cur.execute(
-                "SELECT id FROM routes WHERE id = %s AND tenant_id = %s",
+            await cur.execute(
+                queries.ROUTE_EXISTS,
                 (route_id, tenant_id)
             )
-            if not cur.fetchone():
+            if not await cur.fetchone():
                 raise HTTPException(status_code=404, detail="Rota não encontrada.")
 
-            cur.execute(
-                "INSERT INTO passenger_routes (route_id, passenger_id, tenant_id) VALUES (%s, %s, %s)",
+            await cur.execute(
+                queries.INSERT_PASSENGER_ROUTE,
                 (route_id, passenger.passenger_id, tenant_id)
             )
-            conn.commit()
+            await conn.commit()
+            route_cache.invalidate(
+                route_cache.route_key(tenant_id, route_id),
+                route_cache.passenger_key(tenant_id, passenger.passenger_id),
+            )
+            spatial.route_changed(get_async_pool(), tenant_id, route_id)
             return {"message": "Passageiro adicionado à rota com sucesso."}
-    except psycopg2.IntegrityError:
+    except psycopg.IntegrityError:
         raise HTTPException(status_code=409, detail="Este passageiro já está nesta rota.")
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
 
-@app.get("/routes/{route_id}", response_model=RouteDetailResponse)
-def get_route_details(route_id: int):
-    # (Código existente - sem alterações)
+@app.post("/routes/{route_id}/passengers/bulk", response_model=BulkEnrollResponse)
+async def bulk_add_passengers_to_route(route_id: int, request: Request):
+    """
+    Inscreve vários passageiros de uma vez (JSON ou CSV, ver roster_import.py).
+    Valida todos numa só consulta e insere-os numa só instrução e transação;
+    as linhas com problemas são devolvidas em `conflicts` sem abortar o lote.
+    """
     tenant_id = "cliente_alpha"
-    conn = None
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute(
-                "SELECT * FROM routes WHERE id = %s AND tenant_id = %s",
-                (route_id, tenant_id)
-            )
-            route_details = cur.fetchone()
-            if not route_details:
-                raise HTTPException(status_code=404, detail="Rota não encontrada.")
+        rows, invalid = parse_roster(request.headers.get("content-type"), await request.body())
+    except RosterFormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    conflicts = [RosterConflict(row=r.row, reason="invalid") for r in invalid]
+    ids = sorted({r.passenger_id for r in rows if r.passenger_id is not None})
+    emails = sorted({r.email for r in rows if r.email is not None})
+
+    try:
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    queries.ROUTE_EXISTS,
+                    (route_id, tenant_id)
+                )
+                if not await cur.fetchone():
+                    raise HTTPException(status_code=404, detail="Rota não encontrada.")
+
+                # Utilizadores pedidos (por id ou email) e se já estão nesta rota
+                await cur.execute(queries.ROSTER_USERS, (route_id, tenant_id, ids, emails))
+                users = await cur.fetchall()
+                by_id = {u["id"]: u for u in users}
+                by_email = {u["email"]: u for u in users}
+
+                to_insert = []
+                seen = set()
+                for r in rows:
+                    user = by_id.get(r.passenger_id) if r.passenger_id is not None else by_email.get(r.email)
+                    if user is None:
+                        reason = "not_found"
+                    elif user["role"] != "PASSAGEIRO":
+                        reason = "wrong_role"
+                    elif user["enrolled"]:
+                        reason = "already_enrolled"
+                    elif user["id"] in seen:
+                        reason = "duplicate"
+                    else:
+                        seen.add(user["id"])
+                        to_insert.append((r, user["id"]))
+                        continue
+                    conflicts.append(RosterConflict(
+                        row=r.row, passenger_id=user["id"] if user else r.passenger_id, email=r.email, reason=reason
+                    ))
+
+                enrolled = []
+                if to_insert:
+                    # ON CONFLICT cobre inscrições feitas em paralelo desde a validação
+                    await cur.execute(queries.INSERT_PASSENGER_ROUTES_BULK, (route_id, tenant_id, [pid for _, pid in to_insert]))
+                    inserted = {row["passenger_id"] for row in await cur.fetchall()}
+                    for r, pid in to_insert:
+                        if pid in inserted:
+                            enrolled.append(pid)
+                        else:
+                            conflicts.append(RosterConflict(
+                                row=r.row, passenger_id=pid, email=r.email, reason="already_enrolled"
+                            ))
+                await conn.commit()
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+
+    if enrolled:
+        route_cache.invalidate(
+            route_cache.route_key(tenant_id, route_id),
+            *(route_cache.passenger_key(tenant_id, pid) for pid in enrolled),
+        )
+        spatial.route_changed(get_async_pool(), tenant_id, route_id)
+    conflicts.sort(key=lambda c: c.row)
+    return BulkEnrollResponse(
+        route_id=route_id, received=len(rows) + len(invalid), enrolled=enrolled, conflicts=conflicts
+    )
+
+@app.get("/routes/{route_id}", response_model=RouteDetailResponse)
+async def get_route_details(route_id: int, request: Request):
+    """Detalhe da rota com a lista de passageiros (em cache, com suporte a ETag / 304)."""
+    tenant_id = "cliente_alpha"
+
+    async def load():
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    queries.ROUTE_BY_ID,
+                    (route_id, tenant_id)
+                )
+                route_details = await cur.fetchone()
+                if not route_details:
+                    raise HTTPException(status_code=404, detail="Rota não encontrada.")
+
+                await cur.execute(queries.ROUTE_PASSENGERS, (route_id, tenant_id))
+                passengers = await cur.fetchall()
 
-            cur.execute("""
-                SELECT u.id, u.name, u.email
-                FROM users u
-                JOIN passenger_routes pr ON u.id = pr.passenger_id
-                WHERE pr.route_id = %s AND pr.tenant_id = %s
-            """, (route_id, tenant_id))
-            passengers = cur.fetchall()
-
-            route_details["passengers"] = passengers
-            return route_details
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+                route_details["passengers"] = passengers
+                return RouteDetailResponse.model_validate(route_details).model_dump(mode="json")
+
+    try:
+        entry = await route_cache.read_through(route_cache.route_key(tenant_id, route_id), load)
+        return route_cache.cached_response(request, entry)
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
 
 # --- NOVA ROTA ---
 @app.get("/passengers/{passenger_id}/route", response_model=RouteResponse)
-def get_passenger_route(passenger_id: int):
+async def get_passenger_route(passenger_id: int, request: Request):
     """Obtém a rota principal de um passageiro."""
     tenant_id = "cliente_alpha"
-    conn = None
+
+    async def load():
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                # Fazemos um JOIN para encontrar a rota a partir do ID do passageiro
+                await cur.execute(queries.PASSENGER_ROUTE, (passenger_id, tenant_id))
+                route = await cur.fetchone()
+                if not route:
+                    raise HTTPException(status_code=404, detail="Passageiro não associado a nenhuma rota.")
+                return RouteResponse.model_validate(route).model_dump(mode="json")
+
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # Fazemos um JOIN para encontrar a rota a partir do ID do passageiro
-            cur.execute("""
-                SELECT r.id, r.name, r.driver_id, r.tenant_id
-                FROM routes r
-                JOIN passenger_routes pr ON r.id = pr.route_id
-                WHERE pr.passenger_id = %s AND r.tenant_id = %s
-                LIMIT 1;
-            """, (passenger_id, tenant_id))
-            route = cur.fetchone()
-            if not route:
-                raise HTTPException(status_code=404, detail="Passageiro não associado a nenhuma rota.")
-            return route
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+        entry = await route_cache.read_through(route_cache.passenger_key(tenant_id, passenger_id), load)
+        return route_cache.cached_response(request, entry)
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
 
 # Adicionar ao routes_service/main.py
 @app.get("/drivers/{driver_id}/route", response_model=RouteResponse)
-def get_driver_route(driver_id: int):
+async def get_driver_route(driver_id: int, request: Request):
     """Obtém a rota associada a um motorista."""
     tenant_id = "cliente_alpha"
-    conn = None
+
+    async def load():
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(queries.DRIVER_ROUTE, (driver_id, tenant_id))
+                route = await cur.fetchone()
+                if not route:
+                    raise HTTPException(status_code=404, detail="Motorista não possui rota atribuída.")
+                return RouteResponse.model_validate(route).model_dump(mode="json")
+
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT id, name, driver_id, tenant_id
-                FROM routes
-                WHERE driver_id = %s AND tenant_id = %s
-                LIMIT 1;
-            """, (driver_id, tenant_id))
-            route = cur.fetchone()
-            if not route:
-                raise HTTPException(status_code=404, detail="Motorista não possui rota atribuída.")
-            return route
-    except psycopg2.Error as e:
+        entry = await route_cache.read_through(route_cache.driver_key(tenant_id, driver_id), load)
+        return route_cache.cached_response(request, entry)
+    except psycopg.Error as e:
         raise HTTPException(status_code=500, detail="Erro ao procurar rota do motorista.")
-    finally:
-        if conn: conn.close()
\ No newline at end of file
+
+@app.get("/assignments/best-routes", response_model=BestRoutesResponse)
+async def get_best_routes(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    k: int = Query(3, ge=1, le=50),
+):
+    """
+    As k rotas onde juntar um passageiro nesta morada custa menos: desvio em
+    linha reta ao inserir a paragem na posição mais barata do percurso atual.
+    """
+    tenant_id = "cliente_alpha"
+    try:
+        index = await spatial.get_index(get_async_pool(), tenant_id)
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+
+    started = time.perf_counter()
+    best, evaluated = index.best_routes(latitude, longitude, k)
+    candidates = [
+        RouteCandidate(
+            route_id=route.route_id,
+            route_name=route.name,
+            insertion_cost_km=round(cost, 3),
+            position=position,
+            insert_after_passenger_id=after,
+            insert_before_passenger_id=before,
+            passengers=len(route.stops),
+        )
+        for (cost, position, after, before), route in best
+    ]
+    return BestRoutesResponse(
+        latitude=latitude,
+        longitude=longitude,
+        candidates=candidates,
+        routes_evaluated=evaluated,
+        compute_us=round((time.perf_counter() - started) * 1e6, 1),
+    )
+
+@app.get("/stops/nearby", response_model=List[NearbyStop])
+async def get_nearby_stops(
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(500, gt=0, le=50000),
+    limit: int = Query(50, ge=1, le=1000),
+):
+    """Paragens de passageiros e partidas de motoristas a menos de radius_m metros, por distância."""
+    tenant_id = "cliente_alpha"
+    try:
+        index = await spatial.get_index(get_async_pool(), tenant_id)
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+    return [
+        NearbyStop(
+            route_id=route_id,
+            passenger_id=passenger_id,
+            kind="driver_start" if passenger_id is None else "passenger",
+            distance_km=round(distance, 3),
+        )
+        for distance, route_id, passenger_id in index.nearby(latitude, longitude, radius_m, limit)
+    ]
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    """Taxa de acerto da cache de rotas e passageiros."""
+    return route_cache.cache.stats()
@@ -0,0 +1,76 @@
+# queries.py
+# SQL do serviço de rotas. Fica num só sítio para ser partilhado pelos handlers
+# e pelo benchmark de planos de execução (benchmarks/query_plans.py), que corre
+# EXPLAIN ANALYZE sobre cada uma destas consultas.
+# Índices usados: ver shared/migrations/0002_hot_path_indexes.sql.
+
+# GET /routes (paginação por id; as colunas são escolhidas com psycopg.sql)
+LIST_ROUTES = "SELECT {} FROM routes WHERE tenant_id = %s AND id > %s ORDER BY id"
+
+ROUTE_BY_ID = "SELECT * FROM routes WHERE id = %s AND tenant_id = %s"
+
+ROUTE_EXISTS = "SELECT id FROM routes WHERE id = %s AND tenant_id = %s"
+
+DRIVER_EXISTS = "SELECT id FROM users WHERE id = %s AND role = 'MOTORISTA' AND tenant_id = %s"
+
+INSERT_ROUTE = "INSERT INTO routes (name, driver_id, tenant_id) VALUES (%s, %s, %s) RETURNING id, name, driver_id, tenant_id"
+
+PASSENGER_EXISTS = "SELECT id FROM users WHERE id = %s AND role = 'PASSAGEIRO' AND tenant_id = %s"
+
+INSERT_PASSENGER_ROUTE = "INSERT INTO passenger_routes (route_id, passenger_id, tenant_id) VALUES (%s, %s, %s)"
+
+ROSTER_USERS = """
+SELECT u.id, lower(u.email) AS email, u.role, pr.passenger_id IS NOT NULL AS enrolled
+FROM users u
+LEFT JOIN passenger_routes pr ON pr.passenger_id = u.id AND pr.route_id = %s
+WHERE u.tenant_id = %s AND (u.id = ANY(%s::int[]) OR lower(u.email) = ANY(%s::text[]))
+"""
+
+INSERT_PASSENGER_ROUTES_BULK = """
+INSERT INTO passenger_routes (route_id, passenger_id, tenant_id)
+SELECT %s, p.passenger_id, %s FROM unnest(%s::int[]) AS p(passenger_id)
+ON CONFLICT DO NOTHING
+RETURNING passenger_id
+"""
+
+ROUTE_PASSENGERS = """
+SELECT u.id, u.name, u.email
+FROM users u
+JOIN passenger_routes pr ON u.id = pr.passenger_id
+WHERE pr.route_id = %s AND pr.tenant_id = %s
+"""
+
+# Índice espacial (spatial.py): ponto de partida do motorista e paragens de cada rota
+_SPATIAL_STOPS_SELECT = """
+SELECT
+    r.id AS route_id,
+    r.name AS route_name,
+    d.latitude AS driver_latitude,
+    d.longitude AS driver_longitude,
+    u.id AS passenger_id,
+    u.latitude,
+    u.longitude
+FROM routes r
+LEFT JOIN users d ON d.id = r.driver_id
+LEFT JOIN passenger_routes pr ON pr.route_id = r.id
+LEFT JOIN users u ON u.id = pr.passenger_id
+"""
+
+SPATIAL_STOPS = _SPATIAL_STOPS_SELECT + "WHERE r.tenant_id = %s"
+
+SPATIAL_ROUTE_STOPS = _SPATIAL_STOPS_SELECT + "WHERE r.id = %s AND r.tenant_id = %s"
+
+PASSENGER_ROUTE = """
+SELECT r.id, r.name, r.driver_id, r.tenant_id
+FROM routes r
+JOIN passenger_routes pr ON r.id = pr.route_id
+WHERE pr.passenger_id = %s AND r.tenant_id = %s
+LIMIT 1
+"""
+
+DRIVER_ROUTE = """
+SELECT id, name, driver_id, tenant_id
+FROM routes
+WHERE driver_id = %s AND tenant_id = %s
+LIMIT 1
+"""
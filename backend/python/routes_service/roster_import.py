@@ -0,0 +1,116 @@
+# roster_import.py
+# Leitura do ficheiro de inscrição em massa de passageiros numa rota
+# (POST /routes/{route_id}/passengers/bulk).
+#
+# Formatos aceites:
+#   JSON: [12, 13, ...]  ou  [{"passenger_id": 12}, {"email": "ana@escola.pt"}, ...]
+#   CSV:  cabeçalho com uma coluna "passenger_id" e/ou "email"
+#
+# Cada linha é identificada pelo seu número (1 = primeira linha de dados), para
+# que os conflitos possam ser apontados ao utilizador sem abortar o lote.
+import csv
+import io
+import json
+import os
+
+ROSTER_IMPORT_MAX_ROWS = int(os.getenv("ROSTER_IMPORT_MAX_ROWS", "5000"))  # linhas por pedido
+
+# Os ids vão para a base de dados como int[] (INTEGER do PostgreSQL)
+_MAX_ID = 2 ** 31 - 1
+
+# Chave do DictReader para os campos a mais numa linha do CSV
+_CSV_EXTRA_FIELDS = "\0extra"
+
+
+class RosterFormatError(ValueError):
+    """O corpo do pedido não é um JSON/CSV de inscrição válido."""
+
+
+class RosterRow:
+    __slots__ = ("row", "passenger_id", "email")
+
+    def __init__(self, row, passenger_id=None, email=None):
+        self.row = row
+        self.passenger_id = passenger_id
+        self.email = email
+
+
+def _parse_id(value):
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float) and not value.is_integer():
+        raise ValueError(value)  # 1.9 não é o passageiro 1
+    passenger_id = int(value)
+    if not 1 <= passenger_id <= _MAX_ID:
+        raise ValueError(value)  # fora do intervalo de um INTEGER: a consulta falharia para o lote todo
+    return passenger_id
+
+
+def _normalize_email(value):
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise ValueError(value)
+    return value.strip().lower() or None
+
+
+def _parse_entries(entries):
+    """Converte as entradas já lidas em (linhas válidas, linhas inválidas)."""
+    rows, invalid = [], []
+    for number, entry in enumerate(entries, start=1):
+        try:
+            if isinstance(entry, dict):
+                row = RosterRow(number, _parse_id(entry.get("passenger_id")), _normalize_email(entry.get("email")))
+            else:
+                row = RosterRow(number, _parse_id(entry))
+        except (TypeError, ValueError):
+            invalid.append(RosterRow(number))
+            continue
+        if row.passenger_id is None and row.email is None:
+            invalid.append(row)
+        else:
+            rows.append(row)
+    return rows, invalid
+
+
+def parse_roster(content_type, body):
+    """
+    Lê o corpo do pedido conforme o Content-Type (JSON ou CSV).
+    Devolve (linhas válidas, linhas inválidas) ou lança RosterFormatError.
+    """
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    try:
+        text = body.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise RosterFormatError("O ficheiro tem de estar em UTF-8.")
+
+    if content_type in ("text/csv", "application/csv"):
+        reader = csv.DictReader(io.StringIO(text), restkey=_CSV_EXTRA_FIELDS, restval="")
+        fields = {name.strip().lower() for name in reader.fieldnames or []}
+        if not fields & {"passenger_id", "email"}:
+            raise RosterFormatError("O CSV tem de ter uma coluna 'passenger_id' ou 'email'.")
+        entries = []
+        for line in reader:
+            # Mais valores do que colunas no cabeçalho: a linha é inválida
+            # (vírgulas a mais no fim, sem valores, são toleradas).
+            if any(value.strip() for value in line.pop(_CSV_EXTRA_FIELDS, [])):
+                entries.append(None)
+                continue
+            entries.append({key.strip().lower(): (value or "").strip() for key, value in line.items()})
+    elif content_type in ("application/json", ""):
+        try:
+            entries = json.loads(text)
+        except ValueError:
+            raise RosterFormatError("JSON inválido.")
+        if isinstance(entries, dict):
+            entries = entries.get("passengers", entries.get("passenger_ids"))
+        if not isinstance(entries, list):
+            raise RosterFormatError("Esperada uma lista de passageiros.")
+    else:
+        raise RosterFormatError("Content-Type não suportado (use application/json ou text/csv).")
+
+    if len(entries) > ROSTER_IMPORT_MAX_ROWS:
+        raise RosterFormatError(f"Máximo de {ROSTER_IMPORT_MAX_ROWS} passageiros por pedido.")
+    return _parse_entries(entries)
@@ -0,0 +1,69 @@
+# route_cache.py
+# Cache de leitura (read-through) para os dados de rotas, que mudam poucas vezes
+# por semana mas são lidos a cada abertura da app: detalhe da rota com a lista
+# de passageiros e as associações passageiro -> rota e motorista -> rota.
+#
+# As chaves começam sempre pelo tenant_id. As escritas deste serviço invalidam
+# as entradas afetadas; com vários workers, o TTL limita o tempo em que um
+# worker pode servir dados antigos.
+#
+# Cada entrada guarda o corpo JSON já serializado: um acerto na cache envia
+# esses bytes tal como estão, sem voltar a codificar o payload.
+import hashlib
+import os
+
+from fastapi import Request, Response
+
+from shared import serialization
+from shared.cache import TTLCache
+
+ROUTES_CACHE_TTL = float(os.getenv("ROUTES_CACHE_TTL", "60"))       # segundos
+ROUTES_CACHE_SIZE = int(os.getenv("ROUTES_CACHE_SIZE", "10000"))    # entradas
+
+cache = TTLCache(max_size=ROUTES_CACHE_SIZE, ttl=ROUTES_CACHE_TTL)
+
+
+class CachedPayload:
+    """Resposta já validada, o corpo JSON serializado e o respetivo ETag."""
+
+    __slots__ = ("payload", "body", "etag")
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.body = serialization.dumps(payload)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+
+
+def route_key(tenant_id, route_id):
+    return (tenant_id, "route", route_id)
+
+
+def passenger_key(tenant_id, passenger_id):
+    return (tenant_id, "passenger", passenger_id)
+
+
+def driver_key(tenant_id, driver_id):
+    return (tenant_id, "driver", driver_id)
+
+
+async def read_through(key, loader):
+    """Devolve a entrada em cache ou carrega-a com `await loader()` (pedidos iguais partilham a carga)."""
+    async def load():
+        return CachedPayload(await loader())
+    return await cache.get_or_load(key, load)
+
+
+def invalidate(*keys):
+    for key in keys:
+        cache.delete(key)
+
+
+def cached_response(request: Request, entry: CachedPayload):
+    """200 com ETag, ou 304 sem corpo se o cliente já tiver esta versão (If-None-Match)."""
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        if entry.etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return serialization.raw_response(entry.body, headers=headers)
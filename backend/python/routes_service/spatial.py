@@ -0,0 +1,299 @@
+# spatial.py
+# Índice espacial em memória das paragens (coordenadas dos passageiros de cada
+# rota) e do ponto de partida de cada motorista, para sugerir a que rota
+# juntar um novo passageiro sem percorrer todas as rotas do tenant.
+#
+# As paragens ficam numa grelha regular lat/lon (células de ~SPATIAL_CELL_METERS);
+# uma procura de paragens próximas só visita as células que cobrem o raio.
+# Para cada rota guarda-se também um percurso aproximado (vizinho mais próximo a
+# partir do motorista), sobre o qual se calcula o custo de inserção em linha reta.
+#
+# O índice de um tenant é carregado na primeira utilização, atualizado rota a
+# rota pelas escritas deste serviço e recarregado por inteiro a cada
+# SPATIAL_INDEX_REFRESH segundos (alterações feitas noutros serviços). As rotas
+# alteradas durante um recarregamento são relidas antes de o novo índice entrar
+# em uso, porque a leitura do tenant pode ser anterior ao COMMIT. É por
+# processo, como a cache de rotas.
+import asyncio
+import logging
+import math
+import os
+import time
+
+import queries
+from shared.geo import haversine_km
+
+SPATIAL_CELL_METERS = float(os.getenv("SPATIAL_CELL_METERS", "500"))            # lado de cada célula da grelha
+SPATIAL_INDEX_REFRESH = float(os.getenv("SPATIAL_INDEX_REFRESH", "300"))        # segundos até recarregar o tenant
+SPATIAL_CANDIDATE_RADIUS_M = float(os.getenv("SPATIAL_CANDIDATE_RADIUS_M", "2000"))  # raio inicial dos candidatos
+SPATIAL_MAX_RADIUS_M = float(os.getenv("SPATIAL_MAX_RADIUS_M", "50000"))        # raio máximo da procura
+SPATIAL_CANDIDATE_FACTOR = int(os.getenv("SPATIAL_CANDIDATE_FACTOR", "3"))      # rotas avaliadas por cada uma pedida
+SPATIAL_FULL_SCAN_ROUTES = int(os.getenv("SPATIAL_FULL_SCAN_ROUTES", "200"))    # até aqui, avalia todas as rotas
+
+_METERS_PER_DEGREE_LAT = 111_320.0
+
+logger = logging.getLogger(__name__)
+
+
+class RouteStops:
+    """Paragens de uma rota e o percurso aproximado entre elas."""
+
+    __slots__ = ("route_id", "name", "start", "stops", "_tour")
+
+    def __init__(self, route_id, name, start=None):
+        self.route_id = route_id
+        self.name = name
+        self.start = start      # (lat, lon) do motorista, ou None
+        self.stops = {}         # passenger_id -> (lat, lon)
+        self._tour = None
+
+    def tour(self):
+        """[(passenger_id, lat, lon)] por ordem de vizinho mais próximo a partir do motorista."""
+        if self._tour is None:
+            remaining = dict(self.stops)
+            tour = []
+            current = self.start
+            while remaining:
+                if current is None:
+                    passenger_id = next(iter(remaining))
+                else:
+                    passenger_id = min(remaining, key=lambda p: haversine_km(*current, *remaining[p]))
+                current = remaining.pop(passenger_id)
+                tour.append((passenger_id, *current))
+            self._tour = tour
+        return self._tour
+
+    def insertion(self, latitude, longitude):
+        """
+        (custo km, posição, passageiro antes, passageiro depois) da inserção mais
+        barata no percurso; posição 1 = primeira paragem. None sem pontos.
+        """
+        points = ([(None, *self.start)] if self.start else []) + self.tour()
+        if not points:
+            return None
+        to_new = [haversine_km(lat, lon, latitude, longitude) for _, lat, lon in points]
+        offset = 0 if self.start else 1  # sem motorista, points[0] já é a 1ª paragem
+
+        # No fim do percurso
+        best = (to_new[-1], len(points) + offset, points[-1][0], None)
+        # No início, se não houver ponto de partida do motorista
+        if not self.start and to_new[0] < best[0]:
+            best = (to_new[0], 1, None, points[0][0])
+        for i in range(len(points) - 1):
+            a, b = points[i], points[i + 1]
+            cost = to_new[i] + to_new[i + 1] - haversine_km(a[1], a[2], b[1], b[2])
+            if cost < best[0]:
+                best = (cost, i + 1 + offset, a[0], b[0])
+        return best
+
+
+class SpatialIndex:
+    """Grelha lat/lon das paragens e pontos de partida de um tenant."""
+
+    def __init__(self, cell_meters=SPATIAL_CELL_METERS):
+        self.cell_meters = cell_meters
+        self.cell_lat = cell_meters / _METERS_PER_DEGREE_LAT
+        self.cell_lon = self.cell_lat  # ajustado à latitude do tenant em load()
+        self.routes = {}     # route_id -> RouteStops
+        self._cells = {}     # (i, j) -> {(route_id, passenger_id ou None)}
+        self._points = {}    # (route_id, passenger_id ou None) -> (lat, lon)
+        self.loaded_at = 0.0
+
+    def _cell(self, latitude, longitude):
+        return (math.floor(latitude / self.cell_lat), math.floor(longitude / self.cell_lon))
+
+    def _add_point(self, key, latitude, longitude):
+        self._points[key] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), set()).add(key)
+
+    def _remove_point(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        members = self._cells.get(cell)
+        if members is not None:
+            members.discard(key)
+            if not members:
+                del self._cells[cell]
+
+    def load(self, rows):
+        """Reconstrói o índice a partir das linhas de SPATIAL_STOPS."""
+        rows = list(rows)
+        latitudes = [r["latitude"] for r in rows if r["latitude"] is not None]
+        if latitudes:
+            # Células com ~cell_meters também na longitude, à latitude média do tenant
+            mean_lat = sum(latitudes) / len(latitudes)
+            self.cell_lon = self.cell_lat / max(math.cos(math.radians(mean_lat)), 0.01)
+        self.routes, self._cells, self._points = {}, {}, {}
+        self._apply(rows)
+        self.loaded_at = time.monotonic()
+
+    def replace_route(self, route_id, rows):
+        """Substitui as paragens de uma rota (rows vazio = rota apagada)."""
+        route = self.routes.pop(route_id, None)
+        if route is not None:
+            self._remove_point((route_id, None))
+            for passenger_id in route.stops:
+                self._remove_point((route_id, passenger_id))
+        self._apply(rows)
+
+    def _apply(self, rows):
+        for row in rows:
+            route = self.routes.get(row["route_id"])
+            if route is None:
+                start = None
+                if row["driver_latitude"] is not None and row["driver_longitude"] is not None:
+                    start = (row["driver_latitude"], row["driver_longitude"])
+                    self._add_point((row["route_id"], None), *start)
+                route = self.routes[row["route_id"]] = RouteStops(row["route_id"], row["route_name"], start)
+            if row["passenger_id"] is not None and row["latitude"] is not None and row["longitude"] is not None:
+                route.stops[row["passenger_id"]] = (row["latitude"], row["longitude"])
+                self._add_point((row["route_id"], row["passenger_id"]), row["latitude"], row["longitude"])
+
+    def nearby(self, latitude, longitude, radius_m, limit=None):
+        """[(distância km, route_id, passenger_id ou None)] a menos de radius_m, por distância."""
+        radius_km = radius_m / 1000
+        rings_lat = math.ceil(radius_m / _METERS_PER_DEGREE_LAT / self.cell_lat)
+        meters_per_degree_lon = _METERS_PER_DEGREE_LAT * max(math.cos(math.radians(latitude)), 0.01)
+        rings_lon = math.ceil(radius_m / meters_per_degree_lon / self.cell_lon)
+        ci, cj = self._cell(latitude, longitude)
+
+        found = []
+        if (2 * rings_lat + 1) * (2 * rings_lon + 1) > len(self._cells):
+            # Raio maior do que o tenant: mais barato ver só as células ocupadas
+            keys = [key for (i, j), members in self._cells.items()
+                    if abs(i - ci) <= rings_lat and abs(j - cj) <= rings_lon for key in members]
+        else:
+            keys = [key for i in range(ci - rings_lat, ci + rings_lat + 1)
+                    for j in range(cj - rings_lon, cj + rings_lon + 1)
+                    for key in self._cells.get((i, j), ())]
+        for key in keys:
+            distance = haversine_km(latitude, longitude, *self._points[key])
+            if distance <= radius_km:
+                found.append((distance, key[0], key[1]))
+        found.sort(key=lambda item: item[0])
+        return found[:limit] if limit else found
+
+    def candidate_routes(self, latitude, longitude, k):
+        """Rotas a avaliar: todas se forem poucas, senão as com paragens mais perto (raio crescente)."""
+        if len(self.routes) <= max(SPATIAL_FULL_SCAN_ROUTES, k):
+            return list(self.routes)
+        wanted = k * SPATIAL_CANDIDATE_FACTOR
+        radius = SPATIAL_CANDIDATE_RADIUS_M
+        while True:
+            routes = list(dict.fromkeys(route_id for _, route_id, _ in self.nearby(latitude, longitude, radius)))
+            if len(routes) >= wanted or radius >= SPATIAL_MAX_RADIUS_M:
+                return routes
+            radius *= 2
+
+    def best_routes(self, latitude, longitude, k):
+        """As k rotas com menor custo de inserção (km em linha reta) para o ponto dado."""
+        candidates = self.candidate_routes(latitude, longitude, k)
+        results = []
+        for route_id in candidates:
+            route = self.routes[route_id]
+            insertion = route.insertion(latitude, longitude)
+            if insertion is not None:
+                results.append((insertion, route))
+        results.sort(key=lambda item: item[0][0])
+        return results[:k], len(candidates)
+
+    def stats(self):
+        return {
+            "routes": len(self.routes),
+            "points": len(self._points),
+            "cells": len(self._cells),
+            "cell_meters": self.cell_meters,
+            "age_seconds": round(time.monotonic() - self.loaded_at, 1) if self.loaded_at else None,
+        }
+
+
+# --- Índices por tenant ---
+
+_indexes = {}
+_loading = {}
+_changed_while_loading = {}  # tenant_id -> {route_id} alteradas durante o carregamento em curso
+_background = set()
+
+
+async def _route_rows(pool, tenant_id, route_id):
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute(queries.SPATIAL_ROUTE_STOPS, (route_id, tenant_id))
+            return await cur.fetchall()
+
+
+async def _load(pool, tenant_id):
+    changed = _changed_while_loading[tenant_id] = set()
+    try:
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(queries.SPATIAL_STOPS, (tenant_id,))
+                rows = await cur.fetchall()
+        index = SpatialIndex()
+        index.load(rows)
+        # A atualização incremental destas rotas pode ter ido para o índice antigo
+        # e a leitura acima pode não incluir a escrita: relê-as no novo índice.
+        while changed:
+            route_ids = list(changed)
+            changed.clear()
+            for route_id in route_ids:
+                index.replace_route(route_id, await _route_rows(pool, tenant_id, route_id))
+        _indexes[tenant_id] = index
+    finally:
+        _changed_while_loading.pop(tenant_id, None)
+    logger.info("Índice espacial do tenant %s carregado: %s", tenant_id, index.stats())
+    return index
+
+
+async def _load_once(pool, tenant_id):
+    """Carrega o índice; pedidos simultâneos esperam pelo mesmo carregamento."""
+    task = _loading.get(tenant_id)
+    if task is None:
+        task = _loading[tenant_id] = asyncio.ensure_future(_load(pool, tenant_id))
+        task.add_done_callback(lambda _: _loading.pop(tenant_id, None))
+    return await asyncio.shield(task)
+
+
+def _log_failure(task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Erro ao atualizar o índice espacial: %s", task.exception())
+
+
+def _spawn(coro):
+    task = asyncio.ensure_future(coro)
+    _background.add(task)
+    task.add_done_callback(_log_failure)
+
+
+async def get_index(pool, tenant_id):
+    """Índice do tenant; se estiver desatualizado, é recarregado em segundo plano."""
+    index = _indexes.get(tenant_id)
+    if index is None:
+        return await _load_once(pool, tenant_id)
+    if time.monotonic() - index.loaded_at > SPATIAL_INDEX_REFRESH and tenant_id not in _loading:
+        _spawn(_load_once(pool, tenant_id))
+    return index
+
+
+async def refresh_route(pool, tenant_id, route_id):
+    """Relê as paragens de uma rota depois de uma escrita (só se o tenant já estiver carregado)."""
+    index = _indexes.get(tenant_id)
+    if index is None:
+        return
+    index.replace_route(route_id, await _route_rows(pool, tenant_id, route_id))
+
+
+def route_changed(pool, tenant_id, route_id):
+    """Chamado depois do COMMIT de uma escrita na rota: atualiza o índice em segundo plano."""
+    changed = _changed_while_loading.get(tenant_id)
+    if changed is not None:
+        changed.add(route_id)
+    if tenant_id in _indexes:
+        _spawn(refresh_route(pool, tenant_id, route_id))
+
+
+def stats():
+    return {tenant_id: index.stats() for tenant_id, index in _indexes.items()}
@@ -0,0 +1,22 @@
+# test_roster_import.py
+# Leitura do ficheiro de inscrição em massa (roster_import.py).
+# Uso (a partir de backend/python): python -m pytest routes_service
+import json
+
+from roster_import import parse_roster
+
+
+def parse_json(entries):
+    return parse_roster("application/json", json.dumps(entries).encode())
+
+
+def test_ids_out_of_integer_range_are_invalid_rows():
+    rows, invalid = parse_json([12, 3000000000, {"passenger_id": -1e12}, 0, 2 ** 31 - 1])
+    assert [row.passenger_id for row in rows] == [12, 2 ** 31 - 1]
+    assert [row.row for row in invalid] == [2, 3, 4]
+
+
+def test_csv_id_out_of_range_is_an_invalid_row():
+    rows, invalid = parse_roster("text/csv", b"passenger_id\n7\n-1e12\n3000000000\n")
+    assert [row.passenger_id for row in rows] == [7]
+    assert [row.row for row in invalid] == [2, 3]
@@ -0,0 +1,223 @@
+# backend/python/routing_service/daily_plan.py
+# Plano do dia de cada rota: a ordem atual das paragens dos passageiros
+# confirmados e a geometria/duração de cada perna.
+#
+# Quando um passageiro cancela ou confirma tarde, o plano é atualizado de forma
+# incremental em vez de otimizar tudo de novo:
+#   - remover uma paragem liga a anterior à seguinte (1 perna nova no OSRM);
+#   - inserir uma paragem escolhe a posição de menor custo de inserção
+#     (em linha reta) e pede ao OSRM só as 2 pernas novas.
+# As restantes pernas são reaproveitadas tal como estão.
+import asyncio
+import os
+from datetime import date, datetime, timezone
+
+import numpy as np
+
+from distance import haversine
+import osrm
+from shared.cache import TTLCache
+
+DAILY_PLAN_CACHE_SIZE = int(os.getenv("DAILY_PLAN_CACHE_SIZE", "5000"))  # rotas com plano do dia em memória
+DAILY_PLAN_TTL = float(os.getenv("DAILY_PLAN_TTL", "86400"))             # segundos
+PLAN_SERIALIZED_FORMATS = int(os.getenv("PLAN_SERIALIZED_FORMATS", "8"))  # respostas de GET /plans guardadas por plano
+
+
+def route_legs(osrm_route, points):
+    """
+    Divide uma rota OSRM (ou estimada) em pernas independentes, cada uma com a sua
+    geometria (junção das geometrias dos steps), distância, duração e steps.
+    """
+    legs = osrm_route.get("legs", [])
+    if len(legs) != len(points) - 1:
+        legs = osrm.estimate_route(points)["legs"]
+    estimated = bool(osrm_route.get("estimated", False))
+
+    result = []
+    for i, leg in enumerate(legs):
+        coordinates = []
+        for step in leg.get("steps", []):
+            step_coordinates = step.get("geometry", {}).get("coordinates", [])
+            coordinates.extend(step_coordinates if not coordinates else step_coordinates[1:])
+        if len(coordinates) < 2:
+            a, b = points[i], points[i + 1]
+            coordinates = [[a.longitude, a.latitude], [b.longitude, b.latitude]]
+        result.append({
+            "distance": leg.get("distance", 0.0),
+            "duration": leg.get("duration", 0.0),
+            "steps": leg.get("steps", []),
+            "coordinates": coordinates,
+            "estimated": estimated,
+        })
+    return result
+
+
+async def fetch_legs(points):
+    """Pernas entre pontos consecutivos, pedidas ao OSRM numa só chamada (com cache e estimativa)."""
+    osrm_route = await osrm.get_osrm_route(points)
+    if osrm_route is None:
+        osrm_route = osrm.estimate_route(points)
+    return route_legs(osrm_route, points)
+
+
+class DailyPlan:
+    """Ordem atual das paragens de uma rota para o dia e as pernas entre elas."""
+
+    def __init__(self, route_id, points, osrm_route):
+        # points[0] é o ponto de partida do motorista; os restantes são as paragens, por ordem.
+        self.route_id = route_id
+        self.trip_date = date.today()
+        self.points = list(points)
+        self.legs = route_legs(osrm_route, self.points)
+        self.version = 1
+        self.updated_at = datetime.now(timezone.utc)
+        self.lock = asyncio.Lock()  # uma atualização de cada vez por rota
+        self._bodies = {}           # GET /plans já serializado, por (versão, formato de saída)
+        # Última confirmação/cancelamento aplicado por passageiro: {passenger_id: (confirmed_at, stop ou None)}
+        self.changes = {}
+
+    @property
+    def stops(self):
+        return self.points[1:]
+
+    def index_of(self, passenger_id):
+        for i, point in enumerate(self.points[1:], start=1):
+            if point.id == passenger_id:
+                return i
+        return None
+
+    def _touch(self):
+        self.version += 1
+        self.updated_at = datetime.now(timezone.utc)
+        self._bodies.clear()
+
+    def is_outdated(self, passenger_id, confirmed_at):
+        """A alteração é anterior à última já aplicada a este passageiro (chegou fora de ordem)."""
+        last = self.changes.get(passenger_id)
+        return confirmed_at is not None and last is not None and last[0] is not None and confirmed_at < last[0]
+
+    def record_change(self, passenger_id, confirmed_at, stop=None):
+        """Regista a alteração aplicada (stop=None para um cancelamento)."""
+        self.changes[passenger_id] = (confirmed_at, stop)
+
+    async def replay(self, changes):
+        """Aplica a este plano as confirmações/cancelamentos já aplicados ao plano que substitui."""
+        for passenger_id, (confirmed_at, stop) in changes.items():
+            if stop is None:
+                await self.remove(passenger_id)
+            else:
+                await self.insert(stop)
+            self.record_change(passenger_id, confirmed_at, stop)
+
+    def serialized_body(self, key, render):
+        """
+        Corpo da resposta para o formato `key`, gerado com render() só na primeira
+        vez desde a última alteração. Se o plano mudar durante o render(), o corpo
+        é devolvido mas não fica guardado.
+        """
+        version = self.version
+        body = self._bodies.get((version, key))
+        if body is None:
+            body = render()
+            if self.version == version:
+                if len(self._bodies) >= PLAN_SERIALIZED_FORMATS:
+                    self._bodies.clear()
+                self._bodies[(version, key)] = body
+        return body
+
+    async def remove(self, passenger_id):
+        """
+        Retira a paragem do passageiro. Devolve (posição retirada, pernas pedidas ao OSRM),
+        ou (None, 0) se o passageiro não estiver no plano.
+        """
+        k = self.index_of(passenger_id)
+        if k is None:
+            return None, 0
+
+        requested = 0
+        if k == len(self.points) - 1:
+            # Última paragem: basta descartar a última perna.
+            new_legs = []
+        else:
+            new_legs = await fetch_legs([self.points[k - 1], self.points[k + 1]])
+            requested = 1
+        self.legs[k - 1:k + 1] = new_legs
+        del self.points[k]
+        self._touch()
+        return k, requested
+
+    def cheapest_insertion(self, stop):
+        """Posição (índice em points) onde inserir `stop` aumenta menos o percurso em linha reta."""
+        lat = np.array([p.latitude for p in self.points])
+        lon = np.array([p.longitude for p in self.points])
+        to_new = haversine(lat, lon, stop.latitude, stop.longitude)
+        # Entre points[i] e points[i+1]: d(i, novo) + d(novo, i+1) - d(i, i+1); no fim: d(último, novo)
+        between = to_new[:-1] + to_new[1:] - haversine(lat[:-1], lon[:-1], lat[1:], lon[1:])
+        costs = np.append(between, to_new[-1])
+        return int(np.argmin(costs)) + 1
+
+    async def insert(self, stop):
+        """
+        Insere a paragem na posição mais barata. Devolve (posição, pernas pedidas ao OSRM),
+        ou (None, 0) se o passageiro já estiver no plano.
+        """
+        if self.index_of(stop.id) is not None:
+            return None, 0
+
+        k = self.cheapest_insertion(stop)
+        if k == len(self.points):
+            new_legs = await fetch_legs([self.points[-1], stop])
+        else:
+            new_legs = await fetch_legs([self.points[k - 1], stop, self.points[k]])
+        self.legs[k - 1:k] = new_legs
+        self.points.insert(k, stop)
+        self._touch()
+        return k, len(new_legs)
+
+    def to_osrm_route(self):
+        """O plano no formato de uma rota OSRM (para a resposta da API e para as ETAs)."""
+        coordinates = []
+        for leg in self.legs:
+            coordinates.extend(leg["coordinates"] if not coordinates else leg["coordinates"][1:])
+        if not coordinates and self.points:
+            coordinates = [[self.points[0].longitude, self.points[0].latitude]]
+        return {
+            "distance": sum(leg["distance"] for leg in self.legs),
+            "duration": sum(leg["duration"] for leg in self.legs),
+            "geometry": {"type": "LineString", "coordinates": coordinates},
+            "legs": [
+                {"distance": leg["distance"], "duration": leg["duration"], "steps": leg["steps"]}
+                for leg in self.legs
+            ],
+            "estimated": any(leg["estimated"] for leg in self.legs),
+        }
+
+
+plans = TTLCache(max_size=DAILY_PLAN_CACHE_SIZE, ttl=DAILY_PLAN_TTL)
+
+
+async def save_plan(route_id, points, osrm_route):
+    """
+    Guarda o plano de uma nova otimização. Se a rota já tiver plano hoje, a troca
+    é feita com o lock do plano antigo e as confirmações/cancelamentos que ele já
+    tinha aplicado são repetidos no novo (a otimização pode ter partido de uma
+    lista de passageiros anterior a essas alterações).
+    """
+    old = get_plan(route_id)
+    if old is None:
+        plan = DailyPlan(route_id, points, osrm_route)
+        plans.set(route_id, plan)
+        return plan
+    async with old.lock:
+        plan = DailyPlan(route_id, points, osrm_route)
+        await plan.replay(old.changes)
+        plans.set(route_id, plan)
+    return plan
+
+
+def get_plan(route_id):
+    """Plano de hoje da rota, ou None (planos de dias anteriores não são reaproveitados)."""
+    plan = plans.get(route_id)
+    if plan is None or plan.trip_date != date.today():
+        return None
+    return plan
@@ -0,0 +1,63 @@
+# backend/python/routing_service/distance.py
+# Matriz de distâncias em linha reta (haversine) calculada de uma vez com NumPy,
+# usada pela ordenação das paradas em vez de calcular par a par num ciclo duplo.
+import numpy as np
+
+from shared.geo import EARTH_RADIUS_KM
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Distância (km) elemento a elemento entre arrays de coordenadas (aceita broadcasting)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    # clip protege o arcsin de erros de arredondamento (a ligeiramente > 1)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def haversine_matrix(latitudes, longitudes):
+    """
+    Distâncias (km) entre todos os pares de pontos: matriz N x N simétrica,
+    com zeros na diagonal.
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+    return haversine(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+
+
+def location_matrix(locations):
+    """Matriz haversine para uma lista de objetos com .latitude e .longitude."""
+    return haversine_matrix(
+        [loc.latitude for loc in locations],
+        [loc.longitude for loc in locations],
+    )
+
+
+def nearest_unvisited(matrix, row, visited):
+    """Índice do ponto não visitado mais próximo de `row` (visited é uma máscara booleana)."""
+    distances = np.where(visited, np.inf, matrix[row])
+    return int(np.argmin(distances))
+
+
+def nearest_neighbor_order(matrix, start=0):
+    """
+    Vizinho Mais Próximo a partir de `start`: devolve os restantes índices na
+    ordem de visita. Em empate fica o de menor índice (igual ao ciclo original).
+    """
+    n = matrix.shape[0]
+    visited = np.zeros(n, dtype=bool)
+    visited[start] = True
+    order = []
+    current = start
+    for _ in range(n - 1):
+        current = nearest_unvisited(matrix, current, visited)
+        visited[current] = True
+        order.append(current)
+    return order
+
+
+def path_length(matrix, path):
+    """Comprimento de um percurso aberto que visita os índices de `path` por ordem."""
+    if len(path) < 2:
+        return 0.0
+    idx = np.asarray(path)
+    return float(matrix[idx[:-1], idx[1:]].sum())
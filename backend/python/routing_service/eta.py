@@ -0,0 +1,189 @@
+# backend/python/routing_service/eta.py
+# ETAs por paragem sem voltar a chamar o OSRM.
+#
+# Cada POST /optimize com `route_id` guarda o plano da rota: a geometria (polyline)
+# devolvida pelo OSRM, a posição de cada paragem ao longo dela e a duração de
+# cada perna. Um pedido de ETA apenas projeta a posição atual do motorista na
+# polyline (numpy, em metros numa projeção local) e interpola o tempo restante
+# até cada paragem a partir das durações das pernas.
+#
+# Nota: os planos são por processo (como as caches do OSRM); com vários workers
+# o pedido de ETA tem de chegar ao worker que fez a otimização, ou o plano é
+# recalculado com um novo POST /optimize.
+import logging
+import math
+import os
+import time
+from datetime import datetime, timezone
+
+import httpx
+import numpy as np
+
+from distance import EARTH_RADIUS_KM
+from shared import instrumentation
+from shared.cache import TTLCache
+
+ETA_PLAN_CACHE_SIZE = int(os.getenv("ETA_PLAN_CACHE_SIZE", "5000"))   # rotas com plano guardado
+ETA_PLAN_TTL = float(os.getenv("ETA_PLAN_TTL", "43200"))             # segundos (um plano serve o dia)
+ETA_OFF_ROUTE_METERS = float(os.getenv("ETA_OFF_ROUTE_METERS", "300"))  # distância à polyline para "fora da rota"
+ETA_BACKTRACK_METERS = float(os.getenv("ETA_BACKTRACK_METERS", "200"))  # recuo tolerado face à última projeção
+TRIPS_SERVICE_URL = os.getenv("TRIPS_SERVICE_URL", "http://trips-service:8000").rstrip("/")
+
+_EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+
+logger = logging.getLogger(__name__)
+
+
+class RoutePlan:
+    """Geometria de uma rota otimizada, preparada para projetar posições e calcular ETAs."""
+
+    def __init__(self, stops, osrm_route):
+        # stops[0] é o ponto de partida do motorista; os restantes são as paragens, por ordem.
+        self.stops = stops
+        self.created_at = datetime.now(timezone.utc)
+        self.estimated = bool(osrm_route.get("estimated", False))
+
+        coordinates = np.asarray(osrm_route["geometry"]["coordinates"], dtype=float)  # [lon, lat]
+        if len(coordinates) < 2:
+            coordinates = np.array([[s.longitude, s.latitude] for s in stops], dtype=float)
+        self._lat0 = math.radians(float(coordinates[:, 1].mean()))
+        self._xy = self._project(coordinates[:, 1], coordinates[:, 0])
+
+        segments = np.diff(self._xy, axis=0)
+        self._seg_start = self._xy[:-1]
+        self._seg_vec = segments
+        self._seg_len2 = np.maximum((segments ** 2).sum(axis=1), 1e-9)
+        self._cum = np.concatenate(([0.0], np.cumsum(np.sqrt((segments ** 2).sum(axis=1)))))
+        self.length_m = float(self._cum[-1])
+
+        # Posição de cada paragem ao longo da polyline (sempre para a frente)
+        along = []
+        from_segment = 0
+        for stop in stops:
+            position, _, segment = self._snap(stop.latitude, stop.longitude, from_segment)
+            along.append(position)
+            from_segment = segment
+        self.stop_along = np.maximum.accumulate(np.array(along))
+
+        # Tempo acumulado em cada paragem, a partir da duração de cada perna
+        legs = osrm_route.get("legs", [])
+        if len(legs) == len(stops) - 1:
+            durations = [leg.get("duration", 0.0) for leg in legs]
+        else:
+            total = float(osrm_route.get("duration", 0.0))
+            span = np.diff(self.stop_along)
+            durations = (span / span.sum() * total).tolist() if span.sum() > 0 else [0.0] * (len(stops) - 1)
+        self.stop_time = np.concatenate(([0.0], np.cumsum(durations)))
+
+        self.progress_m = 0.0  # última posição projetada do motorista ao longo da rota
+
+    def _project(self, lat, lon):
+        """Coordenadas em metros numa projeção equirretangular centrada na rota."""
+        lat = np.radians(np.asarray(lat, dtype=float))
+        lon = np.radians(np.asarray(lon, dtype=float))
+        return np.column_stack((lon * math.cos(self._lat0), lat)) * _EARTH_RADIUS_M
+
+    def _snap(self, latitude, longitude, from_segment=0):
+        """(distância ao longo da rota, distância à rota, segmento) do ponto mais próximo."""
+        point = self._project([latitude], [longitude])[0]
+        start, vec = self._seg_start[from_segment:], self._seg_vec[from_segment:]
+        t = np.clip(((point - start) * vec).sum(axis=1) / self._seg_len2[from_segment:], 0.0, 1.0)
+        closest = start + vec * t[:, None]
+        distance = np.sqrt(((closest - point) ** 2).sum(axis=1))
+        k = int(np.argmin(distance))
+        segment = from_segment + k
+        along = self._cum[segment] + t[k] * math.sqrt(self._seg_len2[segment])
+        return float(along), float(distance[k]), segment
+
+    def locate(self, latitude, longitude, track=True):
+        """
+        Projeta a posição na rota. Com `track` (posição real do motorista) a procura
+        começa um pouco antes da última projeção, para não saltar para um troço
+        anterior que passe perto, e o progresso avança. Sem `track` (coordenadas
+        indicadas pelo cliente) a projeção é feita na rota toda e não altera o
+        progresso partilhado por todos os pedidos de ETA da rota.
+        """
+        if not track:
+            along, off_route, _ = self._snap(latitude, longitude)
+            return along, off_route
+        from_segment = max(int(np.searchsorted(self._cum, self.progress_m - ETA_BACKTRACK_METERS)) - 1, 0)
+        along, off_route, _ = self._snap(latitude, longitude, from_segment)
+        if off_route <= ETA_OFF_ROUTE_METERS:
+            self.progress_m = along
+        return along, off_route
+
+    def time_at(self, along):
+        """Segundos desde a partida até ao ponto `along` metros ao longo da rota."""
+        return np.interp(along, self.stop_along, self.stop_time)
+
+    def etas(self, latitude, longitude, track=True):
+        """Tempo e distância restantes até cada paragem a partir da posição dada (ver locate)."""
+        started = time.perf_counter()
+        along, off_route = self.locate(latitude, longitude, track)
+        now = float(self.time_at(along))
+        remaining_s = self.stop_time - now
+        remaining_m = self.stop_along - along
+        stops = []
+        for i, stop in enumerate(self.stops[1:], start=1):
+            passed = bool(remaining_m[i] < 0)
+            stops.append({
+                "id": stop.id,
+                "name": stop.name,
+                "order": i,
+                "passed": passed,
+                "eta_seconds": None if passed else round(float(remaining_s[i]), 1),
+                "eta_minutes": None if passed else math.ceil(float(remaining_s[i]) / 60),
+                "distance_remaining_km": None if passed else round(float(remaining_m[i]) / 1000, 3),
+            })
+        return {
+            "progress_km": round(along / 1000, 3),
+            "route_length_km": round(self.length_m / 1000, 3),
+            "off_route_meters": round(off_route, 1),
+            "off_route": off_route > ETA_OFF_ROUTE_METERS,
+            "stops": stops,
+            "compute_us": round((time.perf_counter() - started) * 1e6, 1),
+        }
+
+
+plans = TTLCache(max_size=ETA_PLAN_CACHE_SIZE, ttl=ETA_PLAN_TTL)
+
+_client = None
+
+
+def save_plan(route_id, stops, osrm_route):
+    plan = RoutePlan(stops, osrm_route)
+    plans.set(route_id, plan)
+    return plan
+
+
+def get_plan(route_id):
+    return plans.get(route_id)
+
+
+async def open_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=2.0)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch_driver_location(route_id):
+    """Última posição do motorista, servida pela memória do trips_service. None se não houver."""
+    client = await open_client()
+    try:
+        response = await client.get(
+            f"{TRIPS_SERVICE_URL}/trips/{route_id}/location", headers=instrumentation.request_id_headers()
+        )
+    except httpx.HTTPError as e:
+        logger.warning("trips_service indisponível para a localização da rota %s: %r", route_id, e)
+        return None
+    if response.status_code != 200:
+        return None
+    return response.json()
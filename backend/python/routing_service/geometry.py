@@ -0,0 +1,138 @@
+# backend/python/routing_service/geometry.py
+# Geometria compacta para as respostas de /optimize: simplificação
+# Douglas–Peucker (por tolerância em metros ou pelo nível de zoom do mapa),
+# codificação "encoded polyline" (formato Google, precisão 5 ou 6) e steps
+# reduzidos ao que o telemóvel mostra.
+#
+# Só altera o que é enviado ao cliente; o plano do dia e as ETAs continuam a
+# usar a geometria completa devolvida pelo OSRM.
+import math
+import os
+
+import numpy as np
+
+from distance import EARTH_RADIUS_KM
+
+GEOMETRY_PIXEL_TOLERANCE = float(os.getenv("GEOMETRY_PIXEL_TOLERANCE", "1.0"))  # erro máximo aceite, em píxeis do mapa
+
+_EARTH_RADIUS_M = EARTH_RADIUS_KM * 1000
+# Metros por píxel no equador com zoom 0 (tiles de 256 px, Web Mercator)
+_METERS_PER_PIXEL_Z0 = 2 * math.pi * 6378137 / 256
+
+
+def zoom_tolerance(zoom, latitude):
+    """Tolerância em metros equivalente a GEOMETRY_PIXEL_TOLERANCE píxeis no zoom dado."""
+    return _METERS_PER_PIXEL_Z0 * math.cos(math.radians(latitude)) / 2 ** zoom * GEOMETRY_PIXEL_TOLERANCE
+
+
+def simplify(coordinates, tolerance_m):
+    """
+    Douglas–Peucker sobre [[lon, lat], ...]: mantém só os pontos que se afastam
+    mais de `tolerance_m` metros da linha simplificada. O primeiro e o último
+    ponto ficam sempre.
+    """
+    points = np.asarray(coordinates, dtype=float)
+    n = len(points)
+    if n < 3 or tolerance_m <= 0:
+        return coordinates
+
+    # Projeção equirretangular centrada na rota (erro desprezável à escala de uma rota)
+    lat0 = math.radians(float(points[:, 1].mean()))
+    xy = np.radians(points) * _EARTH_RADIUS_M
+    xy[:, 0] *= math.cos(lat0)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = xy[first], xy[last]
+        segment = end - start
+        inner = xy[first + 1:last]
+        length2 = float(segment @ segment)
+        if length2 == 0.0:
+            distances = np.sqrt(((inner - start) ** 2).sum(axis=1))
+        else:
+            # Distância de cada ponto ao segmento [start, end]
+            t = np.clip((inner - start) @ segment / length2, 0.0, 1.0)
+            distances = np.sqrt(((inner - (start + t[:, None] * segment)) ** 2).sum(axis=1))
+        k = int(np.argmax(distances))
+        if distances[k] > tolerance_m:
+            index = first + 1 + k
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return points[keep].tolist()
+
+
+def encode_polyline(coordinates, precision=5):
+    """Codifica [[lon, lat], ...] no formato "encoded polyline" (ordem lat, lon)."""
+    if not len(coordinates):
+        return ""
+    values = np.round(np.asarray(coordinates, dtype=float)[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    zigzag = (deltas << 1) ^ (deltas >> 63)
+
+    chars = []
+    for value in zigzag.tolist():
+        while value >= 0x20:
+            chars.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        chars.append(chr(value + 63))
+    return "".join(chars)
+
+
+def decode_polyline(encoded, precision=5):
+    """Inverso de encode_polyline: devolve [[lon, lat], ...]."""
+    values = []
+    value = shift = 0
+    for char in encoded:
+        byte = ord(char) - 63
+        value |= (byte & 0x1F) << shift
+        shift += 5
+        if byte < 0x20:
+            values.append(~(value >> 1) if value & 1 else value >> 1)
+            value = shift = 0
+    lat_lon = np.cumsum(np.array(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return lat_lon[:, ::-1].tolist()
+
+
+def compact_geometry(geometry, geometry_format="geojson", tolerance_m=None, zoom=None):
+    """
+    Geometria GeoJSON da rota no formato pedido, simplificada se houver
+    tolerância (ou zoom). Em "polyline"/"polyline6" devolve
+    {"type": "EncodedPolyline", "precision": 5|6, "polyline": "...", "points": N}.
+    """
+    coordinates = geometry.get("coordinates") if geometry else None
+    if not coordinates:
+        return geometry
+
+    if tolerance_m is None and zoom is not None:
+        latitude = sum(c[1] for c in (coordinates[0], coordinates[-1])) / 2
+        tolerance_m = zoom_tolerance(zoom, latitude)
+    if tolerance_m:
+        coordinates = simplify(coordinates, tolerance_m)
+
+    if geometry_format == "geojson":
+        return {**geometry, "coordinates": coordinates}
+    precision = 6 if geometry_format == "polyline6" else 5
+    return {
+        "type": "EncodedPolyline",
+        "precision": precision,
+        "polyline": encode_polyline(coordinates, precision),
+        "points": len(coordinates),
+    }
+
+
+def compact_step(step):
+    """Step reduzido: sem campos vazios, distância em metros inteiros e coordenadas a ~1 m."""
+    compact = {"instruction": step["instruction"], "distance": round(step["distance"])}
+    if step.get("modifier"):
+        compact["modifier"] = step["modifier"]
+    if step.get("name"):
+        compact["name"] = step["name"]
+    lon, lat = step["location"]
+    compact["location"] = [round(lon, 5), round(lat, 5)]
+    return compact
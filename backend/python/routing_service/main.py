@@ -1,11 +1,65 @@
 # backend/python/routing_service/main.py
-import httpx
-import math
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Dict, Any
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from fastapi import Depends, FastAPI, HTTPException, Query
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Literal, Optional
 
-app = FastAPI()
+from distance import location_matrix
+from ordering import order_locations, order_stops
+import daily_plan
+import eta
+import geometry
+import osrm
+from osrm import get_osrm_route
+from shared import instrumentation, serialization
+
+# Processos usados pela ordenação (POST /optimize e /optimize/batch), fora do event loop
+OPTIMIZE_WORKERS = int(os.getenv("OPTIMIZE_WORKERS", "0")) or os.cpu_count()
+OPTIMIZE_BATCH_MAX_ROUTES = int(os.getenv("OPTIMIZE_BATCH_MAX_ROUTES", "500"))
+OSRM_BATCH_CONCURRENCY = int(os.getenv("OSRM_BATCH_CONCURRENCY", "4"))  # chamadas OSRM simultâneas num lote
+# Compressão das respostas (brotli se o cliente o aceitar e o brotli-asgi estiver instalado, senão gzip)
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1000"))  # bytes; respostas menores vão sem compressão
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "5"))                         # 1-9; acima de ~6 ganha pouco e custa CPU
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))                 # 0-11; 4 comprime melhor que gzip e é rápido
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # dependência opcional
+    BrotliMiddleware = None
+
+_executor = None
+_osrm_batch_semaphore = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _executor, _osrm_batch_semaphore
+    _executor = ProcessPoolExecutor(max_workers=OPTIMIZE_WORKERS)
+    _osrm_batch_semaphore = asyncio.Semaphore(OSRM_BATCH_CONCURRENCY)
+    await osrm.open_client()
+    yield
+    await osrm.close_client()
+    await eta.close_client()
+    _executor.shutdown(cancel_futures=True)
+
+app = FastAPI(lifespan=lifespan)
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, quality=BROTLI_QUALITY, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE, compresslevel=GZIP_LEVEL)
+instrumentation.instrument(app, "routing_service")
+instrumentation.register_stats("osrm", osrm.stats)
+instrumentation.register_stats("eta_plans", eta.plans.stats)
+instrumentation.register_stats("daily_plans", daily_plan.plans.stats)
+instrumentation.register_stats("serialization", serialization.stats)
+
+logger = logging.getLogger(__name__)
 
 # --- MODELOS ---
 
@@ -19,6 +73,25 @@ class Location(BaseModel):
 class RouteRequest(BaseModel):
     driver_start: Location
     passengers: List[Location]
+    # Etapa de melhoria aplicada depois do Vizinho Mais Próximo
+    algorithm: Literal["nearest_neighbor", "two_opt", "or_opt", "two_opt+or_opt"] = "two_opt+or_opt"
+    time_budget_ms: float = Field(200.0, gt=0, le=10000)  # tempo máximo gasto na melhoria
+    max_iterations: int = Field(1000, ge=0)               # número máximo de melhorias aplicadas
+    # Custo usado na ordenação: linha reta, ou tempo/distância por estrada (matriz /table do OSRM)
+    cost_source: Literal["haversine", "osrm_duration", "osrm_distance"] = "haversine"
+    # Se indicado, a rota otimizada fica guardada para GET /routes/{route_id}/eta
+    route_id: Optional[int] = None
+
+class OrderingSummary(BaseModel):
+    algorithm: str
+    cost_source: str = "haversine" # matriz efetivamente usada (haversine se o OSRM falhar)
+    cost_unit: str = "km"          # "km" ou "min" (osrm_duration)
+    initial_cost: float           # custo do percurso após o Vizinho Mais Próximo
+    final_cost: float             # custo após a melhoria
+    improvement_percent: float
+    iterations: int
+    elapsed_ms: float
+    budget_exhausted: bool
 
 class RouteResponse(BaseModel):
     optimized_order: List[Location] # A lista de passageiros na ordem certa
@@ -26,47 +99,68 @@ class RouteResponse(BaseModel):
     total_duration_minutes: float   # Tempo estimado
     geometry: Dict[str, Any]        # O desenho da linha (GeoJSON)
     steps: List[Dict[str, Any]] = [] # NOVA LISTA: Instruções de navegação (Vire à direita...)
+    ordering: Optional[OrderingSummary] = None # Ganho obtido pela etapa de melhoria da ordem
+    estimated: bool = False          # True se o OSRM estava indisponível e a rota é uma estimativa em linha reta
 
-# --- LÓGICA AUXILIAR ---
+class RouteOutputOptions(BaseModel):
+    """Formato da geometria e dos steps devolvidos (query string de /optimize, /optimize/batch e GET /plans)."""
+    geometry_format: Literal["geojson", "polyline", "polyline6"] = "geojson"
+    simplify_tolerance_m: Optional[float] = None  # Douglas–Peucker com esta tolerância em metros
+    zoom: Optional[int] = None                    # ou a tolerância de ~1 píxel neste nível de zoom do mapa
+    steps: Literal["full", "compact", "none"] = "full"
 
-def calculate_haversine(lat1, lon1, lat2, lon2):
-    """
-    Calcula distância em linha reta para o algoritmo de ordenação (rápido).
-    """
-    R = 6371  # Raio da Terra em km
-    dLat = math.radians(lat2 - lat1)
-    dLon = math.radians(lon2 - lon1)
-    a = math.sin(dLat/2) * math.sin(dLat/2) + \
-        math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * \
-        math.sin(dLon/2) * math.sin(dLon/2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+def route_output_options(
+    geometry_format: Literal["geojson", "polyline", "polyline6"] = "geojson",
+    simplify_tolerance_m: Optional[float] = Query(None, gt=0, le=10000),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    steps: Literal["full", "compact", "none"] = "full",
+):
+    return RouteOutputOptions(
+        geometry_format=geometry_format, simplify_tolerance_m=simplify_tolerance_m, zoom=zoom, steps=steps
+    )
 
-async def get_osrm_route(ordered_locations: List[Location]):
-    """
-    Consulta a API pública do OSRM para obter o trajeto real.
-    Agora solicita também os STEPS (passo a passo).
-    """
-    if len(ordered_locations) < 2:
-        return None
+class StopEta(BaseModel):
+    id: int
+    name: str
+    order: int                      # posição na rota otimizada (1 = primeira paragem)
+    passed: bool                    # o motorista já passou por esta paragem
+    eta_seconds: Optional[float] = None
+    eta_minutes: Optional[int] = None
+    distance_remaining_km: Optional[float] = None
+
+class EtaResponse(BaseModel):
+    route_id: int
+    latitude: float
+    longitude: float
+    location_age_seconds: Optional[float] = None
+    progress_km: float              # distância já percorrida ao longo da rota
+    route_length_km: float
+    off_route_meters: float         # distância da posição à rota planeada
+    off_route: bool                 # longe demais: convém otimizar de novo
+    estimated: bool                 # o plano veio de uma estimativa em linha reta
+    plan_created_at: str
+    compute_us: float
+    stops: List[StopEta]
 
-    # Formata coordenadas: "lon,lat;lon,lat;..."
-    coords_string = ";".join([f"{loc.longitude},{loc.latitude}" for loc in ordered_locations])
+class DailyPlanResponse(BaseModel):
+    route_id: int
+    trip_date: str
+    version: int                    # incrementa a cada alteração do plano
+    operation: Literal["unchanged", "inserted", "removed"]
+    position: Optional[int] = None  # posição da paragem inserida/removida (1 = primeira)
+    osrm_legs_requested: int = 0    # pernas recalculadas no OSRM nesta alteração
+    route: RouteResponse
 
-    # URL OSRM: Adicionado &steps=true
-    url = f"http://router.project-osrm.org/route/v1/driving/{coords_string}?overview=full&geometries=geojson&steps=true"
+class BatchRouteRequest(BaseModel):
+    routes: List[RouteRequest] = Field(..., max_length=OPTIMIZE_BATCH_MAX_ROUTES)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.get(url, timeout=10.0)
-            if response.status_code == 200:
-                data = response.json()
-                if "routes" in data and len(data["routes"]) > 0:
-                    return data["routes"][0]
-        except Exception as e:
-            print(f"Erro ao conectar com OSRM: {e}")
-            return None
-    return None
+class BatchRouteResult(BaseModel):
+    index: int                            # posição da rota no pedido
+    result: Optional[RouteResponse] = None
+    error: Optional[str] = None
+
+class BatchRouteResponse(BaseModel):
+    results: List[BatchRouteResult]
 
 # --- ROTAS ---
 
@@ -74,62 +168,32 @@ async def get_osrm_route(ordered_locations: List[Location]):
 def read_root():
     return {"message": "Serviço de Roteirização Inteligente Ativo 🚀"}
 
-@app.post("/optimize", response_model=RouteResponse)
-async def optimize_route(request: RouteRequest):
-    """
-    1. Define a melhor ordem (Vizinho Mais Próximo).
-    2. Calcula a rota real + instruções de navegação usando OSRM.
-    """
-    if not request.passengers:
-        return RouteResponse(
-            optimized_order=[],
-            total_distance_km=0.0,
-            total_duration_minutes=0.0,
-            geometry={},
-            steps=[]
-        )
-
-    # --- PASSO 1: ORDENAÇÃO (Seu algoritmo original) ---
-    unvisited = request.passengers.copy()
-    current_location = request.driver_start
-    optimized_path = []
-
-    while unvisited:
-        nearest_passenger = None
-        min_dist = float('inf')
-
-        for passenger in unvisited:
-            dist = calculate_haversine(
-                current_location.latitude, current_location.longitude,
-                passenger.latitude, passenger.longitude
-            )
-            if dist < min_dist:
-                min_dist = dist
-                nearest_passenger = passenger
-
-        if nearest_passenger:
-            optimized_path.append(nearest_passenger)
-            current_location = nearest_passenger
-            unvisited.remove(nearest_passenger)
-
-    # --- PASSO 2: ROTA REAL + INSTRUÇÕES (OSRM) ---
-    full_route_points = [request.driver_start] + optimized_path
-
-    osrm_data = await get_osrm_route(full_route_points)
+@app.get("/osrm/stats")
+def get_osrm_stats():
+    """Taxa de acerto da cache de rotas OSRM e pedidos agrupados."""
+    return {**osrm.stats(), "eta_plans": eta.plans.stats(), "daily_plans": daily_plan.plans.stats()}
 
+def route_response_from_osrm(optimized_path: List[Location], osrm_data: Optional[Dict[str, Any]], ordering_summary=None,
+                             options: Optional[RouteOutputOptions] = None):
+    """Monta a resposta da API a partir da rota OSRM (ou estimada) já obtida."""
+    options = options or RouteOutputOptions()
     real_distance_km = 0.0
     real_duration_min = 0.0
     route_geometry = {}
     steps_list = []
+    estimated = False
 
     if osrm_data:
+        estimated = osrm_data.get("estimated", False)
         real_distance_km = round(osrm_data["distance"] / 1000, 2)
         real_duration_min = round(osrm_data["duration"] / 60, 0)
-        route_geometry = osrm_data["geometry"]
+        route_geometry = geometry.compact_geometry(
+            osrm_data["geometry"], options.geometry_format, options.simplify_tolerance_m, options.zoom
+        )
 
         # --- EXTRAÇÃO DAS MANOBRAS (STEPS) ---
         # O OSRM divide a rota em "legs" (pernas entre paradas). Juntamos todas.
-        if "legs" in osrm_data:
+        if "legs" in osrm_data and options.steps != "none":
             for leg in osrm_data["legs"]:
                 for step in leg.get("steps", []):
                     # Formatamos apenas o necessário para o Flutter
@@ -140,13 +204,276 @@ async def optimize_route(request: RouteRequest):
                         "location": step.get("maneuver", {}).get("location", [0,0]),
                         "distance": step.get("distance", 0)
                     })
+        if options.steps == "compact":
+            steps_list = [geometry.compact_step(step) for step in steps_list]
     else:
-        print("Aviso: OSRM falhou ou indisponível.")
+        logger.warning("OSRM falhou ou indisponível.")
 
     return RouteResponse(
         optimized_order=optimized_path,
         total_distance_km=real_distance_km,
         total_duration_minutes=real_duration_min,
         geometry=route_geometry,
-        steps=steps_list # Enviando as instruções para o painel preto
-    )
\ No newline at end of file
+        steps=steps_list, # Enviando as instruções para o painel preto
+        ordering=ordering_summary,
+        estimated=estimated
+    )
+
+async def build_route_response(request: RouteRequest, order: List[int], ordering_summary: Dict[str, Any],
+                               options: Optional[RouteOutputOptions] = None):
+    """
+    Passo 2 da otimização: dada a ordem (índices em [motorista] + passageiros),
+    obtém a rota real + instruções de navegação no OSRM e monta a resposta.
+    """
+    points = [request.driver_start] + request.passengers
+    optimized_path = [points[i] for i in order]
+
+    # --- PASSO 2: ROTA REAL + INSTRUÇÕES (OSRM) ---
+    full_route_points = [request.driver_start] + optimized_path
+
+    osrm_data = await get_osrm_route(full_route_points)
+
+    if osrm_data and request.route_id is not None:
+        # Plano do dia (atualizações incrementais) e geometria para as ETAs
+        plan = await daily_plan.save_plan(request.route_id, full_route_points, osrm_data)
+        if plan.changes:
+            refresh_eta_plan(plan)  # o plano já inclui as alterações repetidas do plano anterior
+        else:
+            eta.save_plan(request.route_id, full_route_points, osrm_data)
+
+    return route_response_from_osrm(optimized_path, osrm_data, ordering_summary, options)
+
+COST_UNITS = {"haversine": "km", "osrm_distance": "km", "osrm_duration": "min"}
+
+async def cost_matrix(request: RouteRequest, points: List[Location]):
+    """
+    Matriz de custos por estrada pedida ao OSRM (/table), conforme request.cost_source.
+    Devolve (matriz, origem); a matriz é None quando a ordenação deve usar a haversine.
+    """
+    if request.cost_source == "haversine":
+        return None, "haversine"
+    metric = "duration" if request.cost_source == "osrm_duration" else "distance"
+    matrix = await osrm.get_osrm_matrix(points, metric=metric)
+    if matrix is None:
+        return None, "haversine"
+    return matrix, request.cost_source
+
+def empty_route_response():
+    return RouteResponse(
+        optimized_order=[],
+        total_distance_km=0.0,
+        total_duration_minutes=0.0,
+        geometry={},
+        steps=[]
+    )
+
+async def order_in_pool(request: RouteRequest, points, matrix):
+    """
+    Ordenação das paragens. A melhoria (2-opt / Or-opt) pode usar todo o
+    time_budget_ms de CPU, por isso corre num processo do pool e não bloqueia o
+    event loop (/plans, /eta, health checks); só o Vizinho Mais Próximo corre aqui.
+    """
+    if request.algorithm == "nearest_neighbor":
+        if matrix is None:
+            matrix = location_matrix(points)
+        return order_stops(matrix, algorithm=request.algorithm)
+    loop = asyncio.get_running_loop()
+    if matrix is None:
+        return await loop.run_in_executor(
+            _executor,
+            order_locations,
+            [p.latitude for p in points],
+            [p.longitude for p in points],
+            request.algorithm,
+            request.time_budget_ms,
+            request.max_iterations,
+        )
+    return await loop.run_in_executor(
+        _executor,
+        order_stops,
+        matrix,
+        request.algorithm,
+        request.time_budget_ms,
+        request.max_iterations,
+    )
+
+@app.post("/optimize", response_model=RouteResponse)
+async def optimize_route(request: RouteRequest, options: RouteOutputOptions = Depends(route_output_options)):
+    """
+    1. Define a melhor ordem (Vizinho Mais Próximo + melhoria 2-opt / Or-opt).
+    2. Calcula a rota real + instruções de navegação usando OSRM.
+
+    Para clientes móveis: ?geometry_format=polyline, ?zoom=14 (ou ?simplify_tolerance_m=5)
+    e ?steps=compact reduzem a resposta a uma fração do GeoJSON completo.
+    """
+    if not request.passengers:
+        return empty_route_response()
+
+    # --- PASSO 1: ORDENAÇÃO (Vizinho Mais Próximo + melhoria local sobre a matriz de custos) ---
+    # Índice 0 é o motorista; os passageiros ocupam os índices 1..N.
+    points = [request.driver_start] + request.passengers
+    matrix, cost_source = await cost_matrix(request, points)
+    order, ordering_summary = await order_in_pool(request, points, matrix)
+    ordering_summary.update(cost_source=cost_source, cost_unit=COST_UNITS[cost_source])
+
+    return serialization.fast_response(await build_route_response(request, order, ordering_summary, options))
+
+@app.get("/routes/{route_id}/eta", response_model=EtaResponse)
+async def get_route_eta(route_id: int, latitude: Optional[float] = None, longitude: Optional[float] = None):
+    """
+    Tempo restante até cada paragem, a partir do plano guardado na última
+    otimização da rota (POST /optimize com route_id). A posição do motorista é
+    a indicada, ou a última conhecida pelo trips_service. Só esta última faz
+    avançar o progresso guardado no plano.
+    """
+    plan = eta.get_plan(route_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Rota sem plano otimizado; chame POST /optimize com route_id.")
+
+    age = None
+    driver_location = latitude is None or longitude is None
+    if driver_location:
+        location = await eta.fetch_driver_location(route_id)
+        if location is None:
+            raise HTTPException(status_code=404, detail="Localização do motorista desconhecida.")
+        latitude, longitude, age = location["latitude"], location["longitude"], location.get("age_seconds")
+
+    result = plan.etas(latitude, longitude, track=driver_location)
+    return {
+        "route_id": route_id,
+        "latitude": latitude,
+        "longitude": longitude,
+        "location_age_seconds": age,
+        "estimated": plan.estimated,
+        "plan_created_at": plan.created_at.isoformat(),
+        **result,
+    }
+
+def daily_plan_response(plan, operation="unchanged", position=None, osrm_legs_requested=0, options=None):
+    return DailyPlanResponse(
+        route_id=plan.route_id,
+        trip_date=plan.trip_date.isoformat(),
+        version=plan.version,
+        operation=operation,
+        position=position,
+        osrm_legs_requested=osrm_legs_requested,
+        route=route_response_from_osrm(plan.stops, plan.to_osrm_route(), options=options),
+    )
+
+def refresh_eta_plan(plan):
+    """As ETAs passam a usar a nova ordem/geometria do plano do dia."""
+    if len(plan.points) < 2:
+        eta.plans.delete(plan.route_id)  # sem paragens, não há ETAs a calcular
+    else:
+        eta.save_plan(plan.route_id, plan.points, plan.to_osrm_route())
+
+def require_daily_plan(route_id: int):
+    plan = daily_plan.get_plan(route_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail="Rota sem plano para hoje; chame POST /optimize com route_id.")
+    return plan
+
+@asynccontextmanager
+async def locked_daily_plan(route_id: int):
+    """Plano do dia com o lock; se um POST /optimize o substituir entretanto, passa para o novo."""
+    while True:
+        plan = require_daily_plan(route_id)
+        async with plan.lock:
+            if daily_plan.get_plan(route_id) is plan:
+                yield plan
+                return
+
+def as_utc(value: Optional[datetime]):
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+@app.get("/plans/{route_id}", response_model=DailyPlanResponse)
+async def get_daily_plan(route_id: int, options: RouteOutputOptions = Depends(route_output_options)):
+    """
+    Plano atual do dia da rota (ordem das paragens e geometria). Com o caminho
+    rápido, o corpo fica guardado no plano por formato pedido até à próxima alteração.
+    Corre no event loop (async def), tal como as alterações ao plano, por isso
+    nunca lê um plano a meio de uma inserção/remoção.
+    """
+    plan = require_daily_plan(route_id)
+    if not serialization.JSON_FAST_PATH:
+        return daily_plan_response(plan, options=options)
+    body = plan.serialized_body(
+        options.model_dump_json(), lambda: serialization.dumps(daily_plan_response(plan, options=options))
+    )
+    return serialization.raw_response(body)
+
+@app.post("/plans/{route_id}/stops", response_model=DailyPlanResponse)
+async def insert_plan_stop(route_id: int, stop: Location, confirmed_at: Optional[datetime] = None):
+    """
+    Confirmação tardia: insere a paragem na posição mais barata, sem reordenar as outras.
+    Com `confirmed_at`, uma alteração mais antiga do que a última aplicada ao
+    passageiro (ex: chegou depois do cancelamento seguinte) é ignorada.
+    """
+    confirmed_at = as_utc(confirmed_at)
+    async with locked_daily_plan(route_id) as plan:
+        if plan.is_outdated(stop.id, confirmed_at):
+            return daily_plan_response(plan)
+        position, requested = await plan.insert(stop)
+        plan.record_change(stop.id, confirmed_at, stop)
+        if position is None:
+            return daily_plan_response(plan)
+        refresh_eta_plan(plan)
+        return daily_plan_response(plan, "inserted", position, requested)
+
+@app.delete("/plans/{route_id}/stops/{passenger_id}", response_model=DailyPlanResponse)
+async def remove_plan_stop(route_id: int, passenger_id: int, confirmed_at: Optional[datetime] = None):
+    """Cancelamento: retira a paragem e liga a anterior à seguinte (`confirmed_at` como no POST)."""
+    confirmed_at = as_utc(confirmed_at)
+    async with locked_daily_plan(route_id) as plan:
+        if plan.is_outdated(passenger_id, confirmed_at):
+            return daily_plan_response(plan)
+        position, requested = await plan.remove(passenger_id)
+        plan.record_change(passenger_id, confirmed_at)
+        if position is None:
+            return daily_plan_response(plan)
+        refresh_eta_plan(plan)
+        return daily_plan_response(plan, "removed", position, requested)
+
+async def optimize_in_pool(index: int, request: RouteRequest, options: RouteOutputOptions):
+    """Otimiza uma rota do lote: ordenação num processo do pool, OSRM no event loop."""
+    if not request.passengers:
+        return BatchRouteResult(index=index, result=empty_route_response())
+
+    points = [request.driver_start] + request.passengers
+    try:
+        async with _osrm_batch_semaphore:
+            matrix, cost_source = await cost_matrix(request, points)
+        order, ordering_summary = await order_in_pool(request, points, matrix)
+        ordering_summary.update(cost_source=cost_source, cost_unit=COST_UNITS[cost_source])
+        async with _osrm_batch_semaphore:
+            result = await build_route_response(request, order, ordering_summary, options)
+        return BatchRouteResult(index=index, result=result)
+    except Exception as e:
+        logger.exception("Erro ao otimizar a rota %s do lote: %s", index, e)
+        return BatchRouteResult(index=index, error=str(e))
+
+@app.post("/optimize/batch", response_model=BatchRouteResponse)
+async def optimize_routes_batch(batch: BatchRouteRequest, stream: bool = False,
+                                options: RouteOutputOptions = Depends(route_output_options)):
+    """
+    Otimiza várias rotas de uma vez (ex: replaneamento da frota de manhã).
+    A ordenação corre num pool de processos, sem bloquear os pedidos interativos.
+    Com ?stream=true, devolve NDJSON: uma linha por rota, pela ordem em que terminam.
+    """
+    tasks = [asyncio.ensure_future(optimize_in_pool(i, r, options)) for i, r in enumerate(batch.routes)]
+
+    if not stream:
+        return serialization.fast_response(BatchRouteResponse(results=await asyncio.gather(*tasks)))
+
+    async def ndjson_lines():
+        try:
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                yield serialization.dumps(result) + b"\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
@@ -0,0 +1,161 @@
+# backend/python/routing_service/ordering.py
+# Etapa de melhoria da ordem das paradas, aplicada depois do Vizinho Mais Próximo.
+# Opera sobre a matriz de distâncias já calculada e respeita um orçamento de
+# tempo e de iterações por pedido.
+#
+# O percurso é aberto: começa sempre no índice 0 (motorista) e não regressa.
+# A matriz pode ser assimétrica (ex: durações por estrada), por isso o 2-opt
+# contabiliza o custo do troço invertido.
+import time
+
+import numpy as np
+
+from distance import haversine_matrix, nearest_neighbor_order, path_length
+
+ALGORITHMS = ("nearest_neighbor", "two_opt", "or_opt", "two_opt+or_opt")
+
+# Melhorias menores que isto são ignoradas (evita ciclos por arredondamento).
+_EPS = 1e-9
+
+
+def two_opt(matrix, path, deadline, max_iterations):
+    """
+    2-opt: inverte o troço path[i..j] sempre que isso encurta o percurso.
+    Devolve (novo percurso, número de melhorias aplicadas).
+    """
+    p = np.array(path)
+    n = len(p)
+    iterations = 0
+    improved = True
+
+    while improved and iterations < max_iterations:
+        improved = False
+        # Somas acumuladas das arestas no sentido do percurso e no sentido inverso
+        forward = np.concatenate(([0.0], np.cumsum(matrix[p[:-1], p[1:]])))
+        backward = np.concatenate(([0.0], np.cumsum(matrix[p[1:], p[:-1]])))
+
+        for i in range(1, n - 1):
+            if time.monotonic() > deadline or iterations >= max_iterations:
+                return p.tolist(), iterations
+
+            j = np.arange(i + 1, n)
+            nxt = np.minimum(j + 1, n - 1)
+            has_next = j + 1 < n
+
+            old = matrix[p[i - 1], p[i]] + np.where(has_next, matrix[p[j], p[nxt]], 0.0) + (forward[j] - forward[i])
+            new = matrix[p[i - 1], p[j]] + np.where(has_next, matrix[p[i], p[nxt]], 0.0) + (backward[j] - backward[i])
+            delta = new - old
+
+            k = int(np.argmin(delta))
+            if delta[k] < -_EPS:
+                end = int(j[k]) + 1
+                p[i:end] = p[i:end][::-1].copy()
+                iterations += 1
+                improved = True
+                forward = np.concatenate(([0.0], np.cumsum(matrix[p[:-1], p[1:]])))
+                backward = np.concatenate(([0.0], np.cumsum(matrix[p[1:], p[:-1]])))
+
+    return p.tolist(), iterations
+
+
+def or_opt(matrix, path, deadline, max_iterations, max_segment=3):
+    """
+    Or-opt: move troços de 1 a `max_segment` paradas consecutivas para a posição
+    onde a sua inserção custa menos. Devolve (novo percurso, número de melhorias).
+    """
+    p = np.array(path)
+    n = len(p)
+    iterations = 0
+    improved = True
+
+    while improved and iterations < max_iterations:
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length <= n:
+                if time.monotonic() > deadline or iterations >= max_iterations:
+                    return p.tolist(), iterations
+
+                first, last = p[i], p[i + length - 1]
+                prev = p[i - 1]
+                has_next = i + length < n
+
+                # Ganho de retirar o troço da posição atual
+                removal = matrix[prev, first]
+                if has_next:
+                    nxt = p[i + length]
+                    removal += matrix[last, nxt] - matrix[prev, nxt]
+
+                # Custo de o inserir entre cada par (a, b) do resto do percurso, ou no fim
+                rest = np.concatenate((p[:i], p[i + length:]))
+                a, b = rest[:-1], rest[1:]
+                insertion = np.append(
+                    matrix[a, first] + matrix[last, b] - matrix[a, b],
+                    matrix[rest[-1], first],
+                )
+
+                k = int(np.argmin(insertion))
+                if insertion[k] - removal < -_EPS:
+                    segment = p[i:i + length].copy()
+                    p = np.concatenate((rest[:k + 1], segment, rest[k + 1:]))
+                    iterations += 1
+                    improved = True
+                else:
+                    i += 1
+
+    return p.tolist(), iterations
+
+
+def order_stops(matrix, algorithm="two_opt+or_opt", time_budget_ms=200.0, max_iterations=1000):
+    """
+    Ordena os pontos 1..N-1 a partir do índice 0: Vizinho Mais Próximo seguido
+    da etapa de melhoria escolhida. Devolve (ordem sem o índice 0, resumo).
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Algoritmo desconhecido: {algorithm}")
+
+    started = time.monotonic()
+    deadline = started + time_budget_ms / 1000.0
+
+    path = [0] + nearest_neighbor_order(matrix, start=0)
+    initial = path_length(matrix, path)
+    iterations = 0
+
+    if algorithm != "nearest_neighbor" and len(path) > 3:
+        use_two_opt = algorithm in ("two_opt", "two_opt+or_opt")
+        use_or_opt = algorithm in ("or_opt", "two_opt+or_opt")
+        # Alterna os operadores até nenhum melhorar ou o orçamento acabar.
+        while True:
+            before = iterations
+            if use_two_opt:
+                path, done = two_opt(matrix, path, deadline, max_iterations - iterations)
+                iterations += done
+            if use_or_opt:
+                path, done = or_opt(matrix, path, deadline, max_iterations - iterations)
+                iterations += done
+            if iterations == before or not (use_two_opt and use_or_opt):
+                break
+            if time.monotonic() > deadline or iterations >= max_iterations:
+                break
+
+    final = path_length(matrix, path)
+    elapsed_ms = (time.monotonic() - started) * 1000
+    summary = {
+        "algorithm": algorithm,
+        "initial_cost": round(initial, 3),
+        "final_cost": round(final, 3),
+        "improvement_percent": round((initial - final) / initial * 100, 2) if initial > 0 else 0.0,
+        "iterations": iterations,
+        "elapsed_ms": round(elapsed_ms, 3),
+        "budget_exhausted": elapsed_ms > time_budget_ms or iterations >= max_iterations,
+    }
+    return [int(i) for i in path[1:]], summary
+
+
+def order_locations(latitudes, longitudes, algorithm="two_opt+or_opt", time_budget_ms=200.0, max_iterations=1000):
+    """
+    Versão de order_stops que recebe coordenadas em vez da matriz. Só usa tipos
+    simples, para poder correr num processo do ProcessPoolExecutor (POST /optimize/batch).
+    """
+    matrix = haversine_matrix(latitudes, longitudes)
+    return order_stops(matrix, algorithm=algorithm, time_budget_ms=time_budget_ms, max_iterations=max_iterations)
@@ -0,0 +1,330 @@
+# backend/python/routing_service/osrm.py
+# Acesso ao OSRM: um único cliente HTTP durante a vida do processo (keep-alive,
+# HTTP/2 quando o servidor o suporta via HTTPS) e uma cache das rotas já
+# calculadas, para que vários passageiros a abrir o mapa ao mesmo tempo
+# resultem numa só chamada ao OSRM.
+#
+# O servidor é configurável (OSRM_BASE_URL): em produção um OSRM próprio, em
+# testes de carga o stub local (osrm_stub.py). Se o OSRM falhar repetidamente,
+# o disjuntor abre e as rotas passam a ser estimadas em linha reta.
+import asyncio
+import logging
+import os
+import time
+
+import httpx
+import numpy as np
+
+from distance import haversine, haversine_matrix
+from shared import instrumentation
+from shared.cache import TTLCache
+
+OSRM_BASE_URL = os.getenv("OSRM_BASE_URL", "http://router.project-osrm.org").rstrip("/")
+OSRM_TIMEOUT = float(os.getenv("OSRM_TIMEOUT", "10"))                   # segundos por chamada
+OSRM_RETRIES = int(os.getenv("OSRM_RETRIES", "1"))                      # novas tentativas após falha de rede/5xx
+OSRM_BREAKER_FAILURES = int(os.getenv("OSRM_BREAKER_FAILURES", "5"))    # falhas seguidas que abrem o disjuntor
+OSRM_BREAKER_RESET = float(os.getenv("OSRM_BREAKER_RESET", "30"))       # segundos até voltar a tentar
+OSRM_FALLBACK_SPEED_KMH = float(os.getenv("OSRM_FALLBACK_SPEED_KMH", "30"))
+OSRM_FALLBACK_DETOUR = float(os.getenv("OSRM_FALLBACK_DETOUR", "1.3"))  # estrada ≈ linha reta x fator
+OSRM_CACHE_SIZE = int(os.getenv("OSRM_CACHE_SIZE", "2000"))     # rotas guardadas
+OSRM_CACHE_TTL = float(os.getenv("OSRM_CACHE_TTL", "600"))      # segundos
+OSRM_COORD_PRECISION = int(os.getenv("OSRM_COORD_PRECISION", "5"))  # casas decimais na chave (~1 m)
+OSRM_MATRIX_CACHE_SIZE = int(os.getenv("OSRM_MATRIX_CACHE_SIZE", "200000"))  # pares (origem, destino) guardados
+OSRM_MATRIX_CACHE_TTL = float(os.getenv("OSRM_MATRIX_CACHE_TTL", "86400"))    # a rede viária muda pouco
+OSRM_TABLE_MAX_POINTS = int(os.getenv("OSRM_TABLE_MAX_POINTS", "100"))       # limite do serviço /table
+
+logger = logging.getLogger(__name__)
+
+OSRM_REQUEST_DURATION = instrumentation.Histogram(
+    "osrm_request_duration_seconds",
+    "Duração de cada chamada HTTP ao OSRM (cada tentativa conta)",
+    ("service", "outcome"),
+)
+OSRM_FAILURES = instrumentation.Counter(
+    "osrm_failures_total",
+    "Chamadas ao OSRM falhadas: network, http_5xx, http_429, invalid_json ou breaker_open",
+    ("service", "reason"),
+)
+OSRM_FALLBACKS = instrumentation.Counter(
+    "osrm_fallbacks_total",
+    "Respostas servidas sem o OSRM (estimativa em linha reta ou haversine)",
+    ("service",),
+)
+
+
+class OSRMUnavailable(Exception):
+    """O OSRM não respondeu (rede, timeout, 5xx, JSON inválido) ou o disjuntor está aberto."""
+
+
+class CircuitBreaker:
+    """
+    Disjuntor simples: após `failure_threshold` falhas seguidas fica aberto
+    durante `reset_timeout` segundos; depois deixa passar um pedido de teste
+    (meio-aberto) e fecha se este tiver sucesso.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+        self._times_opened = 0
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_progress:
+            self._trial_in_progress = True
+            return True
+        return False
+
+    def record_success(self):
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self._trial_in_progress or (self._opened_at is None and self._failures >= self.failure_threshold):
+            self._times_opened += 1
+            self._opened_at = time.monotonic()
+        self._trial_in_progress = False
+
+    def cancel_trial(self):
+        """O pedido de teste foi cancelado sem resultado: permite outro."""
+        self._trial_in_progress = False
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self._times_opened,
+        }
+
+
+_client = None
+
+# Respostas de /route indexadas pelas coordenadas arredondadas
+route_cache = TTLCache(max_size=OSRM_CACHE_SIZE, ttl=OSRM_CACHE_TTL)
+# Entradas da matriz /table: (origem, destino) -> (duração s, distância m)
+matrix_cache = TTLCache(max_size=OSRM_MATRIX_CACHE_SIZE, ttl=OSRM_MATRIX_CACHE_TTL)
+breaker = CircuitBreaker(OSRM_BREAKER_FAILURES, OSRM_BREAKER_RESET)
+_fallbacks = 0
+
+
+async def open_client():
+    """Cria o cliente HTTP partilhado (chamado no arranque do serviço)."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            http2=True,
+            timeout=OSRM_TIMEOUT,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0),
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def coordinate_key(loc):
+    """Coordenada "lon,lat" arredondada, usada no URL e nas chaves da cache."""
+    p = OSRM_COORD_PRECISION
+    return f"{round(loc.longitude, p)},{round(loc.latitude, p)}"
+
+
+def format_coordinates(locations):
+    """Formata coordenadas para o OSRM: "lon,lat;lon,lat;..." (arredondadas, para a cache)."""
+    return ";".join(coordinate_key(loc) for loc in locations)
+
+
+async def osrm_get(path):
+    """
+    GET ao OSRM com novas tentativas e disjuntor. Devolve o JSON da resposta
+    (que pode ter code != "Ok", ex: NoRoute) ou lança OSRMUnavailable.
+    """
+    service = path.split("/", 2)[1]  # "route" ou "table", para as métricas
+    if not breaker.allow():
+        OSRM_FAILURES.inc(service, "breaker_open")
+        raise OSRMUnavailable("Disjuntor do OSRM aberto")
+
+    client = await open_client()
+    url = f"{OSRM_BASE_URL}{path}"
+    last_error = None
+    try:
+        for attempt in range(OSRM_RETRIES + 1):
+            if attempt:
+                await asyncio.sleep(0.2 * 2 ** (attempt - 1))
+            started = time.perf_counter()
+            try:
+                response = await client.get(url, headers=instrumentation.request_id_headers())
+            except httpx.HTTPError as e:
+                OSRM_REQUEST_DURATION.observe(time.perf_counter() - started, service, "error")
+                OSRM_FAILURES.inc(service, "network")
+                last_error = e
+                continue
+            if response.status_code >= 500 or response.status_code == 429:
+                OSRM_REQUEST_DURATION.observe(time.perf_counter() - started, service, "error")
+                OSRM_FAILURES.inc(service, "http_429" if response.status_code == 429 else "http_5xx")
+                last_error = OSRMUnavailable(f"OSRM respondeu {response.status_code}")
+                continue
+            try:
+                data = response.json()
+            except ValueError as e:
+                # Corpo truncado ou de um proxy à frente do OSRM: conta como falha
+                OSRM_REQUEST_DURATION.observe(time.perf_counter() - started, service, "error")
+                OSRM_FAILURES.inc(service, "invalid_json")
+                last_error = e
+                continue
+            OSRM_REQUEST_DURATION.observe(time.perf_counter() - started, service, "ok")
+            breaker.record_success()
+            return data
+    except asyncio.CancelledError:
+        breaker.cancel_trial()
+        raise
+
+    breaker.record_failure()
+    raise OSRMUnavailable(f"Erro ao conectar com OSRM: {last_error!r}")
+
+
+def estimate_route(ordered_locations):
+    """
+    Rota estimada em linha reta, no mesmo formato de uma rota OSRM, usada quando
+    o OSRM está indisponível. A distância é multiplicada por OSRM_FALLBACK_DETOUR.
+    """
+    lat = [loc.latitude for loc in ordered_locations]
+    lon = [loc.longitude for loc in ordered_locations]
+    leg_km = haversine(lat[:-1], lon[:-1], lat[1:], lon[1:]) * OSRM_FALLBACK_DETOUR
+    legs = [
+        {
+            "distance": float(km * 1000),
+            "duration": float(km / OSRM_FALLBACK_SPEED_KMH * 3600),
+            "steps": [],
+        }
+        for km in leg_km
+    ]
+    return {
+        "distance": sum(leg["distance"] for leg in legs),
+        "duration": sum(leg["duration"] for leg in legs),
+        "geometry": {"type": "LineString", "coordinates": [[x, y] for x, y in zip(lon, lat)]},
+        "legs": legs,
+        "estimated": True,
+    }
+
+
+async def get_osrm_route(ordered_locations):
+    """
+    Consulta o OSRM para obter o trajeto real, com os STEPS (passo a passo).
+    Devolve a primeira rota da resposta; se o OSRM estiver indisponível, uma
+    estimativa em linha reta (com "estimated": True). None se não houver rota.
+    """
+    global _fallbacks
+    if len(ordered_locations) < 2:
+        return None
+
+    coords_string = format_coordinates(ordered_locations)
+
+    async def fetch():
+        data = await osrm_get(f"/route/v1/driving/{coords_string}?overview=full&geometries=geojson&steps=true")
+        if "routes" in data and len(data["routes"]) > 0:
+            return data["routes"][0]
+        return None
+
+    try:
+        return await route_cache.get_or_load(coords_string, fetch)
+    except OSRMUnavailable as e:
+        logger.warning("%s. A usar estimativa em linha reta.", e)
+        OSRM_FALLBACKS.inc("route")
+        _fallbacks += 1
+        return estimate_route(ordered_locations)
+
+
+async def get_osrm_matrix(locations, metric="duration"):
+    """
+    Matriz N x N de custos por estrada entre os pontos, obtida do serviço /table
+    do OSRM numa única chamada: `metric` "duration" (minutos) ou "distance" (km).
+
+    Cada par (origem, destino) fica em cache; só os pares em falta são pedidos
+    (restringindo sources/destinations). Devolve None se o OSRM estiver
+    indisponível ou houver pontos a mais, para o chamador usar a haversine.
+    """
+    n = len(locations)
+    if n > OSRM_TABLE_MAX_POINTS:
+        return None
+
+    keys = [coordinate_key(loc) for loc in locations]
+    durations = np.zeros((n, n))
+    distances = np.zeros((n, n))
+    missing = np.zeros((n, n), dtype=bool)
+    for i, a in enumerate(keys):
+        for j, b in enumerate(keys):
+            if i == j:
+                continue
+            entry = matrix_cache.get((a, b))
+            if entry is None:
+                missing[i, j] = True
+            else:
+                durations[i, j], distances[i, j] = entry
+
+    if missing.any():
+        sources = np.flatnonzero(missing.any(axis=1))
+        destinations = np.flatnonzero(missing.any(axis=0))
+        path = (
+            f"/table/v1/driving/{';'.join(keys)}?annotations=duration,distance"
+            f"&sources={';'.join(map(str, sources))}&destinations={';'.join(map(str, destinations))}"
+        )
+        try:
+            data = await osrm_get(path)
+        except OSRMUnavailable as e:
+            logger.warning("%s. A ordenar com distâncias em linha reta.", e)
+            OSRM_FALLBACKS.inc("table")
+            return None
+        if data.get("code") != "Ok" or "durations" not in data or "distances" not in data:
+            logger.warning("OSRM /table respondeu %s. A ordenar com distâncias em linha reta.", data.get("code"))
+            OSRM_FALLBACKS.inc("table")
+            return None
+
+        # Pares sem rota (null) ficam com a linha reta muito penalizada.
+        straight_km = haversine_matrix([loc.latitude for loc in locations], [loc.longitude for loc in locations])
+        for row, i in enumerate(sources):
+            for col, j in enumerate(destinations):
+                if i == j:
+                    continue
+                duration = data["durations"][row][col]
+                distance = data["distances"][row][col]
+                if duration is None or distance is None:
+                    distance = straight_km[i, j] * 1000 * 10
+                    duration = distance / 1000 / OSRM_FALLBACK_SPEED_KMH * 3600
+                else:
+                    matrix_cache.set((keys[i], keys[j]), (duration, distance))
+                durations[i, j], distances[i, j] = duration, distance
+
+    if metric == "distance":
+        return distances / 1000
+    return durations / 60
+
+
+def stats():
+    return {
+        "base_url": OSRM_BASE_URL,
+        "timeout_seconds": OSRM_TIMEOUT,
+        "retries": OSRM_RETRIES,
+        "circuit_breaker": breaker.stats(),
+        "fallback_estimates": _fallbacks,
+        "route_cache": route_cache.stats(),
+        "matrix_cache": matrix_cache.stats(),
+    }
@@ -0,0 +1,110 @@
+# backend/python/routing_service/osrm_stub.py
+# Servidor OSRM falso, para testes de carga e benchmarks sem acesso à rede.
+# Responde a /route/v1/driving e /table/v1/driving no mesmo formato do OSRM, com rotas em
+# linha reta (distância x OSRM_STUB_DETOUR, velocidade constante).
+#
+# Uso:  uvicorn osrm_stub:app --port 5000
+#       OSRM_BASE_URL=http://localhost:5000 uvicorn main:app
+import asyncio
+import os
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+
+from distance import haversine
+
+OSRM_STUB_LATENCY_MS = float(os.getenv("OSRM_STUB_LATENCY_MS", "0"))   # atraso artificial por pedido
+OSRM_STUB_SPEED_KMH = float(os.getenv("OSRM_STUB_SPEED_KMH", "30"))
+OSRM_STUB_DETOUR = float(os.getenv("OSRM_STUB_DETOUR", "1.3"))
+OSRM_STUB_POINTS_PER_LEG = int(os.getenv("OSRM_STUB_POINTS_PER_LEG", "20"))  # tamanho da geometria gerada
+
+app = FastAPI()
+
+
+def parse_coordinates(coordinates):
+    """ "lon,lat;lon,lat" -> (lista de lon, lista de lat)"""
+    pairs = [tuple(float(v) for v in pair.split(",")) for pair in coordinates.split(";")]
+    return [p[0] for p in pairs], [p[1] for p in pairs]
+
+
+def leg_geometry(lon1, lat1, lon2, lat2):
+    t = np.linspace(0.0, 1.0, OSRM_STUB_POINTS_PER_LEG)
+    return np.column_stack((lon1 + (lon2 - lon1) * t, lat1 + (lat2 - lat1) * t)).round(6).tolist()
+
+
+async def simulate_latency():
+    if OSRM_STUB_LATENCY_MS > 0:
+        await asyncio.sleep(OSRM_STUB_LATENCY_MS / 1000)
+
+
+@app.get("/route/v1/driving/{coordinates}")
+async def route(coordinates: str, steps: bool = False):
+    await simulate_latency()
+    try:
+        lon, lat = parse_coordinates(coordinates)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"code": "InvalidUrl", "message": "Coordenadas inválidas"})
+    if len(lon) < 2:
+        return JSONResponse(status_code=400, content={"code": "InvalidQuery", "message": "Mínimo de 2 coordenadas"})
+
+    legs = []
+    geometry = []
+    for i in range(len(lon) - 1):
+        km = float(haversine(lat[i], lon[i], lat[i + 1], lon[i + 1])) * OSRM_STUB_DETOUR
+        coords = leg_geometry(lon[i], lat[i], lon[i + 1], lat[i + 1])
+        geometry.extend(coords if i == 0 else coords[1:])
+        distance = km * 1000
+        duration = km / OSRM_STUB_SPEED_KMH * 3600
+        leg = {"distance": distance, "duration": duration, "summary": "", "steps": []}
+        if steps:
+            leg["steps"] = [
+                {
+                    "name": "Rua Simulada",
+                    "distance": distance,
+                    "duration": duration,
+                    "geometry": {"type": "LineString", "coordinates": coords},
+                    "maneuver": {"type": "depart", "location": coords[0]},
+                },
+                {
+                    "name": "Rua Simulada",
+                    "distance": 0,
+                    "duration": 0,
+                    "geometry": {"type": "LineString", "coordinates": [coords[-1], coords[-1]]},
+                    "maneuver": {"type": "arrive", "location": coords[-1]},
+                },
+            ]
+        legs.append(leg)
+
+    return {
+        "code": "Ok",
+        "routes": [{
+            "distance": sum(leg["distance"] for leg in legs),
+            "duration": sum(leg["duration"] for leg in legs),
+            "geometry": {"type": "LineString", "coordinates": geometry},
+            "legs": legs,
+        }],
+        "waypoints": [{"location": [x, y], "name": ""} for x, y in zip(lon, lat)],
+    }
+
+
+@app.get("/table/v1/driving/{coordinates}")
+async def table(coordinates: str, sources: str = "", destinations: str = "", annotations: str = "duration"):
+    await simulate_latency()
+    try:
+        lon, lat = parse_coordinates(coordinates)
+        src = [int(i) for i in sources.split(";")] if sources else list(range(len(lon)))
+        dst = [int(i) for i in destinations.split(";")] if destinations else list(range(len(lon)))
+    except ValueError:
+        return JSONResponse(status_code=400, content={"code": "InvalidUrl", "message": "Parâmetros inválidos"})
+
+    lat = np.asarray(lat)
+    lon = np.asarray(lon)
+    km = haversine(lat[src][:, None], lon[src][:, None], lat[dst][None, :], lon[dst][None, :]) * OSRM_STUB_DETOUR
+
+    result = {"code": "Ok"}
+    if "duration" in annotations:
+        result["durations"] = (km / OSRM_STUB_SPEED_KMH * 3600).round(1).tolist()
+    if "distance" in annotations:
+        result["distances"] = (km * 1000).round(1).tolist()
+    return result
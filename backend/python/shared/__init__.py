@@ -0,0 +1,2 @@
+# shared/__init__.py
+# Código comum aos serviços Python (copiado para /app/shared em cada contêiner).
@@ -0,0 +1,197 @@
+# shared/aiodb.py
+# Acesso assíncrono ao PostgreSQL para os handlers FastAPI (async def).
+# Usa o driver psycopg 3 com o AsyncConnectionPool do psycopg_pool, para que
+# um único worker uvicorn atenda milhares de pedidos em simultâneo sem ocupar
+# uma thread do threadpool por pedido.
+import logging
+import time
+import weakref
+from contextlib import asynccontextmanager
+
+import psycopg
+from fastapi import HTTPException
+from psycopg.pq import TransactionStatus
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool, PoolTimeout
+
+from shared.db import (
+    DATABASE_URL,
+    DB_POOL_CHECK_IDLE,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MAX_USES,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+)
+from shared.instrumentation import observe_query
+
+logger = logging.getLogger(__name__)
+
+
+class TimedAsyncCursor(psycopg.AsyncCursor):
+    """Cursor que mede cada execute() para GET /metrics (db_query_duration_seconds)."""
+
+    async def execute(self, query, params=None, **kwargs):
+        started = time.perf_counter()
+        failed = False
+        try:
+            return await super().execute(query, params, **kwargs)
+        except psycopg.Error:
+            failed = True
+            raise
+        finally:
+            observe_query(query, time.perf_counter() - started, failed)
+
+
+class _ConnectionInfo:
+    """Dados de utilização de uma ligação física (para reciclagem e health-check)."""
+
+    def __init__(self):
+        self.uses = 0
+        self.last_used_at = time.monotonic()
+
+
+class AsyncPool:
+    """
+    Invólucro sobre o AsyncConnectionPool com as mesmas regras do pool síncrono:
+    tamanho mínimo/máximo, tempo de espera, health-check de ligações paradas e
+    reciclagem após N utilizações ou após max_lifetime segundos.
+    """
+
+    def __init__(self, dsn, min_size=1, max_size=10, timeout=5.0,
+                 max_uses=1000, max_lifetime=1800.0, check_idle=5.0):
+        self.max_uses = max_uses
+        self.check_idle = check_idle
+        self._info = weakref.WeakKeyDictionary()
+        self._recycled = 0
+        self._pool = AsyncConnectionPool(
+            dsn,
+            min_size=min_size,
+            max_size=max_size,
+            timeout=timeout,
+            max_lifetime=max_lifetime,
+            kwargs={"row_factory": dict_row, "cursor_factory": TimedAsyncCursor},
+            check=self._check,
+            open=False,
+        )
+
+    async def open(self):
+        await self._pool.open()
+
+    async def close(self):
+        await self._pool.close()
+
+    async def getconn(self, timeout=None):
+        """Obtém uma ligação do pool, à espera no máximo `timeout` segundos."""
+        conn = await self._pool.getconn(timeout=timeout)
+        self._info.setdefault(conn, _ConnectionInfo()).uses += 1
+        return conn
+
+    async def putconn(self, conn):
+        """Devolve a ligação ao pool, desfazendo qualquer transação deixada aberta."""
+        if not conn.closed and conn.info.transaction_status != TransactionStatus.IDLE:
+            try:
+                await conn.rollback()
+            except psycopg.Error:
+                await conn.close()
+        info = self._info.get(conn)
+        if info is not None:
+            info.last_used_at = time.monotonic()
+            if info.uses >= self.max_uses and not conn.closed:
+                # Uma ligação fechada é descartada e substituída pelo pool.
+                self._recycled += 1
+                await conn.close()
+        await self._pool.putconn(conn)
+
+    @asynccontextmanager
+    async def connection(self, timeout=None):
+        """`async with pool.connection() as conn: ...` — a ligação volta ao pool no fim."""
+        conn = await self.getconn(timeout)
+        try:
+            yield conn
+        finally:
+            await self.putconn(conn)
+
+    def stats(self):
+        """Fotografia do estado do pool, no mesmo formato do pool síncrono."""
+        s = self._pool.get_stats()
+        size = s.get("pool_size", 0)
+        idle = s.get("pool_available", 0)
+        in_use = size - idle
+        acquires = s.get("requests_num", 0)
+        wait_ms = s.get("requests_wait_ms", 0)
+        return {
+            "min_size": s.get("pool_min", self._pool.min_size),
+            "max_size": s.get("pool_max", self._pool.max_size),
+            "size": size,
+            "idle": idle,
+            "in_use": in_use,
+            "waiting": s.get("requests_waiting", 0),
+            "saturation": round(in_use / self._pool.max_size, 3),
+            "acquires": acquires,
+            "timeouts": s.get("requests_errors", 0),
+            "wait_ms_total": wait_ms,
+            "wait_ms_avg": round(wait_ms / acquires, 3) if acquires else 0.0,
+            "connections_created": s.get("connections_num", 0),
+            "connections_recycled": self._recycled,
+            "failed_health_checks": s.get("connections_lost", 0),
+        }
+
+    async def _check(self, conn):
+        """Só testa com SELECT 1 as ligações paradas há mais de check_idle segundos."""
+        info = self._info.get(conn)
+        if info is not None and time.monotonic() - info.last_used_at < self.check_idle:
+            return
+        await AsyncConnectionPool.check_connection(conn)
+
+
+# --- Pool do processo e dependência FastAPI ---
+
+_pool = None
+
+
+def get_async_pool():
+    """Devolve o pool assíncrono do processo, criando-o na primeira utilização."""
+    global _pool
+    if _pool is None:
+        _pool = AsyncPool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            max_uses=DB_POOL_MAX_USES,
+            max_lifetime=DB_POOL_MAX_LIFETIME,
+            check_idle=DB_POOL_CHECK_IDLE,
+        )
+    return _pool
+
+
+async def open_async_pool():
+    """Abre o pool no arranque do serviço (lifespan)."""
+    await get_async_pool().open()
+
+
+async def close_async_pool():
+    """Fecha o pool no encerramento do serviço (lifespan)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def get_async_db():
+    """Dependência FastAPI: empresta uma ligação assíncrona durante o pedido."""
+    pool = get_async_pool()
+    try:
+        conn = await pool.getconn()
+    except PoolTimeout as e:
+        logger.error("Pool de ligações esgotado: %s", e)
+        raise HTTPException(status_code=503, detail="Serviço sobrecarregado, tente novamente.")
+    except psycopg.OperationalError as e:
+        logger.error("Erro ao conectar à base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+
+    try:
+        yield conn
+    finally:
+        await pool.putconn(conn)
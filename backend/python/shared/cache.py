@@ -0,0 +1,111 @@
+# shared/cache.py
+# Cache em memória com expiração (TTL) e limite de tamanho (LRU), partilhada
+# pelos serviços Python. Pedidos simultâneos para a mesma chave em falta são
+# agrupados: só um carrega o valor, os outros esperam pelo mesmo resultado.
+import asyncio
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Cache LRU com TTL por entrada e métricas de acerto."""
+
+    def __init__(self, max_size=1000, ttl=300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._inflight = {}
+
+        # Métricas
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._coalesced = 0
+
+    def get(self, key, default=None):
+        """Valor guardado ou `default` se não existir / tiver expirado."""
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self._misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self._expirations += 1
+            self._misses += 1
+            return default
+        self._data.move_to_end(key)
+        self._hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self._evictions += 1
+
+    def delete(self, key):
+        """
+        Remove a entrada e desliga a carga em curso para a mesma chave: o valor
+        que essa carga obtiver (lido antes da escrita que motivou o delete) já
+        não é guardado, e os pedidos seguintes fazem uma carga nova.
+        """
+        self._data.pop(key, None)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+        self._inflight.clear()
+
+    async def get_or_load(self, key, loader, ttl=None):
+        """
+        Devolve o valor em cache ou chama `await loader()` para o obter.
+        Resultados None não são guardados (ex: falha no serviço externo).
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await loader()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # marca a exceção como lida se ninguém estiver à espera
+            raise
+        else:
+            # Se a chave foi invalidada durante a carga, o valor pode ser anterior à escrita.
+            if value is not None and self._inflight.get(key) is future:
+                self.set(key, value, ttl)
+            future.set_result(value)
+            return value
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self):
+        lookups = self._hits + self._misses
+        return {
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self._hits,
+            "misses": self._misses,
+            "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+        }
@@ -0,0 +1,22 @@
+# shared/db.py
+# Configuração da ligação ao PostgreSQL partilhada pelos serviços Python.
+# O pool de ligações dos handlers FastAPI está em shared/aiodb.py; as
+# migrações (shared/migrate.py) e os benchmarks ligam-se com psycopg.connect()
+# a partir de DATABASE_URL.
+import os
+
+# --- Configuração da Base de Dados ---
+DB_NAME = os.getenv("POSTGRES_DB", "van_management_db")
+DB_USER = os.getenv("POSTGRES_USER", "vanuser")
+DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "vanpassword")
+DB_HOST = os.getenv("DB_HOST", "postgres")
+
+DATABASE_URL = f"dbname='{DB_NAME}' user='{DB_USER}' password='{DB_PASSWORD}' host='{DB_HOST}'"
+
+# --- Configuração do Pool ---
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))              # segundos à espera de uma ligação livre
+DB_POOL_MAX_USES = int(os.getenv("DB_POOL_MAX_USES", "1000"))           # reciclar após N utilizações
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")) # reciclar após N segundos de vida
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "5"))        # testar com SELECT 1 se esteve parada mais que isto
@@ -0,0 +1,13 @@
+# shared/geo.py
+# Distância em linha reta (haversine) entre dois pontos, comum aos serviços.
+# O routing_service tem a versão vetorizada com NumPy em distance.py.
+import math
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distância (km) entre dois pontos (lat, lon em graus)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,343 @@
+# shared/instrumentation.py
+# Instrumentação comum aos serviços: métricas no formato de texto do Prometheus
+# (GET /metrics), logs estruturados em JSON e um ID por pedido (X-Request-ID).
+#
+# Feito para ficar sempre ligado em produção: as métricas são contadores em
+# memória sem dependências externas, o middleware é ASGI puro (sem
+# BaseHTTPMiddleware) e só os pedidos/queries lentos ou com erro geram uma
+# linha de log. As métricas são por processo; com vários workers uvicorn cada
+# um expõe as suas (o Prometheus soma-as pelo label `instance`).
+#
+# Utilização num serviço:
+#     instrumentation.instrument(app, "routes_service")
+#     instrumentation.register_queries(queries)
+#     instrumentation.register_stats("db_pool", lambda: get_async_pool().stats())
+import contextvars
+import json
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from fastapi import Response
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")                    # "json" ou "text" (desenvolvimento)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))    # pedidos acima disto são registados no log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))         # queries acima disto são registadas no log
+
+REQUEST_ID_HEADER = "x-request-id"
+
+# Segundos; cobrem desde uma leitura em cache até uma chamada lenta ao OSRM
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+logger = logging.getLogger(__name__)
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+
+
+def get_request_id():
+    """ID do pedido HTTP em curso (None fora de um pedido)."""
+    return _request_id.get()
+
+
+def request_id_headers():
+    """Cabeçalhos para propagar o ID do pedido nas chamadas a outros serviços."""
+    request_id = _request_id.get()
+    return {REQUEST_ID_HEADER: request_id} if request_id else {}
+
+
+# --- Métricas ---
+
+_metrics = {}
+_stats_sources = []
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()  # os handlers síncronos correm no threadpool
+        _metrics[name] = self
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Contador monótono, com um valor por combinação de labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, help_text, labelnames=()):
+        super().__init__(name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [("", self.labelnames, labels, value) for labels, value in values]
+
+
+class Histogram(_Metric):
+    """Histograma com baldes fixos (le), soma e contagem por combinação de labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [contagens por balde (+ "+Inf"), soma]
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def samples(self):
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        bucket_names = self.labelnames + ("le",)
+        samples = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", bucket_names, labels + (_format_value(bound),), cumulative))
+            samples.append(("_sum", self.labelnames, labels, round(total, 6)))
+            samples.append(("_count", self.labelnames, labels, cumulative))
+        return samples
+
+
+def register_stats(prefix, source, help_text=None):
+    """
+    Expõe como gauges os valores numéricos de um dict de estatísticas (ex.:
+    pool.stats(), cache.stats()), lidos no momento do scrape. Dicts aninhados
+    dão nomes compostos: osrm.stats()["route_cache"]["hits"] -> osrm_route_cache_hits.
+    """
+    _stats_sources.append((prefix, source, help_text or f"Estatísticas de {prefix}"))
+
+
+def _flatten(prefix, stats):
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+
+def render_metrics():
+    """Todas as métricas do processo no formato de texto do Prometheus (0.0.4)."""
+    lines = []
+    for metric in list(_metrics.values()):
+        lines.extend(metric.render())
+    for prefix, source, help_text in _stats_sources:
+        try:
+            stats = source()
+        except Exception as e:
+            logger.warning("Falha ao ler estatísticas de %s: %r", prefix, e)
+            continue
+        for name, value in _flatten(prefix, stats):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "Duração dos pedidos HTTP, até ao fim da resposta",
+    ("method", "route", "status"),
+)
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Duração de cada execução de query (nome da constante em queries.py)",
+    ("query",),
+)
+DB_QUERY_ERRORS = Counter("db_query_errors_total", "Queries que terminaram em erro", ("query",))
+
+
+# --- Queries ---
+
+_query_names = {}
+
+
+def register_queries(module):
+    """Dá às queries de um módulo queries.py o nome da sua constante, para as métricas."""
+    for name, value in vars(module).items():
+        if name.isupper() and isinstance(value, str):
+            _query_names[value] = name
+
+
+def query_name(query):
+    if isinstance(query, str):
+        return _query_names.get(query, "other")
+    return "dynamic"  # psycopg.sql.Composed montada no pedido (ex.: LIST_ROUTES, DDL)
+
+
+def observe_query(query, elapsed, failed=False):
+    """Regista a duração de uma query (e o erro, se falhou); as lentas vão para o log."""
+    name = query_name(query)
+    DB_QUERY_DURATION.observe(elapsed, name)
+    if failed:
+        DB_QUERY_ERRORS.inc(name)
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        logger.warning("Query lenta", extra={"fields": {"query": name, "duration_ms": round(elapsed * 1000, 1)}})
+
+
+# --- Logs ---
+
+class JsonFormatter(logging.Formatter):
+    """Uma linha JSON por registo, com o serviço, o ID do pedido e campos extra (extra={"fields": {...}})."""
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "service": self.service,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = _request_id.get()
+        if request_id:
+            entry["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(service):
+    """Configura o logger raiz do processo (os loggers do uvicorn ficam como estão)."""
+    handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        handler.setFormatter(JsonFormatter(service))
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    # Uma linha por chamada HTTP de saída (OSRM, outros serviços) é demasiado em pico
+    logging.getLogger("httpx").setLevel(max(logging.WARNING, root.level))
+
+
+# --- Middleware e endpoint /metrics ---
+
+class InstrumentationMiddleware:
+    """
+    Atribui um ID a cada pedido (o X-Request-ID recebido ou um novo), devolve-o
+    na resposta e mede a duração por rota (o template, ex.: /routes/{route_id},
+    para não criar uma série por ID).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:128]
+                break
+        token = _request_id.set(request_id or uuid.uuid4().hex)
+        started = time.perf_counter()
+        status = 500
+        elapsed = None
+
+        async def send_with_request_id(message):
+            nonlocal status, elapsed
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-request-id", _request_id.get().encode("latin-1")))
+                message["headers"] = headers
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                # Tarefas em segundo plano (BackgroundTasks) correm depois disto e não contam.
+                elapsed = time.perf_counter() - started
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception:
+            logger.exception("Erro não tratado", extra={"fields": {"method": scope["method"], "path": scope["path"]}})
+            raise
+        finally:
+            if elapsed is None:
+                elapsed = time.perf_counter() - started
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_DURATION.observe(elapsed, scope["method"], route, str(status))
+            if status >= 500 or elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    "Pedido lento ou com erro",
+                    extra={"fields": {
+                        "method": scope["method"],
+                        "route": route,
+                        "status": status,
+                        "duration_ms": round(elapsed * 1000, 1),
+                    }},
+                )
+            _request_id.reset(token)
+
+
+def instrument(app, service):
+    """Liga logs estruturados, o middleware de pedidos e GET /metrics num serviço FastAPI."""
+    setup_logging(service)
+    app.add_middleware(InstrumentationMiddleware)
+
+    async def metrics():
+        return Response(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,159 @@
+# shared/migrate.py
+# Migrações versionadas do esquema PostgreSQL usado pelos serviços Python.
+#
+# Cada ficheiro shared/migrations/NNNN_descricao.sql é aplicado uma única vez,
+# por ordem de versão e dentro de uma transação, e fica registado na tabela
+# schema_migrations (com o checksum do conteúdo, para detetar ficheiros já
+# aplicados que foram alterados). Um advisory lock garante que vários serviços
+# a arrancar ao mesmo tempo não aplicam a mesma migração duas vezes.
+#
+# Uso (a partir de backend/python, ou de /app dentro do contentor), antes de
+# atualizar os serviços:
+#   python -m shared.migrate            aplica as migrações em falta
+#   python -m shared.migrate --status   lista as migrações e o seu estado
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+from pathlib import Path
+
+import psycopg
+
+from shared.db import DATABASE_URL
+
+MIGRATIONS_DIR = Path(__file__).with_name("migrations")
+# As migrações correm num passo de deploy próprio (python -m shared.migrate, o
+# serviço "migrate" do docker-compose): uma migração que falhe ou crie índices
+# em tabelas grandes não impede nem atrasa o arranque dos serviços. Com
+# DB_MIGRATE_ON_STARTUP=true os serviços aplicam-nas no arranque (desenvolvimento).
+DB_MIGRATE_ON_STARTUP = os.getenv("DB_MIGRATE_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+
+logger = logging.getLogger(__name__)
+
+_ADVISORY_LOCK_ID = 4_815_162_342  # identificador arbitrário, igual em todos os serviços
+_FILENAME = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class MigrationError(Exception):
+    """Migração inválida, alterada depois de aplicada ou que falhou."""
+
+
+class Migration:
+    __slots__ = ("version", "name", "sql", "checksum")
+
+    def __init__(self, version, name, sql):
+        self.version = version
+        self.name = name
+        self.sql = sql
+        self.checksum = hashlib.sha256(sql.encode()).hexdigest()
+
+
+def discover(directory=MIGRATIONS_DIR):
+    """Migrações encontradas na pasta, ordenadas por versão."""
+    migrations = {}
+    for path in sorted(Path(directory).glob("*.sql")):
+        match = _FILENAME.match(path.name)
+        if not match:
+            raise MigrationError(f"Nome de migração inválido: {path.name} (esperado NNNN_descricao.sql)")
+        version = int(match.group(1))
+        if version in migrations:
+            raise MigrationError(f"Versão de migração repetida: {version}")
+        migrations[version] = Migration(version, match.group(2), path.read_text(encoding="utf-8"))
+    return [migrations[v] for v in sorted(migrations)]
+
+
+def _ensure_table(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version    INTEGER PRIMARY KEY,
+            name       TEXT NOT NULL,
+            checksum   TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_migrations(conn):
+    """version -> checksum das migrações já aplicadas."""
+    _ensure_table(conn)
+    return dict(conn.execute("SELECT version, checksum FROM schema_migrations").fetchall())
+
+
+def migrate(dsn=DATABASE_URL, target=None, directory=MIGRATIONS_DIR):
+    """
+    Aplica as migrações em falta até `target` (inclusive; None = todas).
+    Devolve a lista das versões aplicadas nesta chamada.
+    """
+    migrations = discover(directory)
+    done = []
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        conn.execute("SELECT pg_advisory_lock(%s)", (_ADVISORY_LOCK_ID,))
+        try:
+            applied = applied_migrations(conn)
+            for migration in migrations:
+                if target is not None and migration.version > target:
+                    break
+                if migration.version in applied:
+                    if applied[migration.version] != migration.checksum:
+                        raise MigrationError(
+                            f"A migração {migration.version:04d}_{migration.name} foi alterada depois de "
+                            "aplicada; crie uma nova migração em vez de editar esta."
+                        )
+                    continue
+                logger.info("A aplicar migração %04d_%s...", migration.version, migration.name)
+                try:
+                    with conn.transaction():
+                        conn.execute(migration.sql)
+                        conn.execute(
+                            "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                            (migration.version, migration.name, migration.checksum),
+                        )
+                except psycopg.Error as e:
+                    raise MigrationError(f"Falha na migração {migration.version:04d}_{migration.name}: {e}") from e
+                done.append(migration.version)
+        finally:
+            conn.execute("SELECT pg_advisory_unlock(%s)", (_ADVISORY_LOCK_ID,))
+    return done
+
+
+def status(dsn=DATABASE_URL, directory=MIGRATIONS_DIR):
+    """Lista (versão, nome, estado) com estado 'applied', 'pending' ou 'changed'."""
+    with psycopg.connect(dsn, autocommit=True) as conn:
+        applied = applied_migrations(conn)
+    result = []
+    for migration in discover(directory):
+        if migration.version not in applied:
+            state = "pending"
+        elif applied[migration.version] != migration.checksum:
+            state = "changed"
+        else:
+            state = "applied"
+        result.append((migration.version, migration.name, state))
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrações do esquema PostgreSQL dos serviços Python.")
+    parser.add_argument("--status", action="store_true", help="mostrar o estado sem aplicar nada")
+    parser.add_argument("--target", type=int, help="aplicar só até esta versão (inclusive)")
+    parser.add_argument("--dsn", default=DATABASE_URL, help="ligação ao PostgreSQL (por omissão, as variáveis POSTGRES_*)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    try:
+        if args.status:
+            for version, name, state in status(args.dsn):
+                print(f"{version:04d}_{name}: {state}")
+        else:
+            done = migrate(args.dsn, target=args.target)
+            print(f"{len(done)} migração(ões) aplicada(s).")
+    except (MigrationError, psycopg.OperationalError) as e:
+        print(f"Erro: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
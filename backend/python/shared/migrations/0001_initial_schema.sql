@@ -0,0 +1,52 @@
+-- 0001_initial_schema.sql
+-- Tabelas usadas pelos serviços Python (e pelo auth_service para `users`).
+-- IF NOT EXISTS: em bases de dados já criadas à mão esta migração só fica registada.
+
+CREATE TABLE IF NOT EXISTS users (
+    id            SERIAL PRIMARY KEY,
+    name          VARCHAR(255) NOT NULL,
+    email         VARCHAR(255) NOT NULL UNIQUE,
+    password_hash VARCHAR(255) NOT NULL,
+    role          VARCHAR(50)  NOT NULL,          -- 'MOTORISTA' | 'PASSAGEIRO' | ...
+    tenant_id     VARCHAR(100) NOT NULL,
+    address       TEXT,
+    latitude      DOUBLE PRECISION,
+    longitude     DOUBLE PRECISION,
+    created_at    TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS routes (
+    id         SERIAL PRIMARY KEY,
+    name       VARCHAR(255) NOT NULL,
+    driver_id  INTEGER NOT NULL REFERENCES users (id),
+    tenant_id  VARCHAR(100) NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS passenger_routes (
+    id           SERIAL PRIMARY KEY,
+    route_id     INTEGER NOT NULL REFERENCES routes (id) ON DELETE CASCADE,
+    passenger_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    tenant_id    VARCHAR(100) NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS trips (
+    id           SERIAL PRIMARY KEY,
+    route_id     INTEGER NOT NULL REFERENCES routes (id) ON DELETE CASCADE,
+    trip_date    DATE NOT NULL,
+    tenant_id    VARCHAR(100) NOT NULL,
+    status       VARCHAR(50) NOT NULL DEFAULT 'SCHEDULED',
+    current_lat  DOUBLE PRECISION,
+    current_long DOUBLE PRECISION,
+    CONSTRAINT trips_route_date_key UNIQUE (route_id, trip_date)  -- ON CONFLICT em POST /confirmations
+);
+
+CREATE TABLE IF NOT EXISTS trip_confirmations (
+    id           SERIAL PRIMARY KEY,
+    trip_id      INTEGER NOT NULL REFERENCES trips (id) ON DELETE CASCADE,
+    passenger_id INTEGER NOT NULL REFERENCES users (id) ON DELETE CASCADE,
+    status       VARCHAR(50) NOT NULL,            -- 'CONFIRMED' | 'CANCELLED'
+    tenant_id    VARCHAR(100) NOT NULL,
+    confirmed_at TIMESTAMPTZ,
+    CONSTRAINT trip_confirmations_trip_passenger_key UNIQUE (trip_id, passenger_id)
+);
@@ -0,0 +1,44 @@
+-- 0002_hot_path_indexes.sql
+-- Índices para os predicados das consultas frequentes (routes_service/queries.py
+-- e trips_service/queries.py). Verificar com benchmarks/query_plans.py.
+
+-- A inscrição individual não verificava repetidos: antes do índice único fica só
+-- a primeira inscrição (menor id) de cada passageiro em cada rota.
+DELETE FROM passenger_routes pr
+USING passenger_routes kept
+WHERE kept.route_id = pr.route_id
+  AND kept.passenger_id = pr.passenger_id
+  AND kept.id < pr.id;
+
+-- Roster de uma rota e ON CONFLICT da inscrição em massa; também serve route_id sozinho.
+CREATE UNIQUE INDEX IF NOT EXISTS passenger_routes_route_passenger_key
+    ON passenger_routes (route_id, passenger_id);
+
+-- GET /passengers/{id}/route e validação da inscrição em massa
+CREATE INDEX IF NOT EXISTS passenger_routes_passenger_idx
+    ON passenger_routes (passenger_id, route_id);
+
+-- Viagem de hoje de uma rota (TODAY_TRIP, TRIP_LOCATION, junções do painel da frota).
+-- O id vai no índice para a procura da viagem não precisar de ler a tabela.
+CREATE INDEX IF NOT EXISTS trips_route_date_tenant_idx
+    ON trips (route_id, trip_date, tenant_id) INCLUDE (id);
+
+-- Passageiros / motoristas de um tenant
+CREATE INDEX IF NOT EXISTS users_tenant_role_idx
+    ON users (tenant_id, role);
+
+-- Inscrição em massa por email (lower(email) = ANY(...))
+CREATE INDEX IF NOT EXISTS users_tenant_email_idx
+    ON users (tenant_id, lower(email));
+
+-- GET /routes paginado por id (keyset)
+CREATE INDEX IF NOT EXISTS routes_tenant_id_idx
+    ON routes (tenant_id, id);
+
+-- GET /drivers/{id}/route
+CREATE INDEX IF NOT EXISTS routes_driver_idx
+    ON routes (driver_id);
+
+-- Chaves estrangeiras sem índice tornam lentos os DELETE em cascata
+CREATE INDEX IF NOT EXISTS trip_confirmations_passenger_idx
+    ON trip_confirmations (passenger_id);
@@ -0,0 +1,18 @@
+-- 0003_location_history.sql
+-- Histórico de posições GPS dos motoristas (só inserções), particionado por mês
+-- em recorded_at. As partições são criadas pelo trips_service (history.py) à
+-- medida que são precisas; apagar um mês antigo é um DROP TABLE da partição.
+-- Sem chave estrangeira para trips: as escritas são em lote e não devem esperar por ela.
+
+CREATE TABLE IF NOT EXISTS location_history (
+    tenant_id   VARCHAR(100) NOT NULL,
+    route_id    INTEGER NOT NULL,
+    trip_date   DATE NOT NULL,
+    recorded_at TIMESTAMPTZ NOT NULL,
+    latitude    DOUBLE PRECISION NOT NULL,
+    longitude   DOUBLE PRECISION NOT NULL
+) PARTITION BY RANGE (recorded_at);
+
+-- Trajeto de uma viagem por ordem cronológica (criado em cada partição)
+CREATE INDEX IF NOT EXISTS location_history_trip_time_idx
+    ON location_history (tenant_id, route_id, trip_date, recorded_at);
@@ -0,0 +1,92 @@
+# shared/serialization.py
+# Caminho rápido de serialização JSON das respostas, comum aos serviços.
+#
+# Por omissão o FastAPI valida de novo o que o handler devolve contra o
+# response_model (linha a linha, no caso das listas vindas da base de dados) e
+# só depois o codifica com o json da biblioteca padrão. Com JSON_FAST_PATH=true
+# os handlers que já produzem dados no formato final devolvem logo a resposta
+# serializada (orjson, se estiver instalado), sem essa segunda validação.
+#
+# Os modelos Pydantic são serializados pelo próprio serializador do modelo
+# (igual ao que o FastAPI enviaria); dicionários e linhas da base de dados vão
+# pelo orjson. raw_response() envia bytes já serializados, para reutilizar o
+# corpo de respostas em cache.
+import json
+import os
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+JSON_FAST_PATH = os.getenv("JSON_FAST_PATH", "false").lower() in ("1", "true", "yes")
+
+try:
+    import orjson
+except ImportError:  # dependência opcional
+    orjson = None
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+def _default(value):
+    """Tipos que o orjson / json não conhecem, com a mesma forma que o FastAPI lhes dá."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    raise TypeError(f"Tipo não serializável em JSON: {type(value).__name__}")
+
+
+def dumps(content):
+    """Conteúdo em JSON (bytes, UTF-8, sem espaços)."""
+    if isinstance(content, BaseModel):
+        return type(content).__pydantic_serializer__.to_json(content)
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse que serializa com dumps() (orjson / serializador do modelo)."""
+
+    def render(self, content):
+        return dumps(content)
+
+
+def raw_response(body, status_code=200, headers=None):
+    """Resposta com um corpo JSON já serializado (ex: guardado em cache)."""
+    return Response(content=body, status_code=status_code, headers=headers, media_type=JSON_MEDIA_TYPE)
+
+
+def json_response(content, status_code=200, headers=None):
+    """JSONResponse para conteúdo já no formato final: FastJSONResponse com o caminho rápido ligado."""
+    response_class = FastJSONResponse if JSON_FAST_PATH else JSONResponse
+    return response_class(content=content, status_code=status_code, headers=headers)
+
+
+def fast_response(content, headers=None):
+    """
+    Com JSON_FAST_PATH, devolve já a resposta serializada e o FastAPI não volta
+    a validar `content` contra o response_model; sem ele devolve `content` tal
+    como está. Só para conteúdo que já tem a forma do response_model.
+    `headers` só vão na resposta do caminho rápido: sem ele, o handler tem de os
+    pôr também no Response injetado pelo FastAPI.
+    """
+    if not JSON_FAST_PATH:
+        return content
+    return FastJSONResponse(content=content, headers=headers)
+
+
+def stats():
+    return {"fast_path": JSON_FAST_PATH, "orjson": orjson is not None}
@@ -0,0 +1,117 @@
+# broadcast.py
+# Difusão das posições dos motoristas para os passageiros ligados por WebSocket.
+# Cada rota tem o seu grupo de subscritores; cada subscritor tem uma fila curta
+# própria, para que um telemóvel lento nunca atrase os outros.
+import asyncio
+import os
+import time
+from collections import defaultdict
+
+LOCATION_WS_QUEUE_SIZE = int(os.getenv("LOCATION_WS_QUEUE_SIZE", "8"))          # mensagens em espera por cliente
+LOCATION_WS_MIN_INTERVAL = float(os.getenv("LOCATION_WS_MIN_INTERVAL", "0"))    # segundos entre envios por rota (0 = sem limite)
+LOCATION_WS_SEND_TIMEOUT = float(os.getenv("LOCATION_WS_SEND_TIMEOUT", "10"))   # cliente que não recebe neste tempo é desligado
+
+
+class Subscriber:
+    """Um cliente ligado a uma rota, com fila limitada."""
+
+    def __init__(self, queue_size):
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def offer(self, message):
+        """Enfileira sem bloquear. Se a fila estiver cheia, descarta a posição mais antiga:
+        para localização só interessa a mais recente."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class LocationBroadcaster:
+    """Grupos de difusão por (tenant_id, route_id), com limite opcional de frequência por rota."""
+
+    def __init__(self, queue_size=LOCATION_WS_QUEUE_SIZE, min_interval=LOCATION_WS_MIN_INTERVAL):
+        self.queue_size = queue_size
+        self.min_interval = min_interval
+        self._groups = defaultdict(set)
+        self._last_sent = {}
+        self._pending = {}   # key -> render() da última posição retida pelo intervalo mínimo
+        self._timers = {}    # key -> envio agendado (call_later) dessa posição
+
+        # Métricas
+        self._published = 0
+        self._delivered = 0
+        self._throttled = 0
+        self._dropped = 0
+
+    def subscribe(self, tenant_id, route_id):
+        subscriber = Subscriber(self.queue_size)
+        self._groups[(tenant_id, route_id)].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, tenant_id, route_id, subscriber):
+        key = (tenant_id, route_id)
+        group = self._groups.get(key)
+        if group is None:
+            return
+        group.discard(subscriber)
+        self._dropped += subscriber.dropped
+        if not group:
+            del self._groups[key]
+            self._last_sent.pop(key, None)
+            self._pending.pop(key, None)
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+
+    def publish(self, tenant_id, route_id, render):
+        """
+        Envia a mensagem a todos os subscritores da rota (respeitando o intervalo
+        mínimo). `render()` constrói a mensagem no momento do envio, para que uma
+        posição retida pelo intervalo saia com a idade (age_seconds) correta.
+        """
+        key = (tenant_id, route_id)
+        if key not in self._groups:
+            return
+        self._published += 1
+
+        if self.min_interval > 0:
+            elapsed = time.monotonic() - self._last_sent.get(key, 0.0)
+            if elapsed < self.min_interval:
+                # Guarda só a última posição e envia-a no fim do intervalo.
+                if key not in self._pending:
+                    self._timers[key] = asyncio.get_running_loop().call_later(
+                        self.min_interval - elapsed, self._send_pending, key
+                    )
+                else:
+                    self._throttled += 1
+                self._pending[key] = render
+                return
+
+        self._fan_out(key, render())
+
+    def stats(self):
+        return {
+            "routes_with_subscribers": len(self._groups),
+            "subscribers": sum(len(group) for group in self._groups.values()),
+            "messages_published": self._published,
+            "messages_delivered": self._delivered,
+            "messages_throttled": self._throttled,
+            "messages_dropped": self._dropped + sum(
+                sub.dropped for group in self._groups.values() for sub in group
+            ),
+            "min_interval_seconds": self.min_interval,
+        }
+
+    def _send_pending(self, key):
+        self._timers.pop(key, None)
+        render = self._pending.pop(key, None)
+        if render is not None and key in self._groups:
+            self._fan_out(key, render())
+
+    def _fan_out(self, key, message):
+        self._last_sent[key] = time.monotonic()
+        for subscriber in self._groups[key]:
+            subscriber.offer(message)
+            self._delivered += 1
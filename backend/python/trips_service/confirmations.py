@@ -0,0 +1,159 @@
+# confirmations.py
+# Ingestão das confirmações de presença em lote.
+# Às 6h30 uma rota inteira confirma no mesmo minuto; em vez de um INSERT (e uma
+# transação) por passageiro, os pedidos que chegam dentro de
+# CONFIRMATION_BATCH_WINDOW segundos são gravados juntos com um único
+# INSERT ... SELECT FROM unnest(...) ON CONFLICT DO UPDATE.
+#
+# Cada pedido só recebe resposta depois do COMMIT do lote em que entrou, por
+# isso um GET /trips/today/{route_id}/confirmations feito a seguir (em qualquer
+# worker) já vê a confirmação.
+import asyncio
+import logging
+import os
+import time
+from collections import namedtuple
+
+import psycopg
+
+import queries
+
+CONFIRMATION_BATCH_WINDOW = float(os.getenv("CONFIRMATION_BATCH_WINDOW", "0.02"))   # segundos de espera por mais pedidos
+CONFIRMATION_BATCH_MAX_SIZE = int(os.getenv("CONFIRMATION_BATCH_MAX_SIZE", "500"))  # grava logo com N pedidos
+
+logger = logging.getLogger(__name__)
+
+Confirmation = namedtuple("Confirmation", "tenant_id trip_date route_id passenger_id status confirmed_at")
+
+
+def batch_params(tenant_id, trip_date, confirmations):
+    """Parâmetros de ENSURE_TRIPS/UPSERT_CONFIRMATIONS para confirmações de um tenant e dia."""
+    return {
+        "tenant_id": tenant_id,
+        "trip_date": trip_date,
+        "route_ids": [c.route_id for c in confirmations],
+        "passenger_ids": [c.passenger_id for c in confirmations],
+        "statuses": [c.status for c in confirmations],
+        "confirmed_at": [c.confirmed_at for c in confirmations],
+    }
+
+
+class ConfirmationBatcher:
+    """Junta as confirmações de pedidos concorrentes e grava-as numa só transação."""
+
+    def __init__(self, window=CONFIRMATION_BATCH_WINDOW, max_batch=CONFIRMATION_BATCH_MAX_SIZE):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []      # [(Confirmation, Future)]
+        self._timer = None
+        self._in_flight = set()
+
+        # Métricas
+        self._submitted = 0
+        self._batches = 0
+        self._rows_written = 0
+        self._fallbacks = 0
+        self._errors = 0
+        self._last_batch_ms = 0.0
+
+    async def submit(self, pool, confirmation):
+        """Entrega a confirmação e espera pelo COMMIT do lote (propaga o erro, se houver)."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((confirmation, future))
+        self._submitted += 1
+        if len(self._pending) >= self.max_batch:
+            self._start(pool)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._on_timer, pool)
+        await future
+
+    def _on_timer(self, pool):
+        self._timer = None
+        self._start(pool)
+
+    def _start(self, pool):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        task = asyncio.ensure_future(self._apply(pool, batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _apply(self, pool, batch):
+        started = time.monotonic()
+        try:
+            written = await self._write(pool, [c for c, _ in batch])
+        except psycopg.IntegrityError:
+            # Uma confirmação inválida (rota ou passageiro inexistente) não deve
+            # fazer falhar as outras: regrava uma a uma.
+            self._fallbacks += 1
+            await self._apply_one_by_one(pool, batch)
+            return
+        except Exception as e:
+            self._errors += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self._batches += 1
+        self._rows_written += written
+        self._last_batch_ms = (time.monotonic() - started) * 1000
+        for _, future in batch:
+            if not future.done():
+                future.set_result(None)
+
+    async def _write(self, pool, confirmations):
+        # O último pedido de cada (rota, passageiro) no lote ganha; o mesmo par
+        # duas vezes no mesmo INSERT ... ON CONFLICT seria um erro.
+        groups = {}
+        for c in confirmations:
+            groups.setdefault((c.tenant_id, c.trip_date), {})[(c.route_id, c.passenger_id)] = c
+
+        written = 0
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                for (tenant_id, trip_date), latest in groups.items():
+                    params = batch_params(tenant_id, trip_date, list(latest.values()))
+                    await cur.execute(queries.ENSURE_TRIPS, params)
+                    await cur.execute(queries.UPSERT_CONFIRMATIONS, params)
+                    written += len(latest)
+            await conn.commit()
+        return written
+
+    async def _apply_one_by_one(self, pool, batch):
+        for confirmation, future in batch:
+            try:
+                await self._write(pool, [confirmation])
+            except Exception as e:
+                self._errors += 1
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                self._rows_written += 1
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self, pool):
+        """Grava o que estiver pendente e espera pelos lotes em curso (encerramento do serviço)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._start(pool)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    def stats(self):
+        return {
+            "pending": len(self._pending),
+            "in_flight_batches": len(self._in_flight),
+            "submitted": self._submitted,
+            "batches": self._batches,
+            "rows_written": self._rows_written,
+            "avg_batch_size": round(self._rows_written / self._batches, 2) if self._batches else 0.0,
+            "one_by_one_fallbacks": self._fallbacks,
+            "errors": self._errors,
+            "batch_window_seconds": self.window,
+            "max_batch_size": self.max_batch,
+            "last_batch_ms": round(self._last_batch_ms, 3),
+        }
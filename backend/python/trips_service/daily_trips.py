@@ -0,0 +1,78 @@
+# daily_trips.py
+# Criação antecipada das viagens do dia (tabela trips) de todas as rotas.
+# Com as linhas já criadas, POST /confirmations deixa de fazer o upsert da
+# viagem, que bloqueava a mesma linha de trips para todos os passageiros de
+# uma rota a confirmar ao mesmo tempo.
+#
+# O job corre no arranque e depois a cada TRIPS_MATERIALIZE_INTERVAL segundos,
+# criando hoje e os TRIPS_MATERIALIZE_DAYS_AHEAD dias seguintes. É idempotente
+# (ON CONFLICT DO NOTHING), por isso vários workers podem corrê-lo ao mesmo tempo.
+import asyncio
+import logging
+import os
+import time
+from datetime import date, timedelta
+
+import psycopg
+
+import queries
+
+TRIPS_MATERIALIZE_INTERVAL = float(os.getenv("TRIPS_MATERIALIZE_INTERVAL", "3600"))  # segundos entre execuções
+TRIPS_MATERIALIZE_DAYS_AHEAD = int(os.getenv("TRIPS_MATERIALIZE_DAYS_AHEAD", "1"))   # dias além de hoje
+
+logger = logging.getLogger(__name__)
+
+
+def materialize_dates(today=None, days_ahead=TRIPS_MATERIALIZE_DAYS_AHEAD):
+    today = today or date.today()
+    return [today + timedelta(days=i) for i in range(days_ahead + 1)]
+
+
+class TripMaterializer:
+    """Job periódico que cria as viagens em falta num só INSERT ... SELECT."""
+
+    def __init__(self, interval=TRIPS_MATERIALIZE_INTERVAL, days_ahead=TRIPS_MATERIALIZE_DAYS_AHEAD):
+        self.interval = interval
+        self.days_ahead = days_ahead
+        self._runs = 0
+        self._trips_created = 0
+        self._errors = 0
+        self._last_run_at = None
+        self._last_run_ms = 0.0
+
+    async def materialize(self, pool, today=None):
+        """Cria as viagens de hoje e dos próximos dias. Devolve o número de viagens novas."""
+        dates = materialize_dates(today, self.days_ahead)
+        started = time.monotonic()
+        async with pool.connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(queries.MATERIALIZE_TRIPS, (dates,))
+                created = cur.rowcount
+            await conn.commit()
+
+        self._runs += 1
+        self._trips_created += created
+        self._last_run_at = time.time()
+        self._last_run_ms = (time.monotonic() - started) * 1000
+        logger.info("Viagens criadas para %s a %s: %s", dates[0], dates[-1], created)
+        return created
+
+    async def run(self, pool):
+        while True:
+            try:
+                await self.materialize(pool)
+            except (psycopg.Error, OSError) as e:
+                self._errors += 1
+                logger.error("Erro ao criar as viagens do dia: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def stats(self):
+        return {
+            "runs": self._runs,
+            "trips_created": self._trips_created,
+            "errors": self._errors,
+            "days_ahead": self.days_ahead,
+            "interval_seconds": self.interval,
+            "last_run_age_seconds": round(time.time() - self._last_run_at, 1) if self._last_run_at else None,
+            "last_run_ms": round(self._last_run_ms, 3),
+        }
@@ -0,0 +1,154 @@
+# history.py
+# Histórico (trilho) das posições GPS dos motoristas, para disputas, aprendizagem
+# de ETAs e análise de rotas.
+# Cada ping é só acrescentado a um buffer em memória; o buffer é gravado na
+# tabela location_history com COPY quando chega a LOCATION_HISTORY_BATCH_SIZE
+# posições ou a cada LOCATION_HISTORY_FLUSH_INTERVAL segundos, o que vier primeiro.
+#
+# Se a base de dados estiver em baixo, as posições ficam no buffer até
+# LOCATION_HISTORY_MAX_BUFFER; a partir daí as mais antigas são descartadas.
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import psycopg
+from psycopg import sql
+
+import queries
+
+LOCATION_HISTORY_FLUSH_INTERVAL = float(os.getenv("LOCATION_HISTORY_FLUSH_INTERVAL", "2"))  # segundos entre escritas
+LOCATION_HISTORY_BATCH_SIZE = int(os.getenv("LOCATION_HISTORY_BATCH_SIZE", "1000"))         # escreve logo com N posições
+LOCATION_HISTORY_MAX_BUFFER = int(os.getenv("LOCATION_HISTORY_MAX_BUFFER", "100000"))      # limite em memória
+LOCATION_HISTORY_MAX_POINTS = int(os.getenv("LOCATION_HISTORY_MAX_POINTS", "5000"))        # posições por resposta
+
+logger = logging.getLogger(__name__)
+
+
+def as_utc(moment):
+    """Datas sem fuso horário são tratadas como UTC."""
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+
+def month_bounds(day):
+    """Primeiro dia do mês de `day` e do mês seguinte."""
+    start = day.replace(day=1)
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start, end
+
+
+def partition_ddl(day):
+    """CREATE TABLE da partição mensal de location_history que contém `day`."""
+    start, end = month_bounds(day)
+    return sql.SQL(queries.CREATE_LOCATION_HISTORY_PARTITION).format(
+        sql.Identifier(f"location_history_{start:%Y_%m}"),
+        sql.Literal(datetime(start.year, start.month, 1, tzinfo=timezone.utc)),
+        sql.Literal(datetime(end.year, end.month, 1, tzinfo=timezone.utc)),
+    )
+
+
+class LocationHistoryBuffer:
+    """Buffer de posições (tenant_id, route_id, trip_date, recorded_at, lat, lon) gravado em lote."""
+
+    def __init__(self, flush_interval=LOCATION_HISTORY_FLUSH_INTERVAL,
+                 batch_size=LOCATION_HISTORY_BATCH_SIZE, max_buffer=LOCATION_HISTORY_MAX_BUFFER):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_buffer = max_buffer
+        self._rows = deque()
+        self._batch_ready = None  # criado em run(), dentro do event loop do serviço
+        self._partitions = set()  # meses cuja partição já existe
+
+        # Métricas
+        self._appended = 0
+        self._dropped = 0
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+
+    def append(self, tenant_id, route_id, trip_date, recorded_at, latitude, longitude):
+        self._rows.append((tenant_id, route_id, trip_date, recorded_at, latitude, longitude))
+        self._appended += 1
+        self._trim()
+        if len(self._rows) >= self.batch_size and self._batch_ready is not None:
+            self._batch_ready.set()
+
+    def _trim(self):
+        while len(self._rows) > self.max_buffer:
+            self._rows.popleft()
+            self._dropped += 1
+
+    def pending(self, tenant_id, route_id, trip_date, start, end):
+        """Posições ainda por gravar de uma viagem, no intervalo [start, end)."""
+        return [
+            row for row in self._rows
+            if row[0] == tenant_id and row[1] == route_id and row[2] == trip_date and start <= row[3] < end
+        ]
+
+    async def _ensure_partitions(self, cur, rows):
+        months = {month_bounds(row[3].date())[0] for row in rows} - self._partitions
+        for month in sorted(months):
+            await cur.execute(partition_ddl(month))
+            self._partitions.add(month)
+
+    async def flush(self, pool):
+        """Grava as posições do buffer com um único COPY. Devolve o número de linhas gravadas."""
+        if self._batch_ready is not None:
+            self._batch_ready.clear()
+        if not self._rows:
+            return 0
+
+        rows = list(self._rows)
+        self._rows.clear()
+        started = time.monotonic()
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await self._ensure_partitions(cur, rows)
+                    async with cur.copy(queries.COPY_LOCATION_HISTORY) as copy:
+                        for row in rows:
+                            await copy.write_row(row)
+                await conn.commit()
+        except Exception:
+            # Devolve as posições ao início do buffer para a próxima tentativa;
+            # acima do limite, as mais antigas são descartadas.
+            self._rows.extendleft(reversed(rows))
+            self._trim()
+            self._flush_errors += 1
+            self._partitions.clear()
+            raise
+
+        self._flushes += 1
+        self._rows_flushed += len(rows)
+        self._last_flush_ms = (time.monotonic() - started) * 1000
+        return len(rows)
+
+    async def run(self, pool):
+        """Escreve a cada flush_interval segundos ou assim que houver um lote completo."""
+        self._batch_ready = asyncio.Event()
+        while True:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush(pool)
+            except (psycopg.Error, OSError) as e:
+                logger.error("Erro ao gravar histórico de localizações: %s", e)
+                await asyncio.sleep(self.flush_interval)
+
+    def stats(self):
+        return {
+            "buffered": len(self._rows),
+            "appended": self._appended,
+            "dropped": self._dropped,
+            "flushes": self._flushes,
+            "rows_flushed": self._rows_flushed,
+            "flush_errors": self._flush_errors,
+            "batch_size": self.batch_size,
+            "flush_interval_seconds": self.flush_interval,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+        }
@@ -0,0 +1,148 @@
+# live_location.py
+# Camada de localização em tempo real dos motoristas.
+# Cada ping de GPS só atualiza a memória; a tabela `trips` recebe a última
+# posição de cada rota em escritas agrupadas, a cada LOCATION_FLUSH_INTERVAL
+# segundos. As leituras dos passageiros são servidas da memória em O(1).
+#
+# Nota: o estado é por processo. Com vários workers uvicorn, cada um guarda
+# apenas os pings que recebeu (a leitura cai para a base de dados nos outros).
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timezone
+
+import psycopg
+
+import queries
+
+LOCATION_FLUSH_INTERVAL = float(os.getenv("LOCATION_FLUSH_INTERVAL", "5"))  # segundos entre escritas em lote
+LOCATION_STALE_AFTER = float(os.getenv("LOCATION_STALE_AFTER", "30"))       # posição mais velha que isto é "stale"
+
+logger = logging.getLogger(__name__)
+
+
+class LiveLocation:
+    """Última posição conhecida de um motorista numa rota."""
+
+    __slots__ = ("latitude", "longitude", "trip_date", "updated_at", "received_at")
+
+    def __init__(self, latitude, longitude, trip_date):
+        self.latitude = latitude
+        self.longitude = longitude
+        self.trip_date = trip_date
+        self.updated_at = datetime.now(timezone.utc)
+        self.received_at = time.monotonic()
+
+
+class LiveLocationStore:
+    """Guarda a posição mais recente por (tenant_id, route_id) e escreve-a em lote na tabela trips."""
+
+    def __init__(self, flush_interval=LOCATION_FLUSH_INTERVAL, stale_after=LOCATION_STALE_AFTER):
+        self.flush_interval = flush_interval
+        self.stale_after = stale_after
+        self._latest = {}
+        self._dirty = set()
+
+        # Métricas
+        self._updates = 0
+        self._coalesced = 0
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+        self._last_flush_at = None
+
+    def update(self, tenant_id, route_id, latitude, longitude, trip_date=None):
+        """Regista um ping de GPS. Pings entre duas escritas substituem-se uns aos outros."""
+        key = (tenant_id, route_id)
+        location = LiveLocation(latitude, longitude, trip_date or date.today())
+        self._latest[key] = location
+        self._updates += 1
+        if key in self._dirty:
+            self._coalesced += 1
+        else:
+            self._dirty.add(key)
+        return location
+
+    def get(self, tenant_id, route_id, trip_date=None):
+        """Posição da viagem do dia, ou None se não houver ping em memória."""
+        location = self._latest.get((tenant_id, route_id))
+        if location is None or location.trip_date != (trip_date or date.today()):
+            return None
+        return location
+
+    def describe(self, location):
+        """Formato de resposta da API, com a idade da posição."""
+        age = time.monotonic() - location.received_at
+        return {
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "updated_at": location.updated_at.isoformat(),
+            "age_seconds": round(age, 1),
+            "stale": age > self.stale_after,
+        }
+
+    async def flush(self, pool):
+        """Escreve na tabela trips, num único UPDATE, as posições alteradas desde a última escrita."""
+        if not self._dirty:
+            return 0
+
+        keys, self._dirty = self._dirty, set()
+        rows = [(key, self._latest[key]) for key in keys if key in self._latest]
+        started = time.monotonic()
+        try:
+            async with pool.connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(queries.FLUSH_LIVE_LOCATIONS, (
+                        [key[0] for key, _ in rows],
+                        [key[1] for key, _ in rows],
+                        [loc.trip_date for _, loc in rows],
+                        [loc.latitude for _, loc in rows],
+                        [loc.longitude for _, loc in rows],
+                    ))
+                await conn.commit()
+        except Exception:
+            # Volta a marcar as rotas para a próxima tentativa (sem perder pings mais recentes).
+            self._dirty |= keys
+            self._flush_errors += 1
+            raise
+
+        self._flushes += 1
+        self._rows_flushed += len(rows)
+        self._last_flush_ms = (time.monotonic() - started) * 1000
+        self._last_flush_at = datetime.now(timezone.utc)
+        self._evict_old_trips()
+        return len(rows)
+
+    async def run(self, pool):
+        """Ciclo de escrita periódica; corre como tarefa de fundo durante a vida do serviço."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush(pool)
+            except (psycopg.Error, OSError) as e:
+                logger.error("Erro ao gravar localizações em lote: %s", e)
+
+    def stats(self):
+        now = time.monotonic()
+        ages = [now - loc.received_at for loc in self._latest.values()]
+        return {
+            "routes_tracked": len(self._latest),
+            "pending_writes": len(self._dirty),
+            "updates_received": self._updates,
+            "updates_coalesced": self._coalesced,
+            "flushes": self._flushes,
+            "rows_flushed": self._rows_flushed,
+            "flush_errors": self._flush_errors,
+            "flush_interval_seconds": self.flush_interval,
+            "last_flush_ms": round(self._last_flush_ms, 3),
+            "last_flush_at": self._last_flush_at.isoformat() if self._last_flush_at else None,
+            "stale_routes": sum(1 for age in ages if age > self.stale_after),
+            "max_age_seconds": round(max(ages), 1) if ages else None,
+        }
+
+    def _evict_old_trips(self):
+        today = date.today()
+        for key in [k for k, loc in self._latest.items() if loc.trip_date < today and k not in self._dirty]:
+            del self._latest[key]
@@ -1,34 +1,77 @@
 # main.py
-import os
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import psycopg
 from dotenv import load_dotenv
-from datetime import date
-from typing import List
+from psycopg_pool import PoolTimeout
+from contextlib import asynccontextmanager
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import logging
+from typing import Dict, List, Optional
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
-app = FastAPI()
+# O pool lê a configuração da base de dados das variáveis de ambiente,
+# por isso só é importado depois do load_dotenv().
+from shared.aiodb import close_async_pool, get_async_db, get_async_pool, open_async_pool
+from shared.migrate import DB_MIGRATE_ON_STARTUP, migrate
+from shared import instrumentation, serialization
+import queries
+from history import LOCATION_HISTORY_MAX_POINTS, LocationHistoryBuffer, as_utc
+from live_location import LiveLocationStore
+from broadcast import LOCATION_WS_SEND_TIMEOUT, LocationBroadcaster
+import plan_sync
+from confirmations import Confirmation, ConfirmationBatcher
+from daily_trips import TripMaterializer
 
-# --- Configuração da Base de Dados ---
-DB_NAME = os.getenv("POSTGRES_DB", "van_management_db")
-DB_USER = os.getenv("POSTGRES_USER", "vanuser")
-DB_PASSWORD = os.getenv("POSTGRES_PASSWORD", "vanpassword")
-DB_HOST = os.getenv("DB_HOST", "postgres")
+# Última posição de cada motorista, servida da memória e gravada em lote na tabela trips
+live_locations = LiveLocationStore()
+# Passageiros ligados por WebSocket, agrupados por rota
+location_broadcaster = LocationBroadcaster()
+# Trilho de todas as posições recebidas, gravado em lote (COPY) na tabela location_history
+location_history = LocationHistoryBuffer()
+# Confirmações de presença gravadas em lote (multi-row upsert)
+confirmation_batcher = ConfirmationBatcher()
+# Viagens do dia criadas antecipadamente para todas as rotas
+trip_materializer = TripMaterializer()
 
-DATABASE_URL = f"dbname='{DB_NAME}' user='{DB_USER}' password='{DB_PASSWORD}' host='{DB_HOST}'"
-
-def get_db_connection():
-    """Função para obter uma ligação à base de dados."""
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate)
+    await open_async_pool()
+    background = [
+        asyncio.create_task(live_locations.run(get_async_pool())),
+        asyncio.create_task(location_history.run(get_async_pool())),
+        asyncio.create_task(trip_materializer.run(get_async_pool())),
+    ]
+    yield
+    await confirmation_batcher.close(get_async_pool())
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ Erro ao conectar à base de dados: {e}")
-        raise
+        await live_locations.flush(get_async_pool())
+        await location_history.flush(get_async_pool())
+    except psycopg.Error as e:
+        logger.error("Erro ao gravar localizações pendentes: %s", e)
+    await plan_sync.close_client()
+    await close_async_pool()
+
+app = FastAPI(lifespan=lifespan)
+instrumentation.instrument(app, "trips_service")
+instrumentation.register_queries(queries)
+instrumentation.register_stats("db_pool", lambda: get_async_pool().stats())
+instrumentation.register_stats("live_locations", live_locations.stats)
+instrumentation.register_stats("location_streaming", location_broadcaster.stats)
+instrumentation.register_stats("location_history", location_history.stats)
+instrumentation.register_stats("confirmations", confirmation_batcher.stats)
+instrumentation.register_stats("trip_materializer", trip_materializer.stats)
+instrumentation.register_stats("serialization", serialization.stats)
+
+logger = logging.getLogger(__name__)
 
 # Novo modelo para receber a localização
 class DriverLocationUpdate(BaseModel):
@@ -45,9 +88,38 @@ class ConfirmationDetails(BaseModel):
     passenger_id: int
     passenger_name: str
     status: str
-    latitude: float = None  # Novo campo opcional
-    longitude: float = None # Novo campo opcional
-    address: str = None     # Novo campo opcional
+    latitude: Optional[float] = None  # Novo campo opcional
+    longitude: Optional[float] = None # Novo campo opcional
+    address: Optional[str] = None     # Novo campo opcional
+
+CONFIRMATION_FIELDS = tuple(ConfirmationDetails.model_fields)
+
+class HistoryPoint(BaseModel):
+    latitude: float
+    longitude: float
+    recorded_at: datetime
+
+class LocationHistoryResponse(BaseModel):
+    route_id: int
+    trip_date: date
+    start: datetime
+    end: datetime
+    interval_seconds: Optional[float] = None  # amostragem aplicada (None = todas as posições)
+    truncated: bool                           # havia mais posições do que max_points
+    points: List[HistoryPoint]
+
+class RouteConfirmationsSummary(BaseModel):
+    route_id: int
+    route_name: str
+    counts: Dict[str, int]  # número de passageiros por estado (CONFIRMED, CANCELLED, PENDING, ...)
+    total: int
+    confirmations: List[ConfirmationDetails] = []
+
+class FleetConfirmationsResponse(BaseModel):
+    trip_date: date
+    counts: Dict[str, int]
+    total: int
+    routes: List[RouteConfirmationsSummary]
 
 # --- ROTAS ---
 
@@ -56,162 +128,309 @@ def read_root():
     """Rota raiz para verificar se o serviço está no ar."""
     return {"message": "Olá, Mundo! Este é o Serviço de Viagens."}
 
+@app.get("/db/pool")
+def get_pool_stats():
+    """Métricas do pool de ligações (saturação e tempos de espera) para dimensionamento."""
+    return get_async_pool().stats()
+
 @app.post("/confirmations", status_code=200)
-def confirm_presence(confirmation: ConfirmationUpdate):
-    """Regista a confirmação de presença de um passageiro para a viagem do dia."""
+async def confirm_presence(confirmation: ConfirmationUpdate, background_tasks: BackgroundTasks):
+    """
+    Regista a confirmação de presença de um passageiro para a viagem do dia.
+    A gravação é feita em lote com os pedidos simultâneos; a resposta só sai
+    depois do COMMIT, por isso uma leitura a seguir já vê a confirmação.
+    """
     tenant_id = "cliente_alpha"
-    today = date.today()
-    conn = None
-    
+    confirmed_at = datetime.now(timezone.utc)
+
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                INSERT INTO trips (route_id, trip_date, tenant_id)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (route_id, trip_date) DO UPDATE SET status = trips.status
-                RETURNING id;
-            """, (confirmation.route_id, today, tenant_id))
-            trip = cur.fetchone()
-            if not trip:
-                raise HTTPException(status_code=500, detail="Não foi possível encontrar ou criar a viagem para hoje.")
-            trip_id = trip['id']
+        await confirmation_batcher.submit(get_async_pool(), Confirmation(
+            tenant_id=tenant_id,
+            trip_date=date.today(),
+            route_id=confirmation.route_id,
+            passenger_id=confirmation.passenger_id,
+            status=confirmation.status,
+            confirmed_at=confirmed_at,
+        ))
+    except PoolTimeout as e:
+        logger.error("Pool de ligações esgotado: %s", e)
+        raise HTTPException(status_code=503, detail="Serviço sobrecarregado, tente novamente.")
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+
+    # Atualização incremental do plano do dia, depois de responder ao passageiro
+    # (as tarefas não têm ordem entre pedidos; confirmed_at permite ao
+    # routing_service descartar uma alteração que chegue depois de outra mais recente)
+    background_tasks.add_task(
+        sync_daily_plan, tenant_id, confirmation.route_id, confirmation.passenger_id, confirmation.status,
+        confirmed_at,
+    )
+    return {"message": f"Presença atualizada para o estado '{confirmation.status}' com sucesso."}
+
+async def sync_daily_plan(tenant_id: str, route_id: int, passenger_id: int, status: str, confirmed_at: datetime):
+    """Envia a alteração ao routing_service (com a localização do passageiro, se confirmou)."""
+    stop = None
+    if status == "CONFIRMED":
+        try:
+            async with get_async_pool().connection() as conn:
+                async with conn.cursor() as cur:
+                    await cur.execute(queries.PASSENGER_STOP, (passenger_id, tenant_id))
+                    stop = await cur.fetchone()
+        except psycopg.Error as e:
+            logger.warning("Plano da rota %s não atualizado: %s", route_id, e)
+            return
+    await plan_sync.notify_confirmation(route_id, passenger_id, status, confirmed_at, stop)
+
+@app.post("/trips/materialize")
+async def materialize_trips():
+    """Cria já as viagens de hoje (e dos próximos dias) em falta, sem esperar pelo job periódico."""
+    try:
+        created = await trip_materializer.materialize(get_async_pool())
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro interno do servidor.")
+    return {"trips_created": created, **trip_materializer.stats()}
 
-            cur.execute("""
-                INSERT INTO trip_confirmations (trip_id, passenger_id, status, tenant_id, confirmed_at)
-                VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-                ON CONFLICT (trip_id, passenger_id) DO UPDATE SET
-                    status = EXCLUDED.status,
-                    confirmed_at = CURRENT_TIMESTAMP;
-            """, (trip_id, confirmation.passenger_id, confirmation.status, tenant_id))
-            
-            conn.commit()
-            return {"message": f"Presença atualizada para o estado '{confirmation.status}' com sucesso."}
-
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+@app.get("/trips/today/confirmations", response_model=FleetConfirmationsResponse)
+async def get_fleet_confirmations(
+    route_ids: Optional[List[int]] = Query(None, max_length=1000),
+    details: bool = True,
+    conn=Depends(get_async_db),
+):
+    """
+    Confirmações de hoje de várias rotas (`?route_ids=1&route_ids=2`) ou de todas
+    as rotas do tenant, numa só consulta, com contagens por estado por rota e no
+    total. Com `details=false` só são devolvidas as contagens.
+    """
+    tenant_id = "cliente_alpha"
+    today = date.today()
+
+    try:
+        async with conn.cursor() as cur:
+            # Rotas sem viagem hoje ficam com os passageiros em PENDING (como em
+            # /trips/today/{route_id}/confirmations); rotas sem passageiros aparecem com total 0.
+            await cur.execute(queries.FLEET_CONFIRMATIONS, (tenant_id, today, tenant_id, tenant_id, route_ids, route_ids))
+            rows = await cur.fetchall()
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
+
+    routes = {}
+    totals = {}
+    for row in rows:
+        summary = routes.get(row["route_id"])
+        if summary is None:
+            summary = routes[row["route_id"]] = {
+                "route_id": row["route_id"], "route_name": row["route_name"],
+                "counts": {}, "total": 0, "confirmations": [],
+            }
+        if row["passenger_id"] is None:
+            continue
+        status = row["status"]
+        summary["counts"][status] = summary["counts"].get(status, 0) + 1
+        summary["total"] += 1
+        totals[status] = totals.get(status, 0) + 1
+        if details:
+            summary["confirmations"].append({field: row[field] for field in CONFIRMATION_FIELDS})
+
+    return serialization.fast_response(
+        {"trip_date": today, "counts": totals, "total": sum(totals.values()), "routes": list(routes.values())}
+    )
 
 @app.get("/trips/today/{route_id}/confirmations", response_model=List[ConfirmationDetails])
-def get_today_confirmations(route_id: int):
+async def get_today_confirmations(route_id: int, conn=Depends(get_async_db)):
     """Obtém a lista de confirmações. Se não houver viagem, retorna PENDING para todos."""
     tenant_id = "cliente_alpha"
     today = date.today()
-    conn = None
 
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        async with conn.cursor() as cur:
             # 1. Tenta achar a viagem de hoje
-            cur.execute(
-                "SELECT id FROM trips WHERE route_id = %s AND trip_date = %s AND tenant_id = %s",
+            await cur.execute(
+                queries.TODAY_TRIP,
                 (route_id, today, tenant_id)
             )
-            trip = cur.fetchone()
+            trip = await cur.fetchone()
 
             if not trip:
                 # CENÁRIO A: Ninguém confirmou ainda.
                 # Buscamos apenas os passageiros da rota e definimos status como PENDING
-                cur.execute("""
-                    SELECT
-                        u.id as passenger_id,
-                        u.name as passenger_name,
-                        u.latitude,
-                        u.longitude,
-                        u.address,
-                        'PENDING' as status
-                    FROM users u
-                    JOIN passenger_routes pr ON u.id = pr.passenger_id
-                    WHERE pr.route_id = %s AND u.role = 'PASSAGEIRO' AND u.tenant_id = %s
-                """, (route_id, tenant_id))
-                return cur.fetchall()
+                await cur.execute(queries.ROSTER_PENDING, (route_id, tenant_id))
+                return serialization.fast_response(await cur.fetchall())
 
             # CENÁRIO B: A viagem já existe (alguém confirmou).
             trip_id = trip['id']
-            cur.execute("""
-                SELECT
-                    u.id as passenger_id,
-                    u.name as passenger_name,
-                    u.latitude,
-                    u.longitude,
-                    u.address,
-                    COALESCE(tc.status, 'PENDING') as status
-                FROM users u
-                JOIN passenger_routes pr ON u.id = pr.passenger_id
-                LEFT JOIN trip_confirmations tc ON u.id = tc.passenger_id AND tc.trip_id = %s
-                WHERE pr.route_id = %s AND u.role = 'PASSAGEIRO' AND u.tenant_id = %s
-            """, (trip_id, route_id, tenant_id))
-
-            confirmations = cur.fetchall()
-            return confirmations
-
-    except psycopg2.Error as e:
-        print(f"Erro na base de dados: {e}")
+            await cur.execute(queries.ROSTER_CONFIRMATIONS, (trip_id, route_id, tenant_id))
+
+            confirmations = await cur.fetchall()
+            return serialization.fast_response(confirmations)
+
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro interno do servidor.")
-    finally:
-        if conn:
-            conn.close()
 
 @app.post("/trips/{route_id}/location")
-def update_driver_location(route_id: int, location: DriverLocationUpdate):
-    """Atualiza a localização atual do motorista na viagem de hoje."""
+async def update_driver_location(route_id: int, location: DriverLocationUpdate):
+    """Atualiza a localização atual do motorista na viagem de hoje (gravada em lote na base de dados)."""
     tenant_id = "cliente_alpha"
-    today = date.today()
-    conn = None
+    live = live_locations.update(tenant_id, route_id, location.latitude, location.longitude)
+    location_history.append(tenant_id, route_id, live.trip_date, live.updated_at, live.latitude, live.longitude)
+    location_broadcaster.publish(tenant_id, route_id, lambda: {"route_id": route_id, **live_locations.describe(live)})
+    return {"message": "Localização atualizada com sucesso"}
 
+@app.websocket("/trips/{route_id}/location/ws")
+async def stream_driver_location(websocket: WebSocket, route_id: int):
+    """Envia ao passageiro cada nova posição do motorista da rota, sem necessidade de polling."""
+    tenant_id = "cliente_alpha"
+    await websocket.accept()
+    subscriber = location_broadcaster.subscribe(tenant_id, route_id)
+
+    # A posição atual (se existir) é enviada logo na ligação.
+    live = live_locations.get(tenant_id, route_id)
+    if live is not None:
+        subscriber.offer({"route_id": route_id, **live_locations.describe(live)})
+
+    async def send_updates():
+        while True:
+            message = await subscriber.queue.get()
+            # Um cliente que não consegue receber a tempo é desligado.
+            await asyncio.wait_for(websocket.send_json(message), LOCATION_WS_SEND_TIMEOUT)
+
+    async def wait_for_disconnect():
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    tasks = [asyncio.create_task(send_updates()), asyncio.create_task(wait_for_disconnect())]
+    too_slow = False
     try:
-        conn = get_db_connection()
-        with conn.cursor() as cur:
-            # Atualiza apenas se a viagem de hoje existir
-            cur.execute("""
-                UPDATE trips
-                SET current_lat = %s, current_long = %s
-                WHERE route_id = %s AND trip_date = %s AND tenant_id = %s
-            """, (location.latitude, location.longitude, route_id, today, tenant_id))
-
-            conn.commit()
-            return {"message": "Localização atualizada com sucesso"}
-
-    except psycopg2.Error as e:
-        print(f"Erro no banco: {e}")
-        raise HTTPException(status_code=500, detail="Erro ao atualizar localização")
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                too_slow = isinstance(task.exception(), asyncio.TimeoutError)
+                logger.warning("Ligação WebSocket da rota %s terminada: %r", route_id, task.exception())
     finally:
-        if conn:
-            conn.close()
+        for task in tasks:
+            task.cancel()
+        if too_slow:
+            # 1013 (Try Again Later): o cliente sabe que pode voltar a ligar
+            try:
+                await asyncio.wait_for(
+                    websocket.close(code=1013, reason="Cliente demasiado lento"), LOCATION_WS_SEND_TIMEOUT
+                )
+            except (asyncio.TimeoutError, RuntimeError, OSError, WebSocketDisconnect):
+                pass  # a ligação já não responde; o servidor fecha o socket ao sair
+        location_broadcaster.unsubscribe(tenant_id, route_id, subscriber)
 
 @app.get("/trips/{route_id}/location")
-def get_driver_location(route_id: int):
-    """Retorna a última localização conhecida do motorista."""
+async def get_driver_location(route_id: int):
+    """Retorna a última localização conhecida do motorista, com a idade da posição."""
     tenant_id = "cliente_alpha"
     today = date.today()
-    conn = None
 
+    live = live_locations.get(tenant_id, route_id, today)
+    if live is not None:
+        return live_locations.describe(live)
+
+    # Sem ping em memória (ex: serviço reiniciado): usamos a última posição gravada.
     try:
-        conn = get_db_connection()
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("""
-                SELECT current_lat, current_long
-                FROM trips
-                WHERE route_id = %s AND trip_date = %s AND tenant_id = %s
-            """, (route_id, today, tenant_id))
-
-            location = cur.fetchone()
-
-            if not location or location['current_lat'] is None:
-                # Se não tiver localização ainda, retorna 404 ou null
-                raise HTTPException(status_code=404, detail="Motorista ainda não iniciou o trajeto")
-
-            return {
-                "latitude": location['current_lat'],
-                "longitude": location['current_long']
-            }
+        async with get_async_pool().connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(queries.TRIP_LOCATION, (route_id, today, tenant_id))
 
-    except psycopg2.Error as e:
-        print(f"Erro no banco: {e}")
+                location = await cur.fetchone()
+
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
         raise HTTPException(status_code=500, detail="Erro ao buscar localização")
-    finally:
-        if conn:
-            conn.close()
\ No newline at end of file
+
+    if not location or location['current_lat'] is None:
+        # Se não tiver localização ainda, retorna 404 ou null
+        raise HTTPException(status_code=404, detail="Motorista ainda não iniciou o trajeto")
+
+    # A tabela não guarda a hora da posição, por isso a idade é desconhecida.
+    return {
+        "latitude": location['current_lat'],
+        "longitude": location['current_long'],
+        "updated_at": None,
+        "age_seconds": None,
+        "stale": True
+    }
+
+@app.get("/trips/{route_id}/history", response_model=LocationHistoryResponse)
+async def get_location_history(
+    route_id: int,
+    trip_date: Optional[date] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    interval_seconds: float = Query(0, ge=0, le=3600),
+    max_points: int = Query(LOCATION_HISTORY_MAX_POINTS, ge=2, le=LOCATION_HISTORY_MAX_POINTS),
+    conn=Depends(get_async_db),
+):
+    """
+    Trajeto do motorista numa viagem (por omissão a de hoje), por ordem cronológica,
+    opcionalmente limitado a [start, end). Com `interval_seconds` devolve no máximo
+    uma posição por intervalo; sem ele, se houver mais de `max_points` posições, o
+    intervalo é escolhido para o trajeto completo caber nesse número.
+    """
+    tenant_id = "cliente_alpha"
+    trip_date = trip_date or date.today()
+    # Sem limites explícitos a viagem fica entre a véspera e o dia seguinte (fusos horários);
+    # os limites em recorded_at permitem ao PostgreSQL ler só as partições necessárias.
+    day_start = datetime(trip_date.year, trip_date.month, trip_date.day, tzinfo=timezone.utc)
+    start = as_utc(start) if start else day_start - timedelta(days=1)
+    end = as_utc(end) if end else day_start + timedelta(days=2)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="O fim do intervalo tem de ser posterior ao início.")
+
+    async def fetch(cur, interval):
+        params = {
+            "tenant_id": tenant_id, "route_id": route_id, "trip_date": trip_date,
+            "start": start, "end": end, "interval": interval, "limit": max_points + 1,
+        }
+        await cur.execute(
+            queries.LOCATION_HISTORY_TRACK_DOWNSAMPLED if interval else queries.LOCATION_HISTORY_TRACK, params
+        )
+        return await cur.fetchall()
+
+    try:
+        async with conn.cursor() as cur:
+            points = await fetch(cur, interval_seconds)
+            if len(points) > max_points and not interval_seconds:
+                # Demasiadas posições: amostragem uniforme entre a primeira e o fim do intervalo.
+                span = (min(end, datetime.now(timezone.utc)) - points[0]["recorded_at"]).total_seconds()
+                interval_seconds = max(span / (max_points - 1), 1.0)
+                points = await fetch(cur, interval_seconds)
+    except psycopg.Error as e:
+        logger.error("Erro na base de dados: %s", e)
+        raise HTTPException(status_code=500, detail="Erro ao buscar histórico de localizações")
+
+    # Posições recebidas mas ainda não gravadas (só sem amostragem, para não a desfazer)
+    if not interval_seconds:
+        for row in location_history.pending(tenant_id, route_id, trip_date, start, end):
+            points.append({"latitude": row[4], "longitude": row[5], "recorded_at": row[3]})
+
+    return {
+        "route_id": route_id,
+        "trip_date": trip_date,
+        "start": start,
+        "end": end,
+        "interval_seconds": interval_seconds or None,
+        "truncated": len(points) > max_points,
+        "points": points[:max_points],
+    }
+
+@app.get("/live-locations/stats")
+def get_live_location_stats():
+    """Métricas da camada de localização em memória (escritas agrupadas, idade das posições e difusão)."""
+    return {
+        **live_locations.stats(),
+        "streaming": location_broadcaster.stats(),
+        "history": location_history.stats(),
+    }
+
+@app.get("/confirmations/stats")
+def get_confirmation_stats():
+    """Métricas da gravação em lote das confirmações e do job que cria as viagens do dia."""
+    return {**confirmation_batcher.stats(), "materializer": trip_materializer.stats()}
@@ -0,0 +1,63 @@
+# plan_sync.py
+# Mantém o plano do dia do routing_service em linha com as confirmações:
+# um cancelamento retira a paragem do passageiro e uma confirmação tardia
+# insere-a na posição mais barata (DELETE/POST /plans/{route_id}/stops).
+# As chamadas são feitas depois da resposta ao passageiro; se falharem, o plano
+# fica como estava até ao próximo POST /optimize da rota. Cada chamada leva a
+# hora da confirmação (confirmed_at), porque podem chegar fora de ordem.
+import logging
+import os
+
+import httpx
+
+from shared import instrumentation
+
+ROUTING_SERVICE_URL = os.getenv("ROUTING_SERVICE_URL", "http://routing-service:8000").rstrip("/")
+
+logger = logging.getLogger(__name__)
+
+_client = None
+
+
+async def open_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=5.0)
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def notify_confirmation(route_id, passenger_id, status, confirmed_at, stop=None):
+    """
+    Avisa o routing_service da alteração. `stop` (id, name, latitude, longitude)
+    só é necessário para CONFIRMED; sem coordenadas não há nada a inserir.
+    O routing_service ignora a alteração se já aplicou outra mais recente do passageiro.
+    """
+    client = await open_client()
+    headers = instrumentation.request_id_headers()
+    params = {"confirmed_at": confirmed_at.isoformat()}
+    url = f"{ROUTING_SERVICE_URL}/plans/{route_id}/stops"
+    try:
+        if status == "CANCELLED":
+            response = await client.delete(f"{url}/{passenger_id}", headers=headers, params=params)
+        elif status == "CONFIRMED" and stop and stop["latitude"] is not None and stop["longitude"] is not None:
+            response = await client.post(url, headers=headers, params=params, json={
+                "id": stop["id"],
+                "name": stop["name"],
+                "latitude": stop["latitude"],
+                "longitude": stop["longitude"],
+            })
+        else:
+            return
+    except httpx.HTTPError as e:
+        logger.warning("routing_service indisponível para atualizar o plano da rota %s: %r", route_id, e)
+        return
+    # 404: a rota ainda não foi otimizada hoje, não há plano para atualizar
+    if response.status_code not in (200, 404):
+        logger.warning("Plano da rota %s não atualizado (%s): %s", route_id, response.status_code, response.text[:200])
@@ -0,0 +1,138 @@
+# queries.py
+# SQL do serviço de viagens. Fica num só sítio para ser partilhado pelos
+# handlers e pelo benchmark de planos de execução (benchmarks/query_plans.py).
+# Índices usados: ver shared/migrations/0002_hot_path_indexes.sql.
+
+# Viagens de hoje (e dos próximos dias) para todas as rotas, num só INSERT;
+# corre antes da hora de ponta para que POST /confirmations não crie a viagem.
+MATERIALIZE_TRIPS = """
+INSERT INTO trips (route_id, trip_date, tenant_id)
+SELECT r.id, d.trip_date, r.tenant_id
+FROM routes r
+CROSS JOIN unnest(%s::date[]) AS d(trip_date)
+ON CONFLICT (route_id, trip_date) DO NOTHING
+"""
+
+# Rede de segurança para viagens que o job ainda não criou (ex.: rota nova).
+# DO NOTHING não bloqueia a linha já existente, ao contrário de DO UPDATE.
+ENSURE_TRIPS = """
+INSERT INTO trips (route_id, trip_date, tenant_id)
+SELECT DISTINCT c.route_id, %(trip_date)s::date, %(tenant_id)s
+FROM unnest(%(route_ids)s::int[]) AS c(route_id)
+ON CONFLICT (route_id, trip_date) DO NOTHING
+"""
+
+# Lote de confirmações num só INSERT; um pedido mais antigo que chegue depois
+# (outro lote, outro worker) não sobrepõe um estado mais recente.
+UPSERT_CONFIRMATIONS = """
+INSERT INTO trip_confirmations (trip_id, passenger_id, status, tenant_id, confirmed_at)
+SELECT t.id, c.passenger_id, c.status, %(tenant_id)s, c.confirmed_at
+FROM unnest(%(route_ids)s::int[], %(passenger_ids)s::int[], %(statuses)s::text[], %(confirmed_at)s::timestamptz[])
+    AS c(route_id, passenger_id, status, confirmed_at)
+JOIN trips t ON t.route_id = c.route_id AND t.trip_date = %(trip_date)s AND t.tenant_id = %(tenant_id)s
+ON CONFLICT (trip_id, passenger_id) DO UPDATE SET
+    status = EXCLUDED.status,
+    confirmed_at = EXCLUDED.confirmed_at
+WHERE trip_confirmations.confirmed_at IS NULL OR trip_confirmations.confirmed_at <= EXCLUDED.confirmed_at
+"""
+
+PASSENGER_STOP = "SELECT id, name, latitude, longitude FROM users WHERE id = %s AND tenant_id = %s"
+
+TODAY_TRIP = "SELECT id FROM trips WHERE route_id = %s AND trip_date = %s AND tenant_id = %s"
+
+ROSTER_PENDING = """
+SELECT
+    u.id as passenger_id,
+    u.name as passenger_name,
+    u.latitude,
+    u.longitude,
+    u.address,
+    'PENDING' as status
+FROM users u
+JOIN passenger_routes pr ON u.id = pr.passenger_id
+WHERE pr.route_id = %s AND u.role = 'PASSAGEIRO' AND u.tenant_id = %s
+"""
+
+ROSTER_CONFIRMATIONS = """
+SELECT
+    u.id as passenger_id,
+    u.name as passenger_name,
+    u.latitude,
+    u.longitude,
+    u.address,
+    COALESCE(tc.status, 'PENDING') as status
+FROM users u
+JOIN passenger_routes pr ON u.id = pr.passenger_id
+LEFT JOIN trip_confirmations tc ON u.id = tc.passenger_id AND tc.trip_id = %s
+WHERE pr.route_id = %s AND u.role = 'PASSAGEIRO' AND u.tenant_id = %s
+"""
+
+FLEET_CONFIRMATIONS = """
+SELECT
+    r.id as route_id,
+    r.name as route_name,
+    u.id as passenger_id,
+    u.name as passenger_name,
+    u.latitude,
+    u.longitude,
+    u.address,
+    COALESCE(tc.status, 'PENDING') as status
+FROM routes r
+LEFT JOIN (
+    passenger_routes pr
+    JOIN users u ON u.id = pr.passenger_id AND u.role = 'PASSAGEIRO' AND u.tenant_id = %s
+) ON pr.route_id = r.id
+LEFT JOIN trips t ON t.route_id = r.id AND t.trip_date = %s AND t.tenant_id = %s
+LEFT JOIN trip_confirmations tc ON tc.trip_id = t.id AND tc.passenger_id = u.id
+WHERE r.tenant_id = %s AND (%s::int[] IS NULL OR r.id = ANY(%s::int[]))
+ORDER BY r.id, u.name
+"""
+
+TRIP_LOCATION = """
+SELECT current_lat, current_long
+FROM trips
+WHERE route_id = %s AND trip_date = %s AND tenant_id = %s
+"""
+
+FLUSH_LIVE_LOCATIONS = """
+UPDATE trips
+SET current_lat = v.lat, current_long = v.lon
+FROM (
+    SELECT * FROM unnest(%s::text[], %s::int[], %s::date[], %s::float8[], %s::float8[])
+) AS v(tenant_id, route_id, trip_date, lat, lon)
+WHERE trips.tenant_id = v.tenant_id
+  AND trips.route_id = v.route_id
+  AND trips.trip_date = v.trip_date
+"""
+
+# Histórico de posições (location_history, particionada por mês em recorded_at)
+COPY_LOCATION_HISTORY = """
+COPY location_history (tenant_id, route_id, trip_date, recorded_at, latitude, longitude) FROM STDIN
+"""
+
+# Partição de um mês: {nome}, {início}, {fim} (DDL não aceita parâmetros, usa-se psycopg.sql)
+CREATE_LOCATION_HISTORY_PARTITION = """
+CREATE TABLE IF NOT EXISTS {} PARTITION OF location_history FOR VALUES FROM ({}) TO ({})
+"""
+
+# O intervalo em recorded_at permite ao PostgreSQL ignorar as partições fora dele.
+LOCATION_HISTORY_TRACK = """
+SELECT latitude, longitude, recorded_at
+FROM location_history
+WHERE tenant_id = %(tenant_id)s AND route_id = %(route_id)s AND trip_date = %(trip_date)s
+  AND recorded_at >= %(start)s AND recorded_at < %(end)s
+ORDER BY recorded_at
+LIMIT %(limit)s
+"""
+
+# Uma posição (a primeira) por intervalo de %(interval)s segundos. O mesmo parâmetro
+# nomeado é usado duas vezes para DISTINCT ON e ORDER BY serem a mesma expressão.
+LOCATION_HISTORY_TRACK_DOWNSAMPLED = """
+SELECT DISTINCT ON (floor(extract(epoch FROM recorded_at) / %(interval)s))
+    latitude, longitude, recorded_at
+FROM location_history
+WHERE tenant_id = %(tenant_id)s AND route_id = %(route_id)s AND trip_date = %(trip_date)s
+  AND recorded_at >= %(start)s AND recorded_at < %(end)s
+ORDER BY floor(extract(epoch FROM recorded_at) / %(interval)s), recorded_at
+LIMIT %(limit)s
+"""